@@ -0,0 +1,40 @@
+# Dictionary and set churn: inserting, looking up, updating and deleting
+# int and string keys, and combining sets.
+
+def int_keys(n):
+    d = {}
+    for i in xrange(n):
+        d[i] = i * 2
+    total = 0
+    for i in xrange(0, n, 3):
+        total += d[i]
+        del d[i]
+    for i in xrange(n):
+        if i in d:
+            d[i] = d[i] + 1
+    return total, d.get(1), d.get(3, -1)
+
+def str_keys(n):
+    names = ['k' + str(i) for i in xrange(100)]
+    d = {}
+    for i in xrange(n):
+        name = names[i % 100]
+        d[name] = d.get(name, 0) + i
+    return d['k0'], d['k99']
+
+def sets(n):
+    evens = set(range(0, n, 2))
+    threes = set(range(0, n, 3))
+    hits = 0
+    for k in xrange(n):
+        a = set([k, k + 1, k + 2])
+        if k in evens and k in threes:
+            hits += 1
+        if (a & evens) < threes:
+            hits += 1
+        a = a | threes
+    return hits
+
+print int_keys(3000)
+print str_keys(3000)
+print sets(3000)
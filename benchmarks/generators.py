@@ -0,0 +1,30 @@
+# Generators: resuming generator frames with next().
+
+def count(n):
+    i = 0
+    while i < n:
+        yield i
+        i += 1
+
+def squares(n):
+    g = count(n)
+    for i in xrange(n):
+        k = g.next()
+        yield k * k
+
+def total(n):
+    g = squares(n)
+    t = 0
+    for i in xrange(n):
+        t += g.next()
+    return t
+
+def fresh(n):
+    t = 0
+    for i in xrange(n):
+        g = count(3)
+        t += g.next() + g.next() + g.next()
+    return t
+
+print total(3000)
+print fresh(1000)
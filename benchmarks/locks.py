@@ -0,0 +1,29 @@
+# Green threads: two threads handing control back and forth through a pair
+# of locks.
+import thread
+
+N = 1000
+ping = thread.allocate_lock()
+pong = thread.allocate_lock()
+done = thread.allocate_lock()
+ping.acquire()
+pong.acquire()
+done.acquire()
+pings = 0
+pongs = 0
+
+def player(unused):
+    global pongs
+    for i in xrange(N):
+        ping.acquire()
+        pongs += 1
+        pong.release()
+    done.release()
+
+thread.start_new_thread(player, (None,))
+for i in xrange(N):
+    pings += 1
+    ping.release()
+    pong.acquire()
+done.acquire()
+print pings, pongs
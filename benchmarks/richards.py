@@ -0,0 +1,182 @@
+# Object dispatch: a small operating system scheduler in the style of
+# Richards. Tasks of several kinds pass packets to each other through a
+# scheduler, which dispatches to the kind's run method.
+
+IDLE, WORKER, HANDLER_A, HANDLER_B, DEVICE_A, DEVICE_B = 0, 1, 2, 3, 4, 5
+KIND_DEVICE, KIND_WORK = 0, 1
+
+class Packet:
+    def __init__(self, link, ident, kind):
+        self.link = link
+        self.ident = ident
+        self.kind = kind
+        self.datum = 0
+        self.data = [0, 0, 0, 0]
+
+    def append_to(self, queue):
+        self.link = None
+        if queue is None:
+            return self
+        p = queue
+        while p.link is not None:
+            p = p.link
+        p.link = self
+        return queue
+
+class Task:
+    def __init__(self, scheduler, ident, priority, queue):
+        self.scheduler = scheduler
+        self.ident = ident
+        self.priority = priority
+        self.queue = queue
+        self.held = False
+        self.waiting = queue is None
+        scheduler.tasks[ident] = self
+
+    def runnable(self):
+        return not self.held and not (self.waiting and self.queue is None)
+
+    def take(self):
+        packet = self.queue
+        if packet is not None:
+            self.queue = packet.link
+            self.waiting = False
+        return packet
+
+    def wait(self):
+        self.waiting = True
+        return None
+
+class IdleTask(Task):
+    def setup(self, count):
+        self.control = 1
+        self.count = count
+        self.waiting = False
+
+    def run(self, packet):
+        self.count -= 1
+        if self.count == 0:
+            self.scheduler.done = True
+            return None
+        if self.control & 1 == 0:
+            self.control = self.control // 2
+            return self.scheduler.release(DEVICE_A)
+        self.control = (self.control // 2) ^ 0xD008
+        return self.scheduler.release(DEVICE_B)
+
+class WorkerTask(Task):
+    def setup(self):
+        self.destination = HANDLER_A
+        self.count = 0
+
+    def run(self, packet):
+        if packet is None:
+            return self.wait()
+        if self.destination == HANDLER_A:
+            self.destination = HANDLER_B
+        else:
+            self.destination = HANDLER_A
+        packet.ident = self.destination
+        packet.datum = 0
+        for i in range(4):
+            self.count += 1
+            if self.count > 26:
+                self.count = 1
+            packet.data[i] = 64 + self.count
+        return self.scheduler.send(packet)
+
+class HandlerTask(Task):
+    def setup(self):
+        self.work = None
+        self.devices = None
+
+    def run(self, packet):
+        if packet is not None:
+            if packet.kind == KIND_WORK:
+                self.work = packet.append_to(self.work)
+            else:
+                self.devices = packet.append_to(self.devices)
+        if self.work is not None:
+            work = self.work
+            count = work.datum
+            if count > 3:
+                self.work = work.link
+                return self.scheduler.send(work)
+            if self.devices is not None:
+                device = self.devices
+                self.devices = device.link
+                device.datum = work.data[count]
+                work.datum = count + 1
+                return self.scheduler.send(device)
+        return self.wait()
+
+class DeviceTask(Task):
+    def setup(self):
+        self.pending = None
+        self.handled = 0
+
+    def run(self, packet):
+        if packet is None:
+            if self.pending is None:
+                return self.wait()
+            packet = self.pending
+            self.pending = None
+            return self.scheduler.send(packet)
+        self.handled += packet.datum
+        self.pending = packet
+        self.held = True
+        return None
+
+class Scheduler:
+    def __init__(self):
+        self.tasks = [None, None, None, None, None, None]
+        self.done = False
+        self.switches = 0
+
+    def release(self, ident):
+        task = self.tasks[ident]
+        task.held = False
+        return task
+
+    def send(self, packet):
+        task = self.tasks[packet.ident]
+        packet.link = None
+        task.queue = packet.append_to(task.queue)
+        task.waiting = False
+        return task
+
+    def run(self):
+        while not self.done:
+            task = self.pick()
+            if task is None:
+                break
+            self.switches += 1
+            packet = task.take()
+            task.run(packet)
+
+    # The runnable task of highest priority.
+    def pick(self):
+        best = None
+        for task in self.tasks:
+            if task.runnable() and (best is None or task.priority > best.priority):
+                best = task
+        return best
+
+def make_queue(ident, kind, count):
+    queue = None
+    for i in range(count):
+        queue = Packet(queue, ident, kind)
+    return queue
+
+def richards(count):
+    s = Scheduler()
+    IdleTask(s, IDLE, 0, None).setup(count)
+    WorkerTask(s, WORKER, 1000, make_queue(WORKER, KIND_WORK, 2)).setup()
+    HandlerTask(s, HANDLER_A, 2000, make_queue(DEVICE_A, KIND_DEVICE, 3)).setup()
+    HandlerTask(s, HANDLER_B, 3000, make_queue(DEVICE_B, KIND_DEVICE, 3)).setup()
+    DeviceTask(s, DEVICE_A, 4000, None).setup()
+    DeviceTask(s, DEVICE_B, 5000, None).setup()
+    s.run()
+    return s.switches, s.tasks[DEVICE_A].handled, s.tasks[DEVICE_B].handled
+
+print richards(1000)
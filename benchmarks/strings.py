@@ -0,0 +1,29 @@
+# String building: concatenation, formatting and slicing.
+
+def concat(n):
+    s = ''
+    for i in xrange(n):
+        s = s + chr(97 + i % 26)
+    return s
+
+def build(n):
+    s = ''
+    for i in xrange(n):
+        s = s + '%d:%s,' % (i, str(i * i))
+    return s
+
+def slices(s):
+    count = 0
+    for i in xrange(0, 2000, 7):
+        piece = s[i:i + 5]
+        if piece == 'abcde':
+            count += 1
+        if piece[1:3] == s[i + 1:i + 3]:
+            count += i
+    return count
+
+s = concat(2000)
+print s[:30], s[-5:]
+b = build(1000)
+print b[:40], b[-20:]
+print slices(s)
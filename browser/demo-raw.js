@@ -1,5 +1,7 @@
 var Unmarshaller = require('../src/unmarshal');
 var Interpreter = require('../src/interpreter');
+var Bundle = require('../src/bundle').Bundle;
+var output = require('../src/output');
 
 // Get the contents of the .pyc file
 function readFile(readerEvent) {
@@ -12,7 +14,7 @@ function readFile(readerEvent) {
 function loadFile() {
     var pycfile = document.getElementById('pycfile').files[0];
     if (typeof pycfile === "undefined") {
-        alert("Please upload a .pyc file");
+        alert("Please upload a .pyc or bundle file");
         return;
     }
     var reader = new FileReader();
@@ -32,19 +34,23 @@ function interpData(data) {
     }
 
     // Prepare the device for output
-    var outputDevice = {}
     var outputField = document.getElementById("output");
-    outputDevice['write'] = function(str) {
-        outputField.value += str;
-    };
+    var outputDevice = new output.BufferedOutput(new output.TextAreaOutput(outputField));
     // Reset the outputField's output
     outputField.value = "";
 
-    // Create the interpreter and unmarshaller instance
+    // Create the interpreter
     var interp = new Interpreter(outputDevice);
-    var unmar = new Unmarshaller(data);
-    // Unmarshal the file
-    var code = unmar.value();
+    var code;
+    if (Bundle.isBundle(data)) {
+        // Run the bundle's main module, and import the rest from it
+        var bundle = new Bundle(data);
+        interp.mount(bundle);
+        code = bundle.getMain();
+    } else {
+        // Unmarshal the file
+        code = new Unmarshaller(data).value();
+    }
     // Interpret the code!
     interp.interpret(code);
 }
@@ -0,0 +1,158 @@
+///<reference path="../bower_components/DefinitelyTyped/async/async.d.ts" />
+import fs = require('fs');
+import Unmarshaller = require('../src/unmarshal');
+import Interpreter = require('../src/interpreter');
+import Py_CodeObject = require('../src/codeobject');
+import {MemoryOutput} from '../src/output';
+import async = require('async');
+var argv = require('minimist')(process.argv.slice(2), {
+  alias: { 'h': 'help' },
+  boolean: ['compile', 'update-baseline'],
+  string: ['baseline', 'threshold', 'warmup', 'repeat'],
+});
+
+if (argv.help) {
+  console.log('Usage: node console/bench.js [options] [benchmark...]');
+  console.log('Options:\n\t--help -- show this help message');
+  console.log('\t--compile -- compile hot code to JavaScript, and compare against the compiled baseline');
+  console.log('\t--warmup <n> -- untimed runs of each benchmark (default: 3)');
+  console.log('\t--repeat <n> -- timed runs of each benchmark, of which the fastest counts (default: 15)');
+  console.log('\t--baseline <file> -- baseline results (default: benchmarks/baseline.json)');
+  console.log('\t--threshold <fraction> -- slowdown against the baseline that fails (default: 0.2)');
+  console.log('\t--update-baseline -- store the results as the baseline instead of comparing');
+  process.exit(1);
+}
+
+// The benchmarks, in benchmarks/<name>.pyc. Each prints a result that must
+// be the same on every run.
+const benchmarks: string[] = argv._.length > 0 ? argv._ :
+  ['pystone', 'nbody', 'richards', 'fib', 'dicts', 'strings', 'generators', 'locks'];
+const warmup = argv.warmup !== undefined ? parseInt(argv.warmup, 10) : 3;
+const repeat = argv.repeat !== undefined ? parseInt(argv.repeat, 10) : 15;
+const baselineFile: string = argv.baseline !== undefined ? argv.baseline : 'benchmarks/baseline.json';
+const threshold = argv.threshold !== undefined ? parseFloat(argv.threshold) : 0.2;
+// Baselines are kept separately for each mode.
+const mode = argv.compile ? 'compiled' : 'interpreted';
+
+interface Result {
+  // Runs per second, from the fastest run. Other processes on the machine
+  // only ever make runs slower, so this varies less than the median.
+  opsPerSec: number;
+  // Most heap in use during the runs, in megabytes.
+  peakHeapMB: number;
+}
+
+const output = new MemoryOutput();
+const interp = new Interpreter(output);
+if (argv.compile) {
+  interp.enableCompiler();
+}
+
+function now(): number {
+  var time = process.hrtime();
+  return time[0] * 1e3 + time[1] / 1e6;
+}
+
+function heapMB(): number {
+  return process.memoryUsage().heapUsed / (1024 * 1024);
+}
+
+// Runs code count times, and passes the time each run took, in
+// milliseconds, to cb. Fails if a run prints something else than the first.
+function runTimes(name: string, code: Py_CodeObject, count: number, expected: string[], cb: (times: number[]) => void): void {
+  var times: number[] = [];
+  function next(): void {
+    if (times.length === count) {
+      return cb(times);
+    }
+    var start = now();
+    output.clear();
+    interp.interpret(code, false, () => {
+      times.push(now() - start);
+      var out = output.getContents();
+      if (expected[0] === undefined) {
+        expected[0] = out;
+      } else if (out !== expected[0]) {
+        console.error(`${name}: printed\n${out}\ninstead of\n${expected[0]}`);
+        process.exit(1);
+      }
+      // Start the next run from a fresh call stack.
+      setImmediate(next);
+    });
+  }
+  next();
+}
+
+function runBenchmark(name: string, cb: (result: Result) => void): void {
+  var code = Unmarshaller.loadFileSync(`benchmarks/${name}.pyc`),
+      expected: string[] = [],
+      peak = 0,
+      sampler: any;
+  runTimes(name, code, warmup, expected, () => {
+    // Leave the garbage of earlier benchmarks out, when node is run with
+    // --expose-gc.
+    if (typeof (<any> global).gc === 'function') {
+      (<any> global).gc();
+    }
+    peak = heapMB();
+    // The interpreter yields to the event loop every few milliseconds.
+    sampler = setInterval(() => { peak = Math.max(peak, heapMB()); }, 5);
+    runTimes(name, code, repeat, expected, (times: number[]) => {
+      clearInterval(sampler);
+      peak = Math.max(peak, heapMB());
+      cb({ opsPerSec: 1000 / Math.min.apply(null, times), peakHeapMB: peak });
+    });
+  });
+}
+
+function pad(x: any, width: number): string {
+  var s = String(x);
+  while (s.length < width) {
+    s = ' ' + s;
+  }
+  return s;
+}
+
+var baselines: { [mode: string]: { [name: string]: Result } } =
+  fs.existsSync(baselineFile) ? JSON.parse(fs.readFileSync(baselineFile).toString()) : {};
+var baseline = baselines[mode] !== undefined ? baselines[mode] : {};
+var results: { [name: string]: Result } = {};
+var regressions: string[] = [];
+
+// Timings only compare on the same machine, so baselines aren't checked in.
+if (!argv['update-baseline'] && baselines[mode] === undefined) {
+  console.log(`No ${mode} baseline in ${baselineFile}. Record one on this machine first, by running ` +
+    `make bench-baseline (or this with --update-baseline) on the revision to compare against.`);
+  process.exit(1);
+}
+
+console.log(`${pad('benchmark', 12)} ${pad('ops/sec', 10)} ${pad('baseline', 10)} ${pad('change', 8)} ${pad('peak heap MB', 13)}`);
+async.eachSeries(benchmarks, (name: string, cb: () => void) => {
+  runBenchmark(name, (result: Result) => {
+    var base = baseline[name],
+        change = base !== undefined ? result.opsPerSec / base.opsPerSec - 1 : NaN;
+    results[name] = result;
+    console.log(`${pad(name, 12)} ${pad(result.opsPerSec.toFixed(2), 10)} ` +
+      `${pad(base !== undefined ? base.opsPerSec.toFixed(2) : '-', 10)} ` +
+      `${pad(isNaN(change) ? '-' : `${(100 * change).toFixed(1)}%`, 8)} ${pad(result.peakHeapMB.toFixed(1), 13)}`);
+    if (change < -threshold) {
+      regressions.push(name);
+    }
+    cb();
+  });
+}, () => {
+  if (argv['update-baseline']) {
+    for (var name in results) {
+      baseline[name] = {
+        opsPerSec: +results[name].opsPerSec.toFixed(2),
+        peakHeapMB: +results[name].peakHeapMB.toFixed(1)
+      };
+    }
+    baselines[mode] = baseline;
+    fs.writeFileSync(baselineFile, JSON.stringify(baselines, null, 2) + '\n');
+    console.log(`Updated the ${mode} baseline in ${baselineFile}.`);
+  } else if (regressions.length > 0) {
+    console.log(`Slower than the baseline by more than ${100 * threshold}%: ${regressions.join(', ')}`);
+    process.exit(1);
+  }
+});
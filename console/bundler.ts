@@ -0,0 +1,60 @@
+import Unmarshaller = require('../src/unmarshal');
+import Py_CodeObject = require('../src/codeobject');
+import {Bundle, BundleModule} from '../src/bundle';
+import {findImports} from '../src/importer';
+import fs = require('fs');
+import path = require('path');
+var argv = require('minimist')(process.argv.slice(2), {
+  alias: { 'h': 'help', 'o': 'output', 'p': 'path' },
+  boolean: ['source'],
+  string: ['output', 'path'],
+  default: { 'source': true },
+});
+
+if (argv._.length != 1 || argv.help) {
+  console.log(`Usage: ninia-bundle [options] <main.pyc>`);
+  console.log('Options:\n\t--help -- show this help message');
+  console.log('\t-o, --output <file> -- write the bundle to file (default: <main>.bundle)');
+  console.log('\t-p, --path <dir> -- also look for modules in dir; may be repeated');
+  console.log('\t--no-source -- leave out the .py sources used for tracebacks');
+  process.exit(1);
+}
+
+const main: string = argv._[0];
+const output: string = argv.output || main.replace(/\.pyc$/, '') + '.bundle';
+const searchPath: string[] = [].concat(argv.path || []);
+
+// Module names that have been added, or are being added, to the bundle.
+var seen: { [name: string]: boolean } = {};
+var modules: BundleModule[] = [];
+
+// Adds the module in file to the bundle, followed by the modules it imports
+// that can be found next to it or on the search path. Imports that can't be
+// found are left to the file system at run time.
+function addModule(name: string, file: string): void {
+  var code: Py_CodeObject = Unmarshaller.loadFileSync(file),
+    sourceFile = code.filename.toString(),
+    mod: BundleModule = { name: name, file: file, pyc: fs.readFileSync(file) },
+    dirs = [path.dirname(file)].concat(searchPath);
+  seen[name] = true;
+  if (argv.source && fs.existsSync(sourceFile)) {
+    mod.sourceFile = sourceFile;
+    mod.source = fs.readFileSync(sourceFile);
+  }
+  modules.push(mod);
+  findImports(code, []).forEach((imported: string) => {
+    if (seen[imported]) {
+      return;
+    }
+    for (var i = 0; i < dirs.length; i++) {
+      var candidate = path.join(dirs[i], `${imported}.pyc`);
+      if (fs.existsSync(candidate)) {
+        return addModule(imported, candidate);
+      }
+    }
+  });
+}
+
+addModule(path.basename(main, '.pyc'), main);
+fs.writeFileSync(output, Bundle.build(modules[0].name, modules));
+console.log(`Wrote ${modules.length} module(s) to ${output}`);
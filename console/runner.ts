@@ -1,19 +1,120 @@
-import fs = require('fs');
 import Unmarshaller = require('../src/unmarshal');
 import Interpreter = require('../src/interpreter');
+import Py_CodeObject = require('../src/codeobject');
+import {Bundle} from '../src/bundle';
+import {CompilerOptions} from '../src/compiler';
+import opcodes = require('../src/opcodes');
+import quicken = require('../src/quicken');
+import {Profile} from '../src/profiler';
+import fs = require('fs');
 var argv = require('minimist')(process.argv.slice(2), {
   alias: { 'h': 'help' },
-  boolean: ['debug'],
+  boolean: ['debug', 'cache-stats', 'specialization-stats', 'compile', 'dump-compiled', 'peephole', 'profile'],
+  string: ['compile-threshold', 'profile-stacks', 'profile-interval'],
+  default: { 'peephole': true },
 });
 
 if (argv._.length != 1 || argv.help) {
-  console.log(`Usage: ninia [options] <file.pyc>`);
+  console.log(`Usage: ninia [options] <file.pyc | file.bundle>`);
   console.log('Options:\n\t--help -- show this help message');
   console.log('\t--debug -- turn on debug output');
+  console.log('\t--cache-stats -- print global lookup cache hit rates on exit');
+  console.log('\t--specialization-stats -- print the instructions specialized for their operand types on exit');
+  console.log('\t--compile -- compile hot functions and loops to JavaScript');
+  console.log('\t--compile-threshold <n> -- calls plus loop iterations before compiling (default: 1000)');
+  console.log('\t--dump-compiled -- print the JavaScript generated by --compile to stderr');
+  console.log('\t--no-peephole -- run bytecode without peephole optimizations');
+  console.log('\t--profile -- print time and counts per function, opcode and allocated type to stderr on exit');
+  console.log('\t--profile-stacks <file> -- profile, and write sampled call stacks for flame graphs to file');
+  console.log('\t--profile-interval <ms> -- time between call stack samples (default: 1)');
   process.exit(1);
 }
 
 const interp = new Interpreter();
+if (!argv.peephole) {
+  interp.setPeepholeEnabled(false);
+}
+if (argv.compile) {
+  var options: CompilerOptions = {};
+  if (argv['compile-threshold'] !== undefined) {
+    options.threshold = parseInt(argv['compile-threshold'], 10);
+  }
+  if (argv['dump-compiled']) {
+    options.dump = (code: Py_CodeObject, source: string) => {
+      console.error(`// ${code.filename}:${code.firstlineno} ${code.name}\n${source}`);
+    };
+  }
+  interp.enableCompiler(options);
+}
+if (argv['specialization-stats']) {
+  quicken.enableStats();
+}
+var profile: Profile = null;
+if (argv.profile || argv['profile-stacks'] !== undefined) {
+  profile = interp.startProfiler(argv['profile-interval'] !== undefined ?
+    { interval: parseFloat(argv['profile-interval']) } : {});
+}
 const file: string = argv._[0];
-const u = new Unmarshaller(fs.readFileSync(file));
-interp.interpret(u.value(), argv.debug, function(){});
+var code: Py_CodeObject;
+if (/\.pyc$/.test(file)) {
+  code = Unmarshaller.loadFileSync(file);
+} else {
+  // Anything else should be a bundle; run its main module, and import the
+  // rest from it.
+  const bundle = new Bundle(fs.readFileSync(file));
+  interp.mount(bundle);
+  code = bundle.getMain();
+}
+
+// Prints inline cache statistics for a code object and the code objects
+// nested in it.
+function printCacheStats(code: Py_CodeObject): void {
+  var total = code.cacheHits + code.cacheMisses;
+  if (total > 0) {
+    console.log(`${code.filename}:${code.firstlineno} ${code.name}: ` +
+      `${code.cacheHits} hits, ${code.cacheMisses} misses ` +
+      `(${(100 * code.cacheHits / total).toFixed(1)}% hit rate)`);
+  }
+  code.consts.forEach((c) => {
+    if (c instanceof Py_CodeObject) {
+      printCacheStats(c);
+    }
+  });
+}
+
+// Prints, for a code object and the code objects nested in it, the
+// instructions that were specialized for their operand types and how often
+// the operands matched.
+function printSpecializationStats(code: Py_CodeObject): void {
+  if (code.quickKinds !== null) {
+    code.quickKinds.forEach((kind: string, i: number) => {
+      if (kind !== null) {
+        console.log(`${code.filename}:${code.getLine(i)} ${code.name} ${opcodes[code.ops[i]]} (${kind}): ` +
+          `${code.quickHits[i]} hits, ${code.quickMisses[i]} misses`);
+      }
+    });
+  }
+  code.consts.forEach((c) => {
+    if (c instanceof Py_CodeObject) {
+      printSpecializationStats(c);
+    }
+  });
+}
+
+interp.interpret(code, argv.debug, function() {
+  if (argv['cache-stats']) {
+    printCacheStats(code);
+  }
+  if (argv['specialization-stats']) {
+    printSpecializationStats(code);
+  }
+  if (profile !== null) {
+    interp.stopProfiler();
+    if (argv.profile) {
+      process.stderr.write(profile.report());
+    }
+    if (argv['profile-stacks'] !== undefined) {
+      fs.writeFileSync(argv['profile-stacks'], profile.foldedStacks());
+    }
+  }
+});
@@ -1,14 +1,24 @@
 ///<reference path="../bower_components/DefinitelyTyped/async/async.d.ts" />
 import fs = require('fs');
+import os = require('os');
+import path = require('path');
 import Unmarshaller = require('../src/unmarshal');
 import Interpreter = require('../src/interpreter');
+import {MemoryOutput} from '../src/output';
 import async = require('async');
 import domain = require('domain');
 
 var testOut: string = '';
 var oldStdout = process.stdout.write;
 process.stdout.write = <any> ((data: string) => {testOut += data;});
-const interp = new Interpreter();
+// Collects the output of each test.
+const output = new MemoryOutput();
+const interp = new Interpreter(output);
+// With --compile, code is compiled almost as soon as it runs, so that the
+// tests exercise the compiled code rather than the bytecode loop.
+if (process.argv.indexOf('--compile') !== -1) {
+    interp.enableCompiler({ threshold: 2, always: true });
+}
 var numTests = 0,
     numPassed = 0,
     numSkipped = 0;
@@ -52,11 +62,18 @@ const testList = [
     ["Binary operations test", "pytests/math/binaryOpsTest"],
     ["In-place operations test", "pytests/math/inplaceTest"],
     ["Mixed Arithmetic test", "pytests/math/mixedMathTest"],
+    ["Integer test", "pytests/math/intTest"],
+    ["Long test", "pytests/math/longTest"],
+    ["Specialization test", "pytests/math/specializeTest"],
     [`\n--- Function tests ---`],
     ["Keyword and default arguments test", "pytests/functions/keywordargs"],
     ["Recursion test", "pytests/functions/recursionTest"],
+    ["Function call test", "pytests/functions/callTest"],
     ["Scoping test", "pytests/functions/scopeTest"],
+    ["Local variables test", "pytests/functions/localsTest"],
+    ["Global variables test", "pytests/functions/globalsTest"],
     ["Generators test", "pytests/functions/generatorTest"],
+    ["Generator protocol test", "pytests/functions/generatorProtocol"],
     [`\n--- Builtin tests ---`],
     ["Builtin Types test", "pytests/builtins/builtinTypes"],
     ["Bin function test", "pytests/builtins/bin"],
@@ -70,18 +87,28 @@ const testList = [
     ["Chr & Ord functions test", "pytests/builtins/chr_ord"],
     ["Attribute accessors test", "pytests/builtins/attrs"],
     ["Underscore names test", "pytests/builtins/underscoresTest"],
+    ["Native call test", "pytests/builtins/nativeCalls"],
+    ["Iteration builtins test", "pytests/builtins/iterBuiltins"],
+    ["Sort test", "pytests/builtins/sortTest"],
     [`\n--- Collection tests ---`],
     ["List test", "pytests/collections/lists"],
+    ["List storage test", "pytests/collections/listStorage"],
     ["Set test", "pytests/collections/sets"],
     ["Dict test", "pytests/collections/dicts"],
+    ["Collection methods test", "pytests/collections/methodsTest"],
+    ["Hashing test", "pytests/collections/hashTest"],
     [`\n--- Control flow tests ---`],
     ["Loop test", "pytests/loopTest"],
     ["Range test", "pytests/rangeTest"],
     ["Comprehension test", "pytests/comprehensionTest"],
+    ["Compiled loops test", "pytests/compiler/compiledLoops"],
+    ["Peephole optimizer test", "pytests/peepholeTest"],
     [`\n--- Class tests ---`],
     ["Basic class test", "pytests/classes/userDefTest"],
+    ["Attribute access test", "pytests/classes/attributeTest"],
     ["Class import / inheritance test", "pytests/classes/externalImport"],
     ["import-star test", "pytests/classes/importStar"],
+    ["Import path test", "pytests/classes/importPath"],
     [`\n--- Caught Exception tests ---`],
     ["Basic Exception test", "pytests/caught_exceptions/except"],
     ["Nested Function Exception test", "pytests/caught_exceptions/nestedFunction"],
@@ -97,6 +124,7 @@ const testList = [
     ["Raise exception with arguments test", "pytests/uncaught_exceptions/raiseMultipleArg"],
     ["User-defined exceptions test", "pytests/uncaught_exceptions/userClassException"],
     ["ArithmeticError Uncaught test", "pytests/uncaught_exceptions/arithmeticError"],
+    ["Caught then uncaught exception test", "pytests/uncaught_exceptions/caughtFirst"],
     [`\n--- Thread tests ---`],
     ["Termination test", "pytests/threads/terminationTest"],
     ["Traceback test", "pytests/threads/tracebackTest"],
@@ -106,8 +134,10 @@ const testList = [
     ["Multi-threading simple lock test", "pytests/threads/multiThreadingLockSimple"],
     ["Multi-threading lock functions test", "pytests/threads/multiThreadingLockFunction"],
     ["Multi-threading waiting lock test", "pytests/threads/multiThreadingLockWaiting"],
+    ["Multi-threading preemption test", "pytests/threads/multiThreadingPreemption"],
     [`\n--- Other tests ---`],
     ["Strings test", "pytests/stringTest"],
+    ["Print test", "pytests/printTest"],
     ["Slice test", "pytests/sliceTest"],
     ["Assignment test", "pytests/assignmentTest"],
     ["Deletion test", "pytests/delTest"],
@@ -121,6 +151,7 @@ const skipTests: {[file: string]: boolean} = {
 var d = domain.create();
 var async_cb: () => void = null;
 d.on('error', function(err: any){
+    testOut += output.getContents();
     onFailure();
     result += `${err.stack != null ? err.stack : ""}\n`;
     async_cb();
@@ -142,6 +173,7 @@ function indiv_test(name: string, file: string, cb: () => void) {
     result += `Running ${name}... `;
     var u = new Unmarshaller(fs.readFileSync(file+'.pyc'));
     testOut = '';  // reset the output catcher
+    output.clear();
     testName = file.split('/')[1];  // grab 'math' from 'pytests/math/int'
     if (isNaN(testFails[testName]))
         testFails[testName] = 0;  // initialize
@@ -151,6 +183,7 @@ function indiv_test(name: string, file: string, cb: () => void) {
     async_cb = cb;
     d.run(function() {
         interp.interpret(u.value(), false, function() {
+            testOut += output.getContents();
             if (testOut == expectedOut) {
                 result += `Pass\n`;
                 numPassed += 1;
@@ -175,10 +208,66 @@ function iteration(cur_test: [string], inCb: () => void) {
     }
 }
 
+// Checks the code cache of Unmarshaller.loadFile and loadFileSync: a .pyc
+// is unmarshalled again only once its modification time changes.
+function checkCodeCache(cb: (err: string) => void) {
+    var file = path.join(os.tmpdir(), `ninia-cache-${process.pid}.pyc`);
+    fs.writeFileSync(file, fs.readFileSync('pytests/math/intTest.pyc'));
+    fs.utimesSync(file, 1000, 1000);
+    var code = Unmarshaller.loadFileSync(file);
+    if (Unmarshaller.loadFileSync(file) !== code) {
+        fs.unlinkSync(file);
+        return cb('loadFileSync unmarshalled an unchanged file again');
+    }
+    Unmarshaller.loadFile(file, (err: NodeJS.ErrnoException, cached: any) => {
+        if (err || cached !== code) {
+            fs.unlinkSync(file);
+            return cb(err ? err.message : 'loadFile did not share the cached code object');
+        }
+        fs.writeFileSync(file, fs.readFileSync('pytests/builtins/abs.pyc'));
+        fs.utimesSync(file, 2000, 2000);
+        Unmarshaller.loadFile(file, (err: NodeJS.ErrnoException, changed: any) => {
+            var reloaded = Unmarshaller.loadFileSync(file);
+            fs.unlinkSync(file);
+            if (err || changed === code || changed.filename.toString() === code.filename.toString()) {
+                return cb(err ? err.message : 'loadFile kept the code of a changed file');
+            }
+            cb(reloaded === changed ? null : 'loadFileSync did not share the reloaded code object');
+        });
+    });
+}
+
+// Checks of the interpreter's own machinery, run after the Python tests.
+// Each calls back with what went wrong, or null.
+const checkList: [string, (cb: (err: string) => void) => void][] = [
+    ["Code cache test", checkCodeCache]
+];
+
+function runCheck(check: [string, (cb: (err: string) => void) => void], cb: () => void) {
+    numTests++;
+    result += `Running ${check[0]}... `;
+    testName = 'checks';
+    if (isNaN(testFails[testName]))
+        testFails[testName] = 0;
+    check[1]((err: string) => {
+        if (err === null) {
+            result += `Pass\n`;
+            numPassed += 1;
+        } else {
+            result += `Fail\n${err}\n`;
+            testFails[testName] += 1;
+        }
+        cb();
+    });
+}
+
 // Runs all tests
 function processTests(){
     async.eachSeries(testList, iteration, function(err: Error) {
-        printResults();
+        result += `\n--- Interpreter checks ---\n`;
+        async.eachSeries(checkList, runCheck, function(err: Error) {
+            printResults();
+        });
     });
 }
 
@@ -0,0 +1,96 @@
+# Tests for len(), sum(), min(), max(), map(), filter(), zip(), enumerate()
+# and reversed(), over native sequences, generators and user-defined
+# iterables
+
+
+class Bag(object):
+    def __init__(self, n):
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return Counter(self.n)
+
+
+class Counter(object):
+    def __init__(self, n):
+        self.i = 0
+        self.n = n
+
+    def next(self):
+        if self.i == self.n:
+            raise StopIteration
+        self.i += 1
+        return self.i
+
+
+class Seq(object):
+    def __len__(self):
+        return 3
+
+    def __getitem__(self, i):
+        return i * 10
+
+
+class Broken(object):
+    def __iter__(self):
+        return self
+
+    def next(self):
+        raise ValueError("broken")
+
+
+def squares(n):
+    for i in range(n):
+        yield i * i
+
+
+def double(x):
+    return x * 2
+
+
+def odd(x):
+    return x % 2 == 1
+
+xs = range(10)
+fs = [0.5, 1.5, 2.5]
+
+print len(xs), len("abc"), len((1, 2)), len({'a': 1}), len(xrange(5)), len(Bag(4))
+
+print sum(xs), sum(xs, 100), sum(fs), sum([1, 2.5]), sum(xrange(5)), sum((1, 2, 3))
+print sum(squares(4)), sum(Bag(4)), sum(x for x in xs if x > 5)
+print sum(range(100000)), sum([2147483647, 2147483647, 2147483647])
+
+print min(xs), max(xs), min(fs), max(fs), min(3, 1, 2), max(3, 1, 2)
+print min("hello"), max(squares(5)), max(Bag(6)), max(-1, 0.5)
+print min(xs, key=lambda x: (x - 4) * (x - 4)), max([Bag(1), Bag(2)], key=len).n
+
+print map(double, xs), map(abs, [-1, 2, -3]), map(str, [1, 2])
+print map(None, [1, 2], [3, 4]), map(lambda a, b: a + b, [1, 2, 3], [10, 20, 30])
+print map(double, squares(4)), sum(map(double, squares(3)))
+
+print filter(odd, xs), filter(None, [0, 1, 2, 0]), filter(odd, (1, 2, 3))
+print filter(None, "a b"), filter(odd, Bag(5))
+
+print zip(xs, "abc"), zip([1, 2], (3, 4), xrange(9)), zip(), zip(squares(3), Bag(2))
+
+for i, c in enumerate("xyz"):
+    print i, c,
+print
+print list(enumerate(xs, 5))[:2], list(enumerate(squares(3)))
+print list(enumerate(Bag(2), start=1))
+
+print list(reversed(xs)), list(reversed("abc")), list(reversed((1, 2)))
+print list(reversed(xrange(3))), list(reversed(Seq())), list(reversed([1.5, 2.5]))
+
+# Strings are sequences of characters, which contain their substrings.
+for c in "ab":
+    print c,
+print "b" in "abc", "bc" in "abc", "d" in "abc"
+
+try:
+    sum(Broken())
+except ValueError:
+    print "caught ValueError"
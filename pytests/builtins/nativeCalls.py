@@ -0,0 +1,39 @@
+# Calls to native functions and methods, which return straight into the
+# calling frame.
+import thread
+
+def total(n):
+    s = 0
+    for i in xrange(n):
+        s += abs(i - 50)
+    return s
+
+def collect(n):
+    xs = []
+    for i in range(n):
+        xs.append(chr(ord('a') + i % 26))
+    return xs
+
+def release(lock):
+    try:
+        lock.release()
+    except:
+        return 'not held'
+    return 'released'
+
+def release_uncaught(lock):
+    lock.release()
+    return 'released'
+
+print total(100)
+print collect(30)
+print hasattr(collect, 'x'), divmod(7, 2)
+lock = thread.allocate_lock()
+print release(lock)
+lock.acquire()
+print release(lock)
+try:
+    release_uncaught(lock)
+except:
+    print 'caught in caller'
+print release(lock)
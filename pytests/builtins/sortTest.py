@@ -0,0 +1,124 @@
+# sorted() and list.sort()
+
+print sorted([5, 2, 9, 1, 5, 6])
+print sorted([5, 2, 9, 1], reverse=True)
+print sorted([2.5, -1.0, 3.25, 0.0])
+print sorted([2.5, -1.0, 3.25], reverse=True)
+print sorted([3, 1.5, 2, -7, 2.0])
+print sorted(range(10, 0, -2))
+print sorted([2147483647, -2147483648, 0, 4294967296, -5])
+print sorted(['pear', 'apple', 'fig', 'Banana', ''])
+print sorted('hello')
+print sorted((3, 1, 2))
+print sorted([])
+print sorted(set([4, 1, 3]))
+print sorted({'b': 1, 'a': 2, 'c': 3})
+
+# key, cmp and reverse
+words = ['banana', 'Apple', 'cherry', 'date', 'fig', 'elder']
+print sorted(words, key=len)
+print sorted(words, key=len, reverse=True)
+print sorted(words, key=lambda w: w[1:])
+print sorted(words, cmp=lambda a, b: len(a) - len(b))
+print sorted(words, lambda a, b: len(b) - len(a))
+print sorted(words, None, len)
+print sorted([1, 2, 3, 4, 5, 6], key=lambda x: x % 3)
+print sorted([1, 2, 3, 4, 5, 6], key=lambda x: x % 3, reverse=True)
+print sorted([3, 1, 2], key=None, cmp=None)
+
+# Sorting is stable, also when reversed.
+pairs = [(1, 'b'), (0, 'a'), (1, 'a'), (0, 'c'), (2, 'z'), (1, 'c')]
+print sorted(pairs, key=lambda p: p[0])
+print sorted(pairs, key=lambda p: p[0], reverse=True)
+print sorted(pairs, key=lambda p: p[1])
+print sorted(pairs, cmp=lambda a, b: a[0] - b[0], reverse=True)
+
+# Tuples and lists are ordered item by item, then by length.
+print sorted([(1, 'b'), (1, 'a'), (0, 'z')])
+print sorted(pairs)
+print sorted(pairs, reverse=True)
+print sorted([(2, 1), (1, 2), (1, 0, 5), (), (1, 0)])
+print sorted([[3, 'a'], [1, 2.5], [1, 2], [], [1]])
+print sorted([((1, 2), 'x'), ((1, 1), 'y'), ((0, 9), 'z'), ((1, 1), 'x')])
+print sorted([(1.5, 'b'), (1, 'c'), (1.5, 'a'), (-2, 'd')])
+print sorted(['b', 'a', 'c'], key=lambda s: (len(s), s))
+print sorted(words, key=lambda w: (len(w), w), reverse=True)
+records = [(i % 7, -i, str(i % 3)) for i in range(50)]
+print sorted(records)[:6], sorted(records, reverse=True)[:6]
+print max([(1, 'a'), (2, 'b'), (2, 'a')]), min([[2, 1], [1, 5], [1, 4]])
+
+# Keys are worked out once per item.
+calls = []
+def key(x):
+    calls.append(x)
+    return -x
+print sorted([4, 8, 1, 6, 2], key=key)
+print len(calls)
+
+# The argument is left alone.
+nums = [3, 1, 2]
+print sorted(nums), nums
+
+# Objects that define __lt__
+class Version(object):
+    def __init__(self, major, minor):
+        self.major = major
+        self.minor = minor
+    def __lt__(self, other):
+        if self.major != other.major:
+            return self.major < other.major
+        return self.minor < other.minor
+
+def names(versions):
+    return ['v%d.%d' % (v.major, v.minor) for v in versions]
+
+versions = [Version(2, 0), Version(1, 5), Version(1, 10), Version(0, 9)]
+print names(sorted(versions))
+print names(sorted(versions, reverse=True))
+print names(sorted(versions, key=lambda v: v.minor))
+print Version(1, 0) < Version(2, 0), Version(3, 0) < Version(2, 0)
+
+# Keys from a generator function
+def lengths(items):
+    for item in items:
+        yield len(item)
+print sorted(lengths(words))
+
+# list.sort()
+a = [5, 3, 8, 1]
+print a.sort(), a
+a.sort(reverse=True)
+print a
+b = ['bb', 'a', 'ccc', 'dd']
+b.sort(key=lambda s: len(s))
+print b
+b.sort(key=len, reverse=True)
+print b
+b.sort(cmp=lambda x, y: cmp(x, y))
+print b
+c = [2.5, 1, 'x', 0.5]
+c.sort(key=lambda v: str(v))
+print c
+d = [Version(1, 1), Version(0, 1)]
+d.sort()
+print names(d)
+# Tuples holding objects compare them with __eq__ and __lt__.
+class Tag(object):
+    def __init__(self, name):
+        self.name = name
+    def __eq__(self, other):
+        return self.name == other.name
+    def __lt__(self, other):
+        return self.name < other.name
+tagged = [(Tag('b'), 2), (Tag('a'), 3), (Tag('b'), 1), (Tag('a'), 1)]
+tagged.sort()
+print [(tag.name, n) for tag, n in tagged]
+tagged.sort(reverse=True)
+print [(tag.name, n) for tag, n in tagged]
+print [names(vs) for vs in sorted([(Version(1, 2), Version(0, 0)), (Version(1, 1), Version(0, 1))])]
+e = range(5)
+e.sort(reverse=True)
+print e
+e.append(10)
+e.sort()
+print e
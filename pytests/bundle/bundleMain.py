@@ -0,0 +1,8 @@
+# Run from a bundle built with lib/ on the bundler's path; lib/ isn't on
+# sys.path at run time.
+from shapes import Polygon, SIDES
+import shapes
+
+print Polygon('triangle').describe()
+print shapes.Polygon('square').describe()
+print sorted(SIDES.keys())
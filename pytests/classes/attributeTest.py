@@ -0,0 +1,43 @@
+class Point:
+    scale = 10
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def norm1(self):
+        return (abs(self.x) + abs(self.y)) * self.scale
+
+points = [Point(i, -i) for i in range(5)]
+total = 0
+for p in points:
+    total += p.norm1()
+    p.x = p.x + 1
+print total, [p.x for p in points]
+
+# Instance attributes shadow class attributes.
+p = points[0]
+p.scale = 1
+print p.norm1(), points[1].norm1()
+
+# Attributes added in a different order.
+q = Point(1, 2)
+q.z = 3
+r = Point(4, 5)
+r.w = 6
+print q.x, q.y, q.z, r.x, r.y, r.w
+
+# getattr / setattr / hasattr
+setattr(q, 'x', 7)
+print getattr(q, 'x'), hasattr(q, 'z'), hasattr(r, 'z')
+
+# Deleting an attribute and adding it back.
+del q.z
+print hasattr(q, 'z')
+q.z = 8
+print q.x, q.y, q.z
+
+# Many attributes.
+for i in range(100):
+    setattr(r, 'a' + str(i), i)
+print r.a0, r.a99, r.x, r.w
@@ -0,0 +1,16 @@
+import sys
+
+# Looking a module up must not stick once sys.path has changed.
+try:
+    import shapes
+except ImportError:
+    print "shapes is not on the path yet"
+
+sys.path.append("./pytests/classes/pathFolder")
+import shapes
+print shapes.describe(3)
+print shapes.describe(5)
+
+# The module is imported once.
+import shapes as again
+print again is shapes
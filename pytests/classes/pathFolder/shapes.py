@@ -0,0 +1,4 @@
+def describe(sides):
+    if sides == 3:
+        return "triangle"
+    return "polygon"
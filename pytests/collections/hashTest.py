@@ -0,0 +1,46 @@
+# Keys that compare equal find the same item, whatever their type.
+d = {}
+d[1] = 'one'
+print d[1.0], d[True], d[1L]
+big = 1000
+d[big * 1000] = 'million'
+print d[1000000], d[1000000.0]
+d[2 ** 70] = 'huge'
+print d[2 ** 70]
+d[(1, 'a')] = 'tuple'
+print d[(1, 'a')], (1, 'a') in d, (1, 'b') in d
+d[None] = 'none'
+print d[None], None in d
+
+# Growing, deleting and re-adding.
+counts = {}
+for i in range(1000):
+    k = i % 37
+    counts[k] = counts.get(k, 0) + 1
+print sorted(counts.keys())[-3:], counts[0], counts[36]
+for i in range(0, 37, 2):
+    del counts[i]
+print sorted(counts.keys())[:3], 0 in counts, 1 in counts
+for i in range(0, 37, 4):
+    counts[i] = -i
+print counts[4], sorted(counts.keys())[:5]
+
+words = {}
+for w in ['a', 'b', 'a', 'c', 'b', 'a']:
+    words[w] = words.get(w, 0) + 1
+print sorted(words.keys()), words['a'], words['b'], words['c']
+
+# Set algebra, in place and not.
+a = set([1, 2, 3, 4])
+b = set([3, 4, 5])
+print sorted(a & b), sorted(a | b), sorted(a - b), sorted(a ^ b)
+c = set([1, 2, 3, 4])
+c &= b
+print sorted(c)
+c |= set([7, 8])
+print sorted(c)
+c -= set([3, 8])
+print sorted(c)
+c ^= set([4, 9])
+print sorted(c)
+print 7 in c, 4 in c, set([7]) < c
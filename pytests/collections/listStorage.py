@@ -0,0 +1,54 @@
+# Lists of ints, of floats and from range() keep their items in compact
+# storage, until something else is stored in them.
+
+r = range(10)
+print r, r[3], r[-1], r[2:8:2], r[::-1]
+r.append(10)
+print r
+r.append('x')
+print r
+r2 = range(5)
+r2[1] = 2.5
+print r2
+f = [1.5, 2.5]
+f.append(3.0)
+print f, f + [4.5], f + [1]
+f.append(7)
+print f
+e = []
+e.append(1.25)
+e.append(2.5)
+print e
+e2 = []
+e2.append('a')
+print e2
+m = [[float(i * j) for j in range(3)] for i in range(3)]
+print m
+i = [1, 2, 3, 4, 5]
+del i[1]
+print i
+del i[::2]
+print i
+big = range(2147483640, 2147483650, 3)
+print big
+big.append(1)
+print big
+n = range(10, 0, -3)
+print n, len(n) if False else 0
+total = 0
+for x in range(1000):
+    total += x
+print total
+xs = [1, 2, 3]
+for x in xs:
+    if x == 2:
+        xs.append(2.5)
+print xs
+print list(range(4)), list(xs), 3 in range(5), 7 in range(5)
+y = range(3)
+y[0] = 'zero'
+print y
+print range(0), range(5, 1)
+z = [True, 1]
+print z
+print [1, 2] + ['a']
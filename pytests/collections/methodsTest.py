@@ -0,0 +1,33 @@
+# Methods of built-in collections, called directly and through bound methods.
+a = [1, 2]
+b = [3]
+push = a.append
+push(5)
+b.append(4)
+push(6)
+print a, b
+
+d = {'x': 1}
+get = d.get
+print get('x'), get('y', 2), d.get('x'), d.get('y', 3)
+
+# Arguments that are not simple loads.
+a.append(d.get('x') + 1)
+b.append(a[0] * 10)
+print a, b
+
+# The same call site with different receivers.
+for lst in [a, b]:
+    lst.append(0)
+print a, b
+
+fns = [a.append, b.append]
+for fn in fns:
+    fn(-1)
+print a, b
+
+getattr(b, 'append')(7)
+print b
+print hasattr(a, 'append'), hasattr(d, 'keys'), hasattr(a, 'nope')
+print [d.get(k, 0) for k in ['x', 'y', 'x']]
+print sorted(d.keys())
@@ -0,0 +1,126 @@
+# Loops and functions that run often enough to be compiled when the compiler
+# is enabled; the results must not depend on it.
+
+def add(a, b):
+    return a + b
+
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+def count_evens(xs):
+    n = 0
+    for x in xs:
+        if x % 2 == 0:
+            n += 1
+        else:
+            continue
+    return n
+
+def gen(n):
+    i = 0
+    while i < n:
+        yield i * i
+        i += 1
+
+def sum_squares(n):
+    g = gen(n)
+    s = 0
+    for k in range(n):
+        s += g.next()
+    return s
+
+def safe_div(a, b):
+    try:
+        return a // b
+    except ZeroDivisionError:
+        return -1
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+total = 0
+i = 0
+while i < 3000:
+    total = add(total, i)
+    i += 1
+print total
+
+print fib(15)
+print count_evens(range(2500))
+
+print sum_squares(2000)
+
+errors = 0
+for j in range(1500):
+    if safe_div(j, j % 3) == -1:
+        errors += 1
+print errors
+
+# Overflow into longs, mixed types and identity tests.
+big = 1
+for k in range(100):
+    big = big * 3
+print big
+f = 0
+for k in range(1200):
+    f = f + 0.5
+print f
+words = []
+for k in range(1200):
+    if k is not None and not k % 400:
+        words.append(str(k))
+print words
+
+acc = 0
+for k in range(2000):
+    p = Point(k, -k)
+    acc += p.x - p.y
+    if k > 1800:
+        break
+print acc
+
+x = 0
+for a in range(40):
+    for b in range(40):
+        x, y = b, a
+        x = x + y
+print x
+
+# Floats, and indexing lists, which are compiled inline.
+def norm2(v):
+    s = 0.0
+    for k in range(len(v)):
+        s = s + v[k] * v[k]
+    return s
+
+def ratios(xs):
+    out = []
+    for k in range(len(xs) - 1):
+        try:
+            out.append(xs[k] / xs[k + 1])
+        except ZeroDivisionError:
+            out.append(-1.0)
+    return out
+
+def lookup(xs, k):
+    return xs[k]
+
+vec = [0.5 * k for k in range(300)]
+print norm2(vec), norm2([1, 2, 3])
+print ratios([1.0, 2.0, 0.0, 4.0, 8.0])
+hits = 0
+for k in range(-300, 300):
+    if lookup(vec, k) is not None:
+        hits += 1
+print hits
+mixed = [1, 2.5, 3, 4.5]
+t = 0.0
+for k in range(1000):
+    t = t + mixed[k % 4] - mixed[(k + 1) % 4] * 0.5
+    if t > 1e6 or t < -1e6 or t == 123.0 or t != t:
+        break
+print t
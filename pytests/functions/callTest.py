@@ -0,0 +1,65 @@
+# Calls with positional arguments reuse frames. Make sure nothing carries
+# over from one call to the next.
+
+def add(a, b=10, c=100):
+    return a + b + c
+
+print add(1)
+print add(1, 2)
+print add(1, 2, 3)
+
+def depth(n):
+    if n == 0:
+        return 0
+    return depth(n - 1) + 1
+
+print depth(200)
+print depth(3)
+
+def fresh(x):
+    seen = locals()
+    y = x * 2
+    return seen
+
+print fresh(1)
+print fresh(2)
+
+def adder(k):
+    def add(x):
+        return x + k
+    return add
+
+add1 = adder(1)
+add5 = adder(5)
+print add1(1), add5(1), add1(2)
+
+def unbound(flag):
+    if flag:
+        z = 1
+    try:
+        return z
+    except UnboundLocalError:
+        return -1
+
+print unbound(True)
+print unbound(False)
+
+def gen(n):
+    i = 0
+    while i < n:
+        yield i
+        i += 1
+
+def firstTwo(n):
+    g = gen(n)
+    print g.next(), g.next()
+
+firstTwo(5)
+firstTwo(3)
+
+def walk(tree):
+    if tree is None:
+        return 0
+    return walk(tree[0]) + tree[1] + walk(tree[2])
+
+print walk(((None, 1, None), 2, ((None, 3, None), 4, None)))
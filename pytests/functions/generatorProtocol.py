@@ -0,0 +1,101 @@
+# Generators resumed by for loops, next() and send(), including chains of
+# generators and generators that finish or raise.
+
+def gen_123():
+    yield 1
+    yield 2
+    yield 3
+
+def squares(xs):
+    for x in xs:
+        yield x * x
+
+def evens(xs):
+    for x in xs:
+        if x % 2 == 0:
+            yield x
+
+def total(xs):
+    s = 0
+    for x in xs:
+        s += x
+    return s
+
+print total(evens(squares(gen_123())))
+print total(squares(range(10)))
+a = gen_123()
+b = gen_123()
+print a.next(), b.next(), a.next(), b.next()
+
+def acc():
+    total = 0
+    while True:
+        x = yield total
+        total += x
+
+g = acc()
+print g.next()
+print g.send(5), g.send(10)
+try:
+    g2 = gen_123()
+    g2.send(3)
+except TypeError:
+    print 'send to new'
+g3 = gen_123()
+for x in g3:
+    pass
+try:
+    g3.next()
+except StopIteration:
+    print 'exhausted'
+for x in g3:
+    print 'never'
+def bad():
+    yield 1
+    raise ZeroDivisionError
+g4 = bad()
+print g4.next()
+try:
+    g4.next()
+except ZeroDivisionError:
+    print 'raised'
+try:
+    g4.next()
+except StopIteration:
+    print 'finished after raise'
+def nested():
+    for i in xrange(3):
+        for j in gen_123():
+            if j == 2:
+                break
+            yield i, j
+for p in nested():
+    print p
+
+# Native code that reads the items of generators
+print list(gen_123()), tuple(squares(gen_123())), sorted(set(evens(range(7))))
+print list(x for x in 'abc'), tuple(evens([])), list(nested())
+print any(evens([1, 3, 4])), any(evens([1, 3])), all(squares([1, 2])), all(squares([1, 0]))
+g5 = gen_123()
+print any(x == 2 for x in g5), g5.next()
+print 2 in gen_123(), 5 in gen_123(), 3 not in gen_123(), 'b' not in (c for c in 'xyz')
+g6 = gen_123()
+print 1 in g6, list(g6)
+l = [0, 1, 2, 3]
+l[1:3] = squares([4, 5, 6])
+print l
+l[:] = gen_123()
+print l
+l[::2] = (x * 10 for x in range(2))
+print l
+d = {}
+d['g'] = g6
+print d['g'] is g6
+try:
+    acc().send()
+except TypeError:
+    print 'send with no argument'
+try:
+    acc().send(1, 2)
+except TypeError:
+    print 'send with two arguments'
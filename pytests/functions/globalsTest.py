@@ -0,0 +1,36 @@
+def get_abs(x):
+    return abs(x)
+
+def get_value():
+    return value
+
+value = 1
+results = []
+for i in range(3):
+    results.append(get_value())
+    results.append(get_abs(-2))
+print results
+
+# Shadowing a builtin with a global must be seen by later lookups.
+def abs(x):
+    return -1
+print get_abs(-2)
+del abs
+print get_abs(-2)
+
+# Rebinding through a global statement.
+def set_value(v):
+    global value
+    value = v
+set_value(2)
+print get_value()
+
+# Rebinding through the globals() dictionary.
+globals()['value'] = 3
+print get_value()
+
+# Module-level name lookups.
+for i in range(2):
+    print value, abs(-3)
+value = 4
+print value
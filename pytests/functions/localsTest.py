@@ -0,0 +1,46 @@
+def positional(a, b, c=3):
+    d = a + b + c
+    return d
+
+print positional(1, 2), positional(1, 2, 4), positional(1, c=5, b=2)
+
+def varargs(a, *rest):
+    return a, rest
+
+print varargs(1), varargs(1, 2, 3)
+
+def varkw(a, **kw):
+    return a, sorted(kw.keys())
+
+print varkw(1, x=2, y=3), varkw(a=4)
+
+def show_locals(x, y=2):
+    z = x * y
+    return sorted(locals().keys())
+
+print show_locals(3)
+
+def counter(start):
+    def inc():
+        return start + 1
+    return inc
+
+print counter(41)()
+
+def deleted():
+    x = 1
+    del x
+    try:
+        return x
+    except UnboundLocalError:
+        return "unbound"
+
+print deleted()
+
+def shadow(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total, i
+
+print shadow(5)
@@ -0,0 +1,44 @@
+# Arithmetic around the edges of the small int cache.
+for a in [-7, -6, -5, -1, 0, 1, 255, 256, 257]:
+    print a, a + 1, a - 1, a * 2, a % 3, -a, a << 1, a >> 1, a & 5, a | 5, a ^ 5
+
+x = 200
+y = x + 56
+z = 128 * 2
+print y == z, y is z
+
+total = 0
+i = 0
+while i < 1000:
+    if i >= 990 and i <= 995:
+        total += i
+    i += 1
+print total, i > 999, i != 1000
+
+# Negative shift counts raise, for ints and longs alike.
+try:
+    print 1 << -1
+except ValueError:
+    print 'int lshift'
+try:
+    print 4 >> -1
+except ValueError:
+    print 'int rshift'
+try:
+    print 2 ** 70 << -3
+except ValueError:
+    print 'long lshift'
+try:
+    print 2 ** 70 >> -2 ** 40
+except ValueError:
+    print 'long rshift'
+try:
+    print 5 >> -2 ** 40
+except ValueError:
+    print 'int rshift by a long count'
+x = 3
+try:
+    x <<= -2
+except ValueError:
+    print 'inplace', x
+print 1 << 0, 4 >> 0, -8 >> 1, 2 ** 70 >> 68, 3 << 40
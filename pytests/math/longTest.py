@@ -0,0 +1,31 @@
+a = 12345678901234567890L
+b = -98765432109876543210L
+print a + b, a - b, a * b
+print a // 7, b // 7, a % 7, b % 7, a % -7
+print divmod(b, 1000)
+print a & 0xffff, a | 1, a ^ b, ~a
+print a << 5, b >> 5, 1L << 100
+print 2L ** 100, 3L ** 0
+print -a, abs(b)
+print a > b, a == 12345678901234567890L, b < -1
+print long(5), int(2L ** 10), int(2L ** 80)
+
+# Ints promote to longs on overflow.
+x = 2 ** 62
+print x * 4, x + x, 1 << 70
+print 10 ** 20, -10 ** 20
+
+# int() of a float that isn't finite
+try:
+    int(float('inf'))
+except OverflowError:
+    print 'OverflowError'
+try:
+    int(-1e308 * 10)
+except ArithmeticError:
+    print 'ArithmeticError'
+try:
+    int(float('nan'))
+except ValueError:
+    print 'ValueError'
+print int(2.5), int(-1e20)
@@ -0,0 +1,77 @@
+# The same operations run on different types, enough times for each site to
+# be specialized for the first type it sees and then to see others.
+
+def combine(a, b):
+    return a + b, a - b, a * b, a // b, a % b, a < b, a == b, a > b
+
+def run(pairs):
+    last = None
+    for a, b in pairs:
+        last = combine(a, b)
+    return last
+
+print run([(i, 3) for i in range(50)])
+print run([(i * 0.5, 2.0) for i in range(50)])
+print run([(2 ** 40, 7), (5, 2 ** 40)])
+print run([(i, 1.5) for i in range(20)])
+
+def concat(xs):
+    s = xs[0]
+    for x in xs[1:]:
+        s = s + x
+    return s
+
+print concat(['ab'[i % 2] for i in range(40)])
+print concat([[i % 2 + 1] for i in range(20)])
+
+def compare(xs, y):
+    n = 0
+    for x in xs:
+        if x < y:
+            n += 1
+    return n
+
+print compare(range(100), 50)
+print compare(['abc'[i % 3] for i in range(30)], 'b')
+print compare([0.5 * i for i in range(30)], 7)
+
+def index(xs, idx):
+    total = 0
+    for i in idx:
+        total += xs[i]
+    return total
+
+print index(range(100), range(0, 100, 3))
+print index((1, 2, 3), [i % 3 for i in range(30)])
+
+def iterate(seq):
+    n = 0
+    for x in seq:
+        n += 1
+    return n
+
+for seq in [range(20), xrange(20), range(5), (1, 2, 3), xrange(3), [1, 2]]:
+    print iterate(seq)
+
+def order(pairs):
+    lt = le = eq = ne = gt = ge = 0
+    for a, b in pairs:
+        if a < b:
+            lt += 1
+        if a <= b:
+            le += 1
+        if a == b:
+            eq += 1
+        if a != b:
+            ne += 1
+        if a > b:
+            gt += 1
+        if a >= b:
+            ge += 1
+    return lt, le, eq, ne, gt, ge
+
+print order([(0.5 * i, 3.0) for i in range(20)])
+print order([('abc'[i % 3], 'b') for i in range(30)])
+print order([('B', 'a'), ('a', 'B'), ('ab', 'a'), ('', 'a'), ('Z', 'Z')])
+print order([(i, 2.5) for i in range(6)] + [(1.5, i) for i in range(4)])
+print 1.5 >= 1.0, 1.0 >= 1.5, 'b' >= 'a', 'a' <= 'a', 'a' != 'b', 2 >= 1.5
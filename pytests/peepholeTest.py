@@ -0,0 +1,67 @@
+# Patterns the peephole optimizer rewrites; the results must not depend on
+# it.
+
+def consts():
+    return 2 ** 10, 7 // 2, 1 << 5, -8 >> 1, 3 - 5, 6 ^ 3, 2.5 * 2
+
+def div_zero():
+    try:
+        return 3 % 0
+    except ZeroDivisionError:
+        return 'caught'
+
+def classify(n):
+    if n < 0:
+        if n < -10:
+            return 'very negative'
+        else:
+            return 'negative'
+    elif n == 0:
+        return 'zero'
+    else:
+        if n > 10:
+            return 'big'
+        return 'small'
+
+def count(limit):
+    i = 0
+    hits = 0
+    while i < limit:
+        if i % 3 == 0 or i % 5 == 0:
+            hits += 1
+        i += 1
+    return hits
+
+def compare_strings(a, b):
+    if a == b:
+        return 'same'
+    if a < b:
+        return 'less'
+    return 'greater'
+
+def swap(a, b):
+    t = a
+    a = b
+    b = t
+    return a, b
+
+def unbound(flag):
+    if flag:
+        x = 1
+    try:
+        return x + x
+    except UnboundLocalError:
+        return 'unbound'
+
+def nothing():
+    return None
+
+print consts()
+print div_zero()
+for n in [-20, -3, 0, 4, 40]:
+    print classify(n)
+print count(100)
+print compare_strings('abc', 'abc'), compare_strings('abc', 'abd'), compare_strings('b', 'a')
+print swap(1, 'two')
+print unbound(True), unbound(False)
+print nothing()
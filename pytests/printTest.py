@@ -0,0 +1,12 @@
+# Items on one line are separated by spaces, except after a tab or a newline
+print 1, 2, 3
+print "a\t", "b"
+print "c\n", "d"
+print "e",
+print "f"
+print
+
+# Enough output to fill the output buffer a few times over
+for i in range(20000):
+    print "line", i, "of the report"
+print "done"
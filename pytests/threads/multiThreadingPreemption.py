@@ -0,0 +1,43 @@
+import thread
+
+# None of the loops below make function calls, so the threads only get to
+# run in turn if the scheduler preempts them.
+done = False
+count = 0
+
+def worker(arg):
+    global count, done
+    i = 0
+    while i < 5000:
+        i += 1
+    count = i
+    done = True
+
+thread.start_new_thread(worker, (1,))
+while not done:
+    pass
+print "Worker finished:", count
+
+first = False
+second = False
+finished = 0
+
+def spinFirst(arg):
+    global first, finished
+    first = True
+    while not second:
+        pass
+    finished += 1
+
+def spinSecond(arg):
+    global second, finished
+    second = True
+    while not first:
+        pass
+    finished += 1
+
+thread.start_new_thread(spinFirst, (1,))
+thread.start_new_thread(spinSecond, (1,))
+while finished < 2:
+    pass
+print "Both spinners finished"
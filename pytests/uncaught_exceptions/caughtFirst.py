@@ -0,0 +1,23 @@
+# Exceptions caught along the way don't show up in the traceback of the
+# uncaught one
+def lookup(n):
+    try:
+        return missing
+    except NameError:
+        return n
+
+def divide(a, b):
+    try:
+        return a // b
+    except ZeroDivisionError:
+        return 0
+
+total = 0
+for i in range(1000):
+    total = total + lookup(i) + divide(i, i % 3)
+print total
+
+def fail():
+    return 1 // 0
+
+fail()
@@ -1,4 +1,3 @@
-/// <reference path="../bower_components/DefinitelyTyped/async/async.d.ts" />
 import iterator = require('./iterator');
 import {Py_List, Py_Tuple, Py_Dict, Py_Set} from './collections';
 import {Ellipsis, False, None, NotImplemented, Py_Complex, Py_Float,
@@ -7,20 +6,20 @@ import {Ellipsis, False, None, NotImplemented, Py_Complex, Py_Float,
 import {IPy_FrameObj, IPy_Function, IPy_Number, IPy_Object, Iterable, Iterator
        } from './interfaces';
 import {Py_TrampolineFrameObject, Py_SyncNativeFuncObject,
-        Py_AsyncNativeFuncObject
+        Py_AsyncNativeFuncObject, Py_NativeMethod, Py_BoundNativeMethod
        } from './nativefuncobject';
+import Py_GeneratorObject = require('./genobject');
 import {BaseException, KeyboardInterrupt, Exception, NameError, ArithmeticError,
-        ZeroDivisionError, TypeError, AttributeError, StopIteration, ThreadError,
-        ImportError
+        ZeroDivisionError, TypeError, ValueError, AttributeError, StopIteration,
+        ThreadError, ImportError, UnboundLocalError, OverflowError
        } from './exceptions';
+import {initSlots, getAttr, setAttr, hasAttr} from './shape';
 import enums = require('./enums');
 import {Thread} from './threading';
 import path = require('path');
-import fs = require('fs');
-import async = require('async');
 // !! Use only for type info !!
-import _unmarshal = require('./unmarshal');
 import _Py_FrameObject = require('./frameobject');
+import _Py_CodeObject = require('./codeobject');
 
 // range function
 function range(t: Thread, f: IPy_FrameObj, args: Py_Int[], kwargs: Py_Dict): Py_List {
@@ -49,27 +48,36 @@ function range(t: Thread, f: IPy_FrameObj, args: Py_Int[], kwargs: Py_Dict): Py_
         default:
             throw new Error('TypeError: range() expects 1-3 int arguments')
     }
-    var it = iterator.xrange(t, f, [new Py_Int(start), new Py_Int(stop), new Py_Int(step)], {});
-    return Py_List.fromIterable(it);
+    var length = 0;
+    if (step > 0 && start < stop) {
+        length = 1 + Math.floor((stop - 1 - start) / step);
+    } else if (step < 0 && start > stop) {
+        length = 1 + Math.floor((start - 1 - stop) / -step);
+    }
+    // The list doesn't store its items until it's changed.
+    return Py_List.fromRange(start, step, length);
 }
 
 // list constructor
-function list(t: Thread, f: IPy_FrameObj, args: Iterable[], kwargs: Py_Dict): Py_List {
+function list(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
     if (kwargs.len() > 0) {
         throw new Error('TypeError: list() takes no keyword arguments')
     }
     if (args.length == 0) {
-        return new Py_List([]);
+        cb(new Py_List([]));
+        return;
     }
     if (args.length > 1) {
         throw new Error('TypeError: list() take 0-1 arguments');
     }
     var x = args[0];
     if (x instanceof Py_List) {
-      // TODO: Shouldn't TypeScript 1.4 infer the type here?
-      return <Py_List> x;
+      cb(x);
+    } else if (nativeIter(x) !== null) {
+      cb(Py_List.fromIterable(<Iterable> x));
+    } else {
+      collect(t, f, x, (items: IPy_Object[]) => cb(new Py_List(items.slice(0))));
     }
-    return Py_List.fromIterable(x);
 }
 
 // object constructor function
@@ -84,63 +92,79 @@ function dict(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict):
 }
 
 // tuple constructor
-function tuple(t: Thread, f: IPy_FrameObj, args: Iterable[], kwargs: Py_Dict): Py_Tuple {
+function tuple(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
     if (kwargs.len() > 0) {
         throw new Error('TypeError: tuple() takes no keyword arguments')
     }
     if (args.length == 0) {
-        return new Py_Tuple([]);
+        cb(new Py_Tuple([]));
+        return;
     }
     if (args.length > 1) {
         throw new Error('TypeError: tuple() take 0-1 arguments');
     }
     var x = args[0];
     if (x instanceof Py_Tuple) {
-        return <Py_Tuple> x;
+        cb(x);
+    } else if (nativeIter(x) !== null) {
+        cb(Py_Tuple.fromIterable(<Iterable> x));
+    } else {
+        collect(t, f, x, (items: IPy_Object[]) => cb(new Py_Tuple(items.slice(0))));
     }
-    return Py_Tuple.fromIterable(x);
 }
 
 // set constructor
-function set(t: Thread, f: IPy_FrameObj, args: Iterable[], kwargs: Py_Dict): Py_Set {
+function set(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
     if (kwargs.len() > 0) {
         throw new Error('TypeError: set() takes no keyword arguments')
     }
     if (args.length == 0) {
-        return new Py_Set();
+        cb(new Py_Set());
+        return;
     }
     if (args.length > 1) {
         throw new Error('TypeError: set() take 0-1 arguments');
     }
     var x = args[0];
     if (x instanceof Py_Set) {
-        return <Py_Set> x;
+        cb(x);
+    } else if (nativeIter(x) !== null) {
+        cb(Py_Set.fromIterable(<Iterable> x));
+    } else {
+        collect(t, f, x, (items: IPy_Object[]) => cb(Py_Set.fromArray(items)));
     }
-    return Py_Set.fromIterable(x);
 }
 
 function abs(t: Thread, f: IPy_FrameObj, args: Iterable[], kwargs: Py_Dict): IPy_Object {
     return args[0].__abs__(t);
 }
 
-function all(x: Iterable): typeof True {
-  var it = x.iter();
-  for (var val = it.next(); val != null; val = it.next()) {
-    if (bool(val) === False) {
-      return False;
-    }
+// all(iterable), which stops at the first false item.
+function all(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (args.length != 1) {
+    throw new Error('TypeError: all() takes one argument');
   }
-  return True;
+  forEach(t, f, args[0], (item: IPy_Object, next: () => void) => {
+    if (bool(item) === False) {
+      cb(False);
+    } else {
+      next();
+    }
+  }, () => cb(True));
 }
 
-function any(x: Iterable): typeof True {
-  var it = x.iter();
-  for (var val = it.next(); val != null; val = it.next()) {
-    if (bool(val) === True) {
-      return True;
-    }
+// any(iterable), which stops at the first true item.
+function any(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (args.length != 1) {
+    throw new Error('TypeError: any() takes one argument');
   }
-  return False;
+  forEach(t, f, args[0], (item: IPy_Object, next: () => void) => {
+    if (bool(item) === True) {
+      cb(True);
+    } else {
+      next();
+    }
+  }, () => cb(False));
 }
 
 function bool(x: IPy_Object): typeof True {
@@ -160,7 +184,7 @@ function chr(x: Py_Int): Py_Str {
 }
 
 function ord(x: IPy_Object): Py_Int {
-  return new Py_Int(x.toString().charCodeAt(0));
+  return Py_Int.fromNumber(x.toString().charCodeAt(0));
 }
 
 function str(t: Thread, f: IPy_FrameObj, args: Iterable[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
@@ -185,17 +209,17 @@ function cmp(t: Thread, f: IPy_FrameObj, args: Iterable[], kwargs: Py_Dict, cb:
   if (x.__eq__ && x.__lt__) {
     var y = args[1];
     if (x.__eq__(y) === True) {
-      cb(new Py_Int(0));
+      cb(Py_Int.fromNumber(0));
     } else {
-      cb(new Py_Int(x.__lt__(y) === True ? -1 : 1));
+      cb(Py_Int.fromNumber(x.__lt__(y) === True ? -1 : 1));
     }
   } else {
     x.$__eq__.exec_from_native(t, f, args, kwargs, (rv: IPy_Object) => {
       if (rv === True) {
-        cb(new Py_Int(0));
+        cb(Py_Int.fromNumber(0));
       } else {
         x.$__lt__.exec_from_native(t, f, args, kwargs, (rv: IPy_Object) => {
-          cb(new Py_Int(rv === True ? -1 : 1));
+          cb(Py_Int.fromNumber(rv === True ? -1 : 1));
         });
       }
     });
@@ -223,7 +247,13 @@ function float(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict):
     return new Py_Float(0);
   } else if (args.length == 1) {
     if (args[0] instanceof Py_Str) {
-      return new Py_Float(parseFloat(args[0].toString()));
+      var str = args[0].toString().trim().toLowerCase(),
+        sign = str.charAt(0) === '-' ? -1 : 1,
+        unsigned = str.replace(/^[+-]/, '');
+      if (unsigned === 'inf' || unsigned === 'infinity') {
+        return new Py_Float(sign * Infinity);
+      }
+      return new Py_Float(unsigned === 'nan' ? NaN : parseFloat(str));
     }
     return new Py_Float((<Py_Int> args[0]).toNumber());
   } else {
@@ -244,29 +274,53 @@ function hex(x: Py_Int): Py_Str {
   return Py_Str.fromJS(ret);
 }
 
-function int(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): Py_Int {
+// Returns x as an int if it fits in one, and as a long otherwise.
+function intFromNumber(x: number): Py_Int | Py_Long {
+  var n = x < 0 ? Math.ceil(x) : Math.floor(x);
+  if (n <= 9007199254740991 && n >= -9007199254740991) {
+    return Py_Int.fromNumber(n);
+  }
+  return Py_Long.fromNumber(n);
+}
+
+function int(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): Py_Int | Py_Long {
   if (kwargs.get(new Py_Str('base')) !== undefined) {
     args.push(kwargs.get(new Py_Str('base')));
   }
   switch (args.length) {
     case 0:
-      return new Py_Int(0);
+      return Py_Int.fromNumber(0);
     case 1:
       var arg1 = args[0];
       switch(arg1.getType()) {
         case enums.Py_Type.INT:
           return <Py_Int> arg1;
         case enums.Py_Type.LONG:
+          return (<Py_Long> arg1).fitsInJsNumber() ? Py_Int.fromNumber((<Py_Long> arg1).toNumber()) : <Py_Long> arg1;
         case enums.Py_Type.FLOAT:
-          return new Py_Int((<Py_Long | Py_Float> arg1).toNumber() | 0);
+          var x = (<Py_Float> arg1).toNumber();
+          if (!isFinite(x)) {
+            // The result is ignored once the exception is raised.
+            (<_Py_FrameObject> f).raise_exception_here(t, `cannot convert float ${isNaN(x) ? 'NaN' : 'infinity'} to integer`,
+              isNaN(x) ? "ValueError" : "OverflowError");
+            return Py_Int.fromNumber(0);
+          }
+          return intFromNumber(x);
         default:
-          return new Py_Int(parseInt(arg1.toString(), 10));
+          var str = arg1.toString().trim(),
+            n = parseInt(str, 10);
+          return isNaN(n) || (n <= 9007199254740991 && n >= -9007199254740991) ?
+            Py_Int.fromNumber(n) : Py_Long.fromString(str);
       }
     case 2:
-      return new Py_Int(parseInt(args[0].toString(), (<Py_Int> args[1]).toNumber()));
+      return intFromNumber(parseInt(args[0].toString(), (<Py_Int> args[1]).toNumber()));
   }
 }
 
+function long(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): Py_Long {
+  return int(t, f, args, kwargs).asLong();
+}
+
 // builtin iter()
 function iter(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): Iterator {
   if (kwargs.len() > 0) {
@@ -281,35 +335,777 @@ function iter(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict):
   throw new Error('TypeError: iter() takes 1-2 arguments');
 }
 
-function sorted(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): Py_List {
-  // sorted(iterable, cmp=None, key=None, reverse=False) --> new sorted list
+// Native code reads the items of native iterables in a loop. The items of
+// generators and user-defined iterables come from running their code on
+// the thread instead, so the helpers below take callbacks, which then run
+// later on, from the bytecode loop.
+
+// Runs body for as long as it calls next before returning. If body calls
+// next later on, from a callback, the loop carries on from there.
+function loop(body: (next: () => void) => void): void {
+  var running = false, again = false;
+  function next(): void {
+    if (running) {
+      again = true;
+      return;
+    }
+    running = true;
+    do {
+      again = false;
+      body(next);
+    } while (again);
+    running = false;
+  }
+  next();
+}
+
+// Calls func with args for native code running on behalf of frame f, and
+// then cb with the result.
+function callFromNative(t: Thread, f: IPy_FrameObj, func: IPy_Object, args: IPy_Object[], cb: (rv: IPy_Object) => void): void {
+  var fn = <any> func, top = t.getTopOfStack();
+  if (fn instanceof Py_SyncNativeFuncObject || fn instanceof Py_BoundNativeMethod) {
+    cb(fn.call(t, f, args, new Py_Dict()));
+    return;
+  }
+  if (fn.exec_from_native === undefined) {
+    // A class.
+    fn = fn.$__call__;
+  }
+  (<IPy_Function> fn).exec_from_native(t, f, args, new Py_Dict(), cb);
+  if (t.getTopOfStack() !== top) {
+    // The thread may be waiting on the trampoline frame that called us.
+    t.setStatus(enums.ThreadStatus.RUNNABLE);
+  }
+}
+
+// The iterator over x, if native code can read the items itself, or null.
+function nativeIter(x: IPy_Object): Iterator {
+  var it = <any> x;
+  if (x instanceof Py_GeneratorObject) {
+    return null;
+  }
+  if (typeof it.iter === 'function') {
+    return it.iter();
+  }
+  return typeof it.next === 'function' ? it : null;
+}
+
+// Calls each with the items of x in turn, and then done. each calls next to
+// go on to the next item.
+function forEach(t: Thread, f: IPy_FrameObj, x: IPy_Object, each: (item: IPy_Object, next: () => void) => void, done: () => void): void {
+  if (nativeIter(x) === null && (<any> x).$__iter__ !== undefined && !(x instanceof Py_GeneratorObject)) {
+    callFromNative(t, f, (<any> x).$__iter__, [], (it: IPy_Object) => {
+      forEachOf(t, f, it, each, done);
+    });
+  } else {
+    forEachOf(t, f, x, each, done);
+  }
+}
+
+// Like forEach, for the iterator it.
+function forEachOf(t: Thread, f: IPy_FrameObj, it: IPy_Object, each: (item: IPy_Object, next: () => void) => void, done: () => void): void {
+  var native = nativeIter(it);
+  if (native !== null) {
+    loop((next: () => void) => {
+      var item = native.next();
+      if (item == null) {
+        done();
+      } else {
+        each(item, next);
+      }
+    });
+  } else if (it instanceof Py_GeneratorObject) {
+    loop((next: () => void) => {
+      (<Py_GeneratorObject> it).resumeFromNative(t, f, (item: IPy_Object) => {
+        if (item === null) {
+          done();
+        } else {
+          each(item, next);
+        }
+      });
+    });
+  } else if ((<any> it).$next !== undefined) {
+    loop((next: () => void) => {
+      nextFromPython(t, f, (<any> it).$next, (item: IPy_Object) => {
+        if (item === null) {
+          done();
+        } else {
+          each(item, next);
+        }
+      });
+    });
+  } else {
+    throw new Error(`TypeError: object is not iterable`);
+  }
+}
+
+// Calls a user-defined iterator's next method, then cb with the item, or
+// null once the method raises StopIteration. A trampoline frame catches the
+// exception; any other exception is raised again in f.
+function nextFromPython(t: Thread, f: IPy_FrameObj, next: IPy_Function, cb: (item: IPy_Object) => void): void {
+  var catcher = new Py_TrampolineFrameObject(f, new Py_Dict(), (rv: IPy_Object, exc: IPy_Object) => {
+    if (exc === null) {
+      cb(rv);
+    } else if (isinstance(t, f, [exc, StopIteration.prototype], null) === True) {
+      cb(null);
+    } else {
+      t.setStatus(enums.ThreadStatus.RUNNABLE);
+      t.throwException(exc);
+    }
+  }, true);
+  t.framePush(catcher);
+  callFromNative(t, catcher, next, [], (rv: IPy_Object) => {
+    catcher.resume(rv, null);
+    t.setStatus(enums.ThreadStatus.RUNNABLE);
+  });
+  t.setStatus(enums.ThreadStatus.RUNNABLE);
+}
+
+// Calls cb with the items of x in an array, which the caller must not
+// change.
+function collect(t: Thread, f: IPy_FrameObj, x: IPy_Object, cb: (items: IPy_Object[]) => void): void {
+  if (x instanceof Py_List || x instanceof Py_Tuple) {
+    cb((<Py_List> x).toArray());
+    return;
+  }
+  var items: IPy_Object[] = [];
+  forEach(t, f, x, (item: IPy_Object, next: () => void) => {
+    items.push(item);
+    next();
+  }, () => cb(items));
+}
+
+// Calls cb with whether item is one of the items of x, which stops there.
+function contains(t: Thread, f: IPy_FrameObj, x: IPy_Object, item: IPy_Object, cb: (found: boolean) => void): void {
+  forEach(t, f, x, (y: IPy_Object, next: () => void) => {
+    equals(t, f, item, y, (eq: boolean) => {
+      if (eq) {
+        cb(true);
+      } else {
+        next();
+      }
+    });
+  }, () => cb(false));
+}
+
+// Like collect, for each of xs.
+function collectAll(t: Thread, f: IPy_FrameObj, xs: IPy_Object[], cb: (columns: IPy_Object[][]) => void): void {
+  var columns: IPy_Object[][] = [];
+  loop((next: () => void) => {
+    if (columns.length === xs.length) {
+      cb(columns);
+      return;
+    }
+    collect(t, f, xs[columns.length], (items: IPy_Object[]) => {
+      columns.push(items);
+      next();
+    });
+  });
+}
+
+// Calls cb with a + b, worked out as BINARY_ADD would.
+function add(t: Thread, f: IPy_FrameObj, a: IPy_Object, b: IPy_Object, cb: (rv: IPy_Object) => void): void {
+  var x = <any> a, y = <any> b, rv: IPy_Object;
+  if (a.constructor === Py_Int && b.constructor === Py_Int) {
+    cb((<Py_Int> a).add(t, <Py_Int> b));
+  } else if (x.__add__ !== undefined && (rv = x.__add__(t, b)) !== NotImplemented) {
+    cb(rv);
+  } else if (x.$__add__ !== undefined) {
+    callFromNative(t, f, x.$__add__, [b], (rv: IPy_Object) => {
+      if (rv === NotImplemented && y.$__radd__ !== undefined) {
+        callFromNative(t, f, y.$__radd__, [a], cb);
+      } else {
+        cb(rv);
+      }
+    });
+  } else if (y.$__radd__ !== undefined) {
+    callFromNative(t, f, y.$__radd__, [a], cb);
+  } else {
+    throw new Error('TypeError: unsupported operand type(s) for +');
+  }
+}
+
+// Calls cb with whether a < b, worked out as COMPARE_OP would. Tuples and
+// lists are ordered item by item.
+function lessThan(t: Thread, f: IPy_FrameObj, a: IPy_Object, b: IPy_Object, cb: (lt: boolean) => void): void {
+  var x = <any> a, y = <any> b, rv: IPy_Object = NotImplemented, type = a.constructor,
+    order: number;
+  if (a.constructor === Py_Int && b.constructor === Py_Int) {
+    cb((<Py_Int> a).toNumber() < (<Py_Int> b).toNumber());
+    return;
+  }
+  if ((type === Py_Tuple || type === Py_List) && b.constructor === type) {
+    order = nativeCompare(a, b);
+    if (order !== null) {
+      cb(order < 0);
+    } else {
+      itemsLessThan(t, f, (<Py_Tuple> a).toArray().slice(0), (<Py_Tuple> b).toArray().slice(0), cb);
+    }
+    return;
+  }
+  if (x.__lt__ !== undefined) {
+    rv = x.__lt__(b);
+  }
+  if (rv === NotImplemented && y.__gt__ !== undefined) {
+    rv = y.__gt__(a);
+  }
+  if (rv !== NotImplemented) {
+    cb(bool(rv) === True);
+  } else if (x.$__lt__ !== undefined) {
+    callFromNative(t, f, x.$__lt__, [b], (rv: IPy_Object) => cb(bool(rv) === True));
+  } else if (y.$__gt__ !== undefined) {
+    callFromNative(t, f, y.$__gt__, [a], (rv: IPy_Object) => cb(bool(rv) === True));
+  } else {
+    throw new Error('TypeError: unorderable types');
+  }
+}
+
+// Calls cb with whether the tuple or list of xs goes before that of ys: as
+// their first items that aren't equal do, or else the shorter one first.
+function itemsLessThan(t: Thread, f: IPy_FrameObj, xs: IPy_Object[], ys: IPy_Object[], cb: (lt: boolean) => void): void {
+  var i = 0;
+  loop((next: () => void) => {
+    if (i === xs.length || i === ys.length) {
+      cb(xs.length < ys.length);
+      return;
+    }
+    equals(t, f, xs[i], ys[i], (eq: boolean) => {
+      if (eq) {
+        i++;
+        next();
+      } else {
+        lessThan(t, f, xs[i], ys[i], cb);
+      }
+    });
+  });
+}
+
+// Calls cb with whether a == b. Objects without __eq__ are only equal to
+// themselves.
+function equals(t: Thread, f: IPy_FrameObj, a: IPy_Object, b: IPy_Object, cb: (eq: boolean) => void): void {
+  var x = <any> a, y = <any> b;
+  if (a === b) {
+    cb(true);
+  } else if (x.$__eq__ !== undefined) {
+    callFromNative(t, f, x.$__eq__, [b], (rv: IPy_Object) => cb(bool(rv) === True));
+  } else if (y.$__eq__ !== undefined) {
+    callFromNative(t, f, y.$__eq__, [a], (rv: IPy_Object) => cb(bool(rv) === True));
+  } else {
+    cb(x.__eq__ !== undefined && y.__eq__ !== undefined && x.__eq__(b) === True);
+  }
+}
+
+// Orders a and b without running Python code: negative if a < b, zero if
+// they're equal and positive if a > b. Numbers, strings, and tuples or lists
+// of them, can be ordered this way; for anything else it returns null.
+function nativeCompare(a: IPy_Object, b: IPy_Object): number {
+  var typeA = a.constructor, typeB = b.constructor, n: number, i: number, order: number;
+  if ((typeA === Py_Int || typeA === Py_Float) && (typeB === Py_Int || typeB === Py_Float)) {
+    var x = (<Py_Int> a).toNumber(), y = (<Py_Int> b).toNumber();
+    // NaNs are left to lessThan.
+    return x < y ? -1 : y < x ? 1 : x === y ? 0 : null;
+  }
+  if (typeA === Py_Str && typeB === Py_Str) {
+    var s = a.toString(), u = b.toString();
+    return s < u ? -1 : u < s ? 1 : 0;
+  }
+  if ((typeA === Py_Tuple || typeA === Py_List) && typeB === typeA) {
+    var xs = <Py_Tuple> a, ys = <Py_Tuple> b;
+    n = Math.min(xs.len(), ys.len());
+    for (i = 0; i < n; i++) {
+      order = nativeCompare(xs.item(i), ys.item(i));
+      if (order !== 0) {
+        return order;
+      }
+    }
+    return xs.len() - ys.len();
+  }
+  return null;
+}
+
+function len(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (args.length !== 1) {
+    throw new Error('TypeError: len() takes exactly one argument');
+  }
+  var x = <any> args[0];
+  if (typeof x.len === 'function') {
+    cb(Py_Int.fromNumber(x.len()));
+  } else if (x.$__len__ !== undefined) {
+    callFromNative(t, f, x.$__len__, [], cb);
+  } else {
+    throw new Error(`TypeError: object has no len()`);
+  }
+}
+
+// Largest total of ints that sum() adds up as JS numbers, without losing
+// precision.
+const MAX_EXACT_SUM = 9007199254740991;
+
+// sum(iterable[, start])
+function sum(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (args.length < 1 || args.length > 2) {
+    throw new Error('TypeError: sum() takes 1-2 arguments');
+  }
+  var x = args[0],
+    total = args.length > 1 ? args[1] : Py_Int.fromNumber(0),
+    values: any, n: number, length: number, i: number;
+  if (x instanceof Py_List && (total.constructor === Py_Int || total.constructor === Py_Float) &&
+      (values = x.unboxed()) !== null) {
+    n = (<Py_Int> total).toNumber();
+    length = x.len();
+    if (total.constructor === Py_Float || values instanceof Float64Array) {
+      for (i = 0; i < length; i++) {
+        n += values[i];
+      }
+      cb(new Py_Float(n));
+      return;
+    }
+    // Every partial sum must be exact, too.
+    if (Math.abs(n) + length * 0x80000000 <= MAX_EXACT_SUM) {
+      for (i = 0; i < length; i++) {
+        n += values[i];
+      }
+      cb(Py_Int.fromNumber(n));
+      return;
+    }
+  }
+  forEach(t, f, x, (item: IPy_Object, next: () => void) => {
+    add(t, f, total, item, (rv: IPy_Object) => {
+      total = rv;
+      next();
+    });
+  }, () => cb(total));
+}
+
+const keyName = Py_Str.fromJS('key');
+
+// Makes min() or max(), which give the first item that no other item is
+// less than, or greater than.
+function minOrMax(name: string, isMax: boolean) {
+  return function(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+    var key = kwargs.get(keyName),
+      best: IPy_Object = null,
+      bestKey: IPy_Object = null,
+      x: IPy_Object, values: any, n: number, length: number, i: number;
+    if (kwargs.len() > (key === undefined ? 0 : 1)) {
+      throw new Error(`TypeError: ${name}() takes no keyword arguments but key`);
+    }
+    if (args.length === 0) {
+      throw new Error(`TypeError: ${name} expected 1 arguments, got 0`);
+    }
+    x = args.length === 1 ? args[0] : new Py_Tuple(args);
+    if (key === undefined || key === None) {
+      key = null;
+      if (x instanceof Py_List && (values = x.unboxed()) !== null && x.len() > 0) {
+        n = values[0];
+        length = x.len();
+        for (i = 1; i < length; i++) {
+          if (isMax ? values[i] > n : values[i] < n) {
+            n = values[i];
+          }
+        }
+        cb(values instanceof Float64Array ? new Py_Float(n) : Py_Int.fromNumber(n));
+        return;
+      }
+    }
+    forEach(t, f, x, (item: IPy_Object, next: () => void) => {
+      var compare = (itemKey: IPy_Object) => {
+        if (best === null) {
+          best = item;
+          bestKey = itemKey;
+          next();
+          return;
+        }
+        lessThan(t, f, isMax ? bestKey : itemKey, isMax ? itemKey : bestKey, (lt: boolean) => {
+          if (lt) {
+            best = item;
+            bestKey = itemKey;
+          }
+          next();
+        });
+      };
+      if (key === null) {
+        compare(item);
+      } else {
+        callFromNative(t, f, key, [item], compare);
+      }
+    }, () => {
+      if (best === null) {
+        throw new Error(`ValueError: ${name}() arg is an empty sequence`);
+      }
+      cb(best);
+    });
+  };
+}
+
+const min = minOrMax('min', false);
+const max = minOrMax('max', true);
+
+// map(function, iterable, ...): like Python 2's, a list.
+function map(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (args.length < 2) {
+    throw new Error('TypeError: map() requires at least two args');
+  }
+  var func = args[0], results: IPy_Object[] = [];
+  if (args.length === 2 && func !== None) {
+    forEach(t, f, args[1], (item: IPy_Object, next: () => void) => {
+      callFromNative(t, f, func, [item], (rv: IPy_Object) => {
+        results.push(rv);
+        next();
+      });
+    }, () => cb(new Py_List(results)));
+    return;
+  }
+  // Calls func with an item from each iterable, padding the shorter ones
+  // with None. With no function, the items themselves are the results.
+  collectAll(t, f, args.slice(1), (columns: IPy_Object[][]) => {
+    var length = Math.max.apply(null, columns.map((column: IPy_Object[]) => column.length)),
+      i = 0;
+    loop((next: () => void) => {
+      if (i === length) {
+        cb(new Py_List(results));
+        return;
+      }
+      var row = columns.map((column: IPy_Object[]) => i < column.length ? column[i] : None);
+      i++;
+      if (func !== None) {
+        callFromNative(t, f, func, row, (rv: IPy_Object) => {
+          results.push(rv);
+          next();
+        });
+      } else {
+        results.push(row.length === 1 ? row[0] : new Py_Tuple(row));
+        next();
+      }
+    });
+  });
+}
+
+// filter(function or None, iterable): a string or tuple for one of those,
+// and a list otherwise.
+function filter(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (args.length !== 2) {
+    throw new Error('TypeError: filter expected 2 arguments');
+  }
+  var func = args[0], x = args[1], kept: IPy_Object[] = [];
+  forEach(t, f, x, (item: IPy_Object, next: () => void) => {
+    if (func === None) {
+      if (bool(item) === True) {
+        kept.push(item);
+      }
+      next();
+    } else {
+      callFromNative(t, f, func, [item], (rv: IPy_Object) => {
+        if (bool(rv) === True) {
+          kept.push(item);
+        }
+        next();
+      });
+    }
+  }, () => {
+    if (x instanceof Py_Str) {
+      cb(Py_Str.fromJS(kept.join('')));
+    } else if (x instanceof Py_Tuple) {
+      cb(new Py_Tuple(kept));
+    } else {
+      cb(new Py_List(kept));
+    }
+  });
+}
+
+// zip(iterable, ...): a list of tuples, as long as the shortest iterable.
+function zip(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  var tuples: IPy_Object[] = [],
+    its = args.map(nativeIter),
+    row: IPy_Object[], item: IPy_Object, i: number;
+  if (its.indexOf(null) === -1) {
+    // Read the iterables together, up to the end of the shortest.
+    while (its.length > 0) {
+      row = [];
+      for (i = 0; i < its.length; i++) {
+        if ((item = its[i].next()) == null) {
+          cb(new Py_List(tuples));
+          return;
+        }
+        row.push(item);
+      }
+      tuples.push(new Py_Tuple(row));
+    }
+    cb(new Py_List(tuples));
+    return;
+  }
+  collectAll(t, f, args, (columns: IPy_Object[][]) => {
+    var length = Math.min.apply(null, columns.map((column: IPy_Object[]) => column.length));
+    for (i = 0; i < length; i++) {
+      tuples.push(new Py_Tuple(columns.map((column: IPy_Object[]) => column[i])));
+    }
+    cb(new Py_List(tuples));
+  });
+}
+
+const startName = Py_Str.fromJS('start');
+
+// enumerate(iterable, start=0)
+function enumerate(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (kwargs.get(startName) !== undefined) {
+    args.push(kwargs.get(startName));
+  }
+  if (args.length < 1 || args.length > 2) {
+    throw new Error('TypeError: enumerate() takes 1-2 arguments');
+  }
+  var start = args.length > 1 ? (<Py_Int> args[1]).toNumber() : 0,
+    it = nativeIter(args[0]);
+  if (it !== null) {
+    cb(new iterator.Enumerate(it, start));
+  } else {
+    // The iterator can't run Python code for each item, so it gets them
+    // all up front.
+    collect(t, f, args[0], (items: IPy_Object[]) => {
+      cb(new iterator.Enumerate(new iterator.ListIterator(items), start));
+    });
+  }
+}
+
+// reversed(sequence)
+function reversed(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
   if (args.length !== 1) {
-    throw new Error('TypeError: sorted() takes 1 positional argument');
+    throw new Error('TypeError: reversed() takes exactly one argument');
+  }
+  var x = <any> args[0];
+  if (typeof x.len === 'function' && typeof x.item === 'function') {
+    cb(new iterator.ReversedIterator(x));
+  } else if (x.$__reversed__ !== undefined) {
+    callFromNative(t, f, x.$__reversed__, [], cb);
+  } else if (x.$__len__ !== undefined && x.$__getitem__ !== undefined) {
+    // As with enumerate(), the items are read up front.
+    callFromNative(t, f, x.$__len__, [], (length: Py_Int) => {
+      var i = length.toNumber(), items: IPy_Object[] = [];
+      loop((next: () => void) => {
+        if (i === 0) {
+          cb(new iterator.ListIterator(items));
+          return;
+        }
+        callFromNative(t, f, x.$__getitem__, [Py_Int.fromNumber(--i)], (item: IPy_Object) => {
+          items.push(item);
+          next();
+        });
+      });
+    });
+  } else {
+    throw new Error('TypeError: argument to reversed() must be a sequence');
+  }
+}
+
+const cmpName = Py_Str.fromJS('cmp');
+const reverseName = Py_Str.fromJS('reverse');
+
+// The cmp, key and reverse arguments of sorted() and list.sort(). A cmp or
+// key of None is null.
+interface SortOptions {
+  cmp: IPy_Object;
+  key: IPy_Object;
+  reverse: boolean;
+}
+
+// Reads the sort options, which may also follow the first positional
+// arguments in args.
+function sortOptions(name: string, args: IPy_Object[], first: number, kwargs: Py_Dict): SortOptions {
+  var names = [cmpName, keyName, reverseName],
+    values: IPy_Object[] = [None, None, False],
+    given = 0, value: IPy_Object, i: number;
+  if (args.length > first + names.length) {
+    throw new Error(`TypeError: ${name}() takes at most ${first + names.length} arguments`);
+  }
+  for (i = 0; i < names.length; i++) {
+    if (first + i < args.length) {
+      values[i] = args[first + i];
+    }
+    if ((value = kwargs.get(names[i])) !== undefined) {
+      values[i] = value;
+      given++;
+    }
   }
-  if (kwargs.get(new Py_Str('cmp')) !== undefined && kwargs.get(new Py_Str('cmp')) !== None) {
-    throw new Error('sorted() with non-None cmp kwarg is NYI');
+  if (kwargs.len() > given) {
+    throw new Error(`TypeError: ${name}() takes no keyword arguments but cmp, key and reverse`);
   }
-  if (kwargs.get(new Py_Str('key')) !== undefined && kwargs.get(new Py_Str('key')) !== None) {
-    throw new Error('sorted() with non-None key kwarg is NYI');
+  return {
+    cmp: values[0] === None ? null : values[0],
+    key: values[1] === None ? null : values[1],
+    reverse: bool(values[2]) === True
+  };
+}
+
+// Sorts list in place, stably, and then calls cb. Keys are worked out once
+// for each item. Keys that are all numbers, or all strings, are compared
+// natively; other keys through lessThan, or cmp, which may run Python code.
+function sortItems(t: Thread, f: IPy_FrameObj, list: Py_List, options: SortOptions, cb: () => void): void {
+  var values = options.cmp === null && options.key === null ? list.unboxed() : null,
+    items: IPy_Object[];
+  if (values !== null) {
+    // Equal ints can't be told apart, but 0.0 and -0.0 can.
+    values = values.subarray(0, list.len());
+    if (values instanceof Int32Array) {
+      values.sort();
+      if (options.reverse) {
+        values.reverse();
+      }
+    } else {
+      values.sort(options.reverse ? (a: number, b: number) => b - a : (a: number, b: number) => a - b);
+    }
+    cb();
+    return;
   }
-  var it = (<Iterable> args[0]).iter();
-  var list: IPy_Object[] = [];
-  /// XXX: Use appropriate __-prefixed iterator methods.
-  for (var val = it.next(); val != null; val = it.next()) {
-    list.push(val);
+  // Python code may change the list while it runs.
+  items = list.toArray().slice(0);
+  keysOf(t, f, items, options.key, (keys: IPy_Object[]) => {
+    sortOrder(t, f, keys, options, (order: number[]) => {
+      var sorted: IPy_Object[] = new Array(order.length);
+      for (var i = 0; i < order.length; i++) {
+        sorted[i] = items[order[i]];
+      }
+      list.setItems(sorted);
+      cb();
+    });
+  });
+}
+
+// Calls cb with key(item) for each of items, or with items if there's no
+// key.
+function keysOf(t: Thread, f: IPy_FrameObj, items: IPy_Object[], key: IPy_Object, cb: (keys: IPy_Object[]) => void): void {
+  if (key === null) {
+    cb(items);
+    return;
   }
-  list.sort((a: Iterable, b: Iterable): number => {
-    var rv: IPy_Object;
-    // SUPER HACK: Requires that we take synchronous path.
-    cmp(t, f, [a, b], kwargs, (_rv) => {
-      rv = _rv;
+  var keys: IPy_Object[] = [];
+  loop((next: () => void) => {
+    if (keys.length === items.length) {
+      cb(keys);
+      return;
+    }
+    callFromNative(t, f, key, [items[keys.length]], (rv: IPy_Object) => {
+      keys.push(rv);
+      next();
     });
-    return (<Py_Int> rv).toNumber();
   });
-  if (kwargs.get(new Py_Str('reverse')) !== undefined && bool(kwargs.get(new Py_Str('reverse'))) === True) {
-    list.reverse();
+}
+
+// Calls cb with the indices of keys, in sorted order.
+function sortOrder(t: Thread, f: IPy_FrameObj, keys: IPy_Object[], options: SortOptions, cb: (order: number[]) => void): void {
+  var n = keys.length, order: number[] = new Array(n), numbers = true, strings = true,
+    type: Function, i: number;
+  for (i = 0; i < n; i++) {
+    order[i] = i;
+    type = keys[i].constructor;
+    numbers = numbers && (type === Py_Int || type === Py_Float);
+    strings = strings && type === Py_Str;
+  }
+  if (options.cmp === null && numbers) {
+    var nums = new Float64Array(n);
+    for (i = 0; i < n; i++) {
+      nums[i] = (<Py_Int> keys[i]).toNumber();
+    }
+    // Ties, and NaNs, keep their order.
+    order.sort(options.reverse ?
+      (a: number, b: number) => (nums[b] - nums[a]) || a - b :
+      (a: number, b: number) => (nums[a] - nums[b]) || a - b);
+    cb(order);
+  } else if (options.cmp === null && strings) {
+    var strs = keys.map((key: IPy_Object) => key.toString()),
+      sign = options.reverse ? -1 : 1;
+    order.sort((a: number, b: number) =>
+      strs[a] < strs[b] ? -sign : strs[b] < strs[a] ? sign : a - b);
+    cb(order);
+  } else {
+    mergeSort(t, f, order, (a: number, b: number, cb: (before: boolean) => void) => {
+      var x = keys[options.reverse ? b : a], y = keys[options.reverse ? a : b];
+      if (options.cmp === null) {
+        lessThan(t, f, x, y, cb);
+      } else {
+        callFromNative(t, f, options.cmp, [x, y], (rv: IPy_Object) => {
+          cb((<Py_Int> rv).toNumber() < 0);
+        });
+      }
+    }, cb);
   }
-  return new Py_List(list);
+}
+
+// Sorts order stably, by merging longer and longer runs, and then calls cb
+// with it. before(a, b, cb) calls cb with whether a goes before b, which
+// may have to wait on Python code.
+function mergeSort(t: Thread, f: IPy_FrameObj, order: number[], before: (a: number, b: number, cb: (before: boolean) => void) => void, cb: (order: number[]) => void): void {
+  var n = order.length, merged: number[] = new Array(n), swap: number[],
+    width = 1, lo = 0,
+    // The runs being merged are [i, mid) and [j, hi), into merged[k...].
+    i = 0, mid = 0, j = 0, hi = 0, k = 0;
+  loop((next: () => void) => {
+    if (i < mid && j < hi) {
+      // Take the right run's item only if it goes strictly first.
+      before(order[j], order[i], (first: boolean) => {
+        merged[k++] = first ? order[j++] : order[i++];
+        next();
+      });
+      return;
+    }
+    while (i < mid) {
+      merged[k++] = order[i++];
+    }
+    while (j < hi) {
+      merged[k++] = order[j++];
+    }
+    if (lo >= n) {
+      swap = order;
+      order = merged;
+      merged = swap;
+      width *= 2;
+      lo = 0;
+    }
+    if (width >= n) {
+      cb(order);
+      return;
+    }
+    i = k = lo;
+    j = mid = Math.min(lo + width, n);
+    lo = hi = Math.min(lo + 2 * width, n);
+    next();
+  });
+}
+
+// sorted(iterable, cmp=None, key=None, reverse=False)
+function sorted(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void): void {
+  if (args.length < 1) {
+    throw new Error('TypeError: sorted() takes at least 1 argument');
+  }
+  var options = sortOptions('sorted', args, 1, kwargs),
+    sort = (list: Py_List) => sortItems(t, f, list, options, () => cb(list));
+  if (args[0] instanceof Py_List) {
+    // A copy, with the same storage.
+    sort(Py_List.fromIterable(<Py_List> args[0]));
+  } else {
+    collect(t, f, args[0], (items: IPy_Object[]) => sort(new Py_List(items.slice(0))));
+  }
+}
+
+// list.sort(cmp=None, key=None, reverse=False), a native method of lists.
+// If the sort has to wait on Python code, f carries on once the sort is
+// done, from a trampoline frame.
+function sortList(list: Py_List, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
+  var options = sortOptions('sort', args, 0, kwargs),
+    trampoline = new Py_TrampolineFrameObject(f, kwargs, () => {}),
+    inline = true,
+    completed = false;
+  t.framePush(trampoline);
+  sortItems(t, f, list, options, () => {
+    if (inline) {
+      completed = true;
+    } else {
+      t.asyncReturn(None);
+    }
+  });
+  inline = false;
+  if (completed) {
+    t.framePop();
+  }
+  return None;
 }
 
 function hasattr(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): typeof True {
@@ -321,7 +1117,7 @@ function hasattr(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict
   }
   var obj = args[0];
   var attr = '$' + args[1].toString();
-  return obj.hasOwnProperty(attr)? True : False;
+  return hasAttr(obj, attr) ? True : False;
 }
 
 function getattr(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
@@ -334,7 +1130,8 @@ function getattr(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict
   var obj = args[0];
   var attr = args[1].toString();
   // TODO: use __getattr__ here
-  return (<any> obj)[`$${attr}`];
+  var val = getAttr(obj, `$${attr}`);
+  return val instanceof Py_NativeMethod ? (<Py_NativeMethod> val).bind(obj) : val;
 }
 
 function setattr(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
@@ -348,7 +1145,8 @@ function setattr(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict
   var attr = args[1].toString();
   var x = args[2];
   // TODO: use __setattr__ here
-  (<any> obj)[`$${attr}`] = x;
+  setAttr(obj, `$${attr}`, x);
+  Py_Dict.touchAttrs(obj);
   return None;
 }
 
@@ -366,7 +1164,7 @@ function pyfunc_wrapper_onearg(func: (a: IPy_Object) => IPy_Object, funcname: st
 }
 
 function locals(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
-  return f.locals;
+  return f.getLocals();
 }
 
 function globals(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
@@ -419,7 +1217,7 @@ function type(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict):
           }
         }
         
-        inst.$__dict__ = new Py_Dict(inst);
+        initSlots(inst);
         
         if (inst['$__init__']) {
           (<IPy_Function> inst.$__init__).exec_from_native(t, f, args, new Py_Dict(), () => {
@@ -438,56 +1236,42 @@ function __import__(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_D
     nameJS = name.toString(),
     globals = <Py_Dict> args[1],
     toImport = args[3] === None ? [] : (<Py_List> args[3]).toArray().map((item: Py_Str) => item.toString()),
-    searchPaths = [path.dirname(globals.get(new Py_Str('__file__')).toString())],
-    sys = t.sys;
+    sys = t.sys,
+    resolver = sys.resolver;
 
   if (sys.$modules.get(name) !== undefined) {
     return cb(sys.$modules.get(name));
   }
-  
-  searchPaths = searchPaths.concat(sys.$path.toArray().slice(1).map((str: IPy_Object) => str.toString()));
-  searchPaths = searchPaths.map((p: string) => path.resolve(p, `${name}.pyc`));
-  
-  var filename: string;
-  async.eachSeries(searchPaths, (p: string, cb: (e?: any) => void) => {
-    fs.readFile(p, (e: NodeJS.ErrnoException, data: Buffer) => {
-      if (e) {
-        cb();
+
+  resolver.find(nameJS, path.dirname(globals.get(new Py_Str('__file__')).toString()), (e: any, filename: string, code: _Py_CodeObject) => {
+    if (e || !code) {
+      // XXX
+      // "Module not found: " + name
+      return cb(null, ImportError.prototype);
+    }
+    registerModule(t, f, filename, name, code, (modObj: IPy_Object) => {
+      if (toImport.length === 0) {
+        // import entire module.
+        cb(modObj);
       } else {
-        filename = p;
-        cb(data);
-      }
-    }); 
-  }, (data?: any) => {
-    if (data) {
-      registerModule(t, f, filename, name, data, (modObj: IPy_Object) => {
-        if (toImport.length === 0) {
-          // import entire module.
-          cb(modObj);
-        } else {
-          // import specific module components.
-          var p = new Py_Object();
-          if (toImport.length == 1 && toImport[0] == '*') {
-            // when importing *, replace with all names
-            // XXX: should we be reading from modObj.__all__ here?
-            toImport = [];
-            for (var key in modObj) {
-              if (key.length > 1 && key[0] == '$') {
-                toImport.push(key.slice(1));
-              }
+        // import specific module components.
+        var p = new Py_Object();
+        if (toImport.length == 1 && toImport[0] == '*') {
+          // when importing *, replace with all names
+          // XXX: should we be reading from modObj.__all__ here?
+          toImport = [];
+          for (var key in modObj) {
+            if (key.length > 1 && key[0] == '$') {
+              toImport.push(key.slice(1));
             }
           }
-          toImport.forEach((prop: string) => {
-            (<any>p)[`$${prop}`] = (<any>modObj)[`$${prop}`];
-          });
-          cb(p);
         }
-      });
-    } else {
-      // XXX
-      // "Module not found: " + name
-      cb(null, ImportError.prototype);
-    }
+        toImport.forEach((prop: string) => {
+          (<any>p)[`$${prop}`] = (<any>modObj)[`$${prop}`];
+        });
+        cb(p);
+      }
+    });
   });
 }
 
@@ -495,13 +1279,12 @@ function __import__(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_D
  * Register a module with the system. Should only be called after
  * confirming that module is not already loaded.
  */
-function registerModule(t: Thread, f: IPy_FrameObj, filename: string, moduleName: Py_Str, data: Buffer, cb: (mod: IPy_Object) => void) {
+function registerModule(t: Thread, f: IPy_FrameObj, filename: string, moduleName: Py_Str, mod: _Py_CodeObject, cb: (mod: IPy_Object) => void) {
   //!!! CIRCULAR REFERENCE HACK!!!
-  var Unmarshaller: typeof _unmarshal = require('./unmarshal'),
-    Py_FrameObject: typeof _Py_FrameObject = require('./frameobject'),
-    mod = (new Unmarshaller(data)).value(),
+  var Py_FrameObject: typeof _Py_FrameObject = require('./frameobject'),
     sys = t.sys,
-    scope = new Py_Dict(),
+    // The module object is the namespace's string dictionary.
+    scope = new Py_Dict({}),
     // At the module level, locals === globals.
     newFrame = new Py_FrameObject(f, mod, scope, scope, []),
     // XXX: Should be made into a proper Py_Object w/ expected methods.
@@ -544,9 +1327,12 @@ const builtins = {
     $Exception: Exception.prototype,
     $KeyboardInterrupt: KeyboardInterrupt.prototype,
     $NameError: NameError.prototype,
+    $UnboundLocalError: UnboundLocalError.prototype,
     $ArithmeticError: ArithmeticError.prototype,
     $ZeroDivisionError: ZeroDivisionError.prototype,
+    $OverflowError: OverflowError.prototype,
     $TypeError: TypeError.prototype,
+    $ValueError: ValueError.prototype,
     $AttributeError: AttributeError.prototype,
     $StopIteration: StopIteration.prototype,
     $ThreadError: ThreadError.prototype,
@@ -564,19 +1350,19 @@ const builtins = {
     range: range,
     $range: new Py_SyncNativeFuncObject(range),
     list: list,
-    $list: new Py_SyncNativeFuncObject(list),
+    $list: new Py_AsyncNativeFuncObject(list),
     dict: dict,
     $dict: new Py_SyncNativeFuncObject(dict),
     tuple: tuple,
-    $tuple: new Py_SyncNativeFuncObject(tuple),
+    $tuple: new Py_AsyncNativeFuncObject(tuple),
     set: set,
-    $set: new Py_SyncNativeFuncObject(set),
+    $set: new Py_AsyncNativeFuncObject(set),
     abs: abs,
     $abs: new Py_SyncNativeFuncObject(abs),
     all: all,
-    $all: new Py_SyncNativeFuncObject(pyfunc_wrapper_onearg(all, 'all')),
+    $all: new Py_AsyncNativeFuncObject(all),
     any: any,
-    $any: new Py_SyncNativeFuncObject(pyfunc_wrapper_onearg(any, 'any')),
+    $any: new Py_AsyncNativeFuncObject(any),
     bin: bin,
     $bin: new Py_SyncNativeFuncObject(pyfunc_wrapper_onearg(bin, 'bin')),
     bool: bool,
@@ -601,9 +1387,30 @@ const builtins = {
     $hex: new Py_SyncNativeFuncObject(pyfunc_wrapper_onearg(hex, 'hex')),
     int: int,
     $int: new Py_SyncNativeFuncObject(int),
-    $long: new Py_SyncNativeFuncObject(int),
+    $long: new Py_SyncNativeFuncObject(long),
+    len: len,
+    $len: new Py_AsyncNativeFuncObject(len),
+    sum: sum,
+    $sum: new Py_AsyncNativeFuncObject(sum),
+    min: min,
+    $min: new Py_AsyncNativeFuncObject(min),
+    max: max,
+    $max: new Py_AsyncNativeFuncObject(max),
+    map: map,
+    $map: new Py_AsyncNativeFuncObject(map),
+    filter: filter,
+    $filter: new Py_AsyncNativeFuncObject(filter),
+    zip: zip,
+    $zip: new Py_AsyncNativeFuncObject(zip),
+    enumerate: enumerate,
+    $enumerate: new Py_AsyncNativeFuncObject(enumerate),
+    reversed: reversed,
+    $reversed: new Py_AsyncNativeFuncObject(reversed),
     sorted: sorted,
-    $sorted: new Py_SyncNativeFuncObject(sorted),
+    $sorted: new Py_AsyncNativeFuncObject(sorted),
+    sortList: sortList,
+    contains: contains,
+    collect: collect,
     hasattr: hasattr,
     $hasattr: new Py_SyncNativeFuncObject(hasattr),
     getattr: getattr,
@@ -625,7 +1432,6 @@ const builtins = {
     
     $buffer: None,
     $unicode: None,
-    $len: None,
     $file: None,
     $slice: None,
     $Warning: None
@@ -0,0 +1,141 @@
+import Py_CodeObject = require('./codeobject');
+import Unmarshaller = require('./unmarshal');
+
+// Identifies bundle files.
+const MAGIC = 'NINIABDL';
+
+// Where a module's data lives in a bundle.
+interface BundleIndexEntry {
+    // Path of the .pyc file the module was built from; becomes __file__.
+    file: string;
+    // Offset and length of the marshalled code, within the data section.
+    code: [number, number];
+    // The source file the code was compiled from, and the offset and length
+    // of its contents. Absent if the bundle was built without sources.
+    sourceFile?: string;
+    source?: [number, number];
+}
+
+interface BundleIndex {
+    // Name of the module to run.
+    main: string;
+    modules: { [name: string]: BundleIndexEntry };
+}
+
+// A module to put in a bundle.
+export interface BundleModule {
+    name: string;
+    file: string;
+    pyc: Buffer;
+    sourceFile?: string;
+    source?: Buffer;
+}
+
+/**
+ * A bundle packs the .pyc files of a program into a single file, with the
+ * sources used for tracebacks if wanted, so that the whole program can be
+ * loaded with one read. The layout is:
+ *
+ *   magic      8 bytes, "NINIABDL"
+ *   index size 4 bytes, unsigned little-endian
+ *   index      JSON, see BundleIndex
+ *   data       the marshalled code and sources, back to back
+ *
+ * Modules are unmarshalled on first use, straight out of the bundle's
+ * buffer.
+ */
+export class Bundle {
+    private data: Buffer;
+    private index: BundleIndex;
+    // Modules unmarshalled so far, by name.
+    private codes: { [name: string]: Py_CodeObject } = {};
+    // Names of the modules with sources, by source file.
+    private sources: { [file: string]: string } = {};
+
+    constructor(buffer: Buffer) {
+        if (!Bundle.isBundle(buffer)) {
+            throw new Error("Not a Ninia bundle.");
+        }
+        var indexSize = buffer.readUInt32LE(MAGIC.length),
+            start = MAGIC.length + 4;
+        this.index = JSON.parse(buffer.toString('utf8', start, start + indexSize));
+        this.data = buffer.slice(start + indexSize);
+        for (var name in this.index.modules) {
+            if (this.index.modules[name].sourceFile !== undefined) {
+                this.sources[this.index.modules[name].sourceFile] = name;
+            }
+        }
+    }
+
+    static isBundle(buffer: Buffer): boolean {
+        return buffer.length >= MAGIC.length + 4 &&
+            buffer.toString('ascii', 0, MAGIC.length) === MAGIC;
+    }
+
+    /**
+     * Packs modules into a bundle. main names the module to run.
+     */
+    static build(main: string, modules: BundleModule[]): Buffer {
+        var index: BundleIndex = { main: main, modules: {} },
+            chunks: Buffer[] = [],
+            offset = 0;
+        modules.forEach((mod: BundleModule) => {
+            var entry: BundleIndexEntry = {
+                file: mod.file,
+                code: [offset, mod.pyc.length]
+            };
+            chunks.push(mod.pyc);
+            offset += mod.pyc.length;
+            if (mod.source) {
+                entry.sourceFile = mod.sourceFile;
+                entry.source = [offset, mod.source.length];
+                chunks.push(mod.source);
+                offset += mod.source.length;
+            }
+            index.modules[mod.name] = entry;
+        });
+        var json = new Buffer(JSON.stringify(index), 'utf8'),
+            header = new Buffer(MAGIC.length + 4);
+        header.write(MAGIC, 0, MAGIC.length, 'ascii');
+        header.writeUInt32LE(json.length, MAGIC.length);
+        chunks.unshift(header, json);
+        return Buffer.concat(chunks);
+    }
+
+    public getMainName(): string {
+        return this.index.main;
+    }
+
+    public getMain(): Py_CodeObject {
+        return this.getCode(this.index.main);
+    }
+
+    public hasModule(name: string): boolean {
+        return this.index.modules.hasOwnProperty(name);
+    }
+
+    // Returns the path of the .pyc file the module was built from.
+    public getFile(name: string): string {
+        return this.index.modules[name].file;
+    }
+
+    public getCode(name: string): Py_CodeObject {
+        var code = this.codes[name], range: [number, number];
+        if (code === undefined) {
+            range = this.index.modules[name].code;
+            code = new Unmarshaller(this.data.slice(range[0], range[0] + range[1])).value();
+            this.codes[name] = code;
+        }
+        return code;
+    }
+
+    // Returns the contents of a source file in the bundle, or null.
+    public getSource(file: string): string {
+        var name = this.sources[file], range: [number, number];
+        if (name === undefined) {
+            return null;
+        }
+        range = this.index.modules[name].source;
+        return this.data.toString('utf8', range[0], range[0] + range[1]);
+    }
+}
@@ -1,11 +1,120 @@
 import {IPy_Object} from './interfaces';
 import {Py_Str} from './primitives';
 import {Py_Type} from './enums';
+import opcodes = require('./opcodes');
+import {Thread} from './threading';
+// XXX: Prevent a circular reference. Use these only for type info.
+import _optable = require('./optable');
+import _compiler = require('./compiler');
+import _quicken = require('./quicken');
+import _peephole = require('./peephole');
+import _Py_FrameObject = require('./frameobject');
+import {Shape} from './shape';
+
+// Opcodes at or above this value are followed by a 2-byte argument.
+const HAVE_ARGUMENT = opcodes.STORE_NAME;
+
+// Jumps whose argument is relative to the start of the next instruction.
+const relativeJumps: { [op: number]: boolean } = {};
+[opcodes.JUMP_FORWARD, opcodes.FOR_ITER, opcodes.SETUP_LOOP,
+ opcodes.SETUP_EXCEPT, opcodes.SETUP_FINALLY, opcodes.SETUP_WITH
+].forEach((op: number) => relativeJumps[op] = true);
+
+// Jumps whose argument is an absolute byte offset.
+const absoluteJumps: { [op: number]: boolean } = {};
+[opcodes.JUMP_IF_FALSE_OR_POP, opcodes.JUMP_IF_TRUE_OR_POP,
+ opcodes.JUMP_ABSOLUTE, opcodes.POP_JUMP_IF_FALSE, opcodes.POP_JUMP_IF_TRUE,
+ opcodes.CONTINUE_LOOP
+].forEach((op: number) => absoluteJumps[op] = true);
+
+// Instructions that push one value and nothing else.
+const simpleLoads: { [op: number]: boolean } = {};
+[opcodes.LOAD_CONST, opcodes.LOAD_FAST, opcodes.LOAD_NAME,
+ opcodes.LOAD_GLOBAL, opcodes.LOAD_DEREF
+].forEach((op: number) => simpleLoads[op] = true);
+
+function unknownOpcode(op: number): (f: _Py_FrameObject, t: Thread) => void {
+    return function() {
+        throw new Error(`Unknown opcode: ${opcodes[op]} (${op})`);
+    };
+}
+
+// Flags each LOAD_ATTR that is followed by simple loads of exactly the
+// arguments of the CALL_FUNCTION after them, as in `obj.method(x, y)`.
+function findAttrCalls(ops: Uint8Array, args: Int32Array): Uint8Array {
+    var calls = new Uint8Array(ops.length), i: number, j: number;
+    for (i = 0; i < ops.length; i++) {
+        if (ops[i] !== opcodes.LOAD_ATTR) {
+            continue;
+        }
+        for (j = i + 1; j < ops.length && simpleLoads[ops[j]]; j++) {}
+        // Keyword arguments take two stack entries each.
+        if (j < ops.length && ops[j] === opcodes.CALL_FUNCTION &&
+            j - i - 1 === (args[j] & 0xff) + 2 * ((args[j] >> 8) & 0xff)) {
+            calls[i] = 1;
+        }
+    }
+    return calls;
+}
+
 // Py_CodeObject models the Python Code Object, which is used to represent
 // functions, blocks, modules, etc. -- anything that can be executed.
 // The various fields are derived from inspecting code objects (see the Inspect
 // module in the std lib).
 class Py_CodeObject implements IPy_Object {
+    // The decoded instruction stream, built once by decode(). Instructions
+    // are numbered consecutively; jump arguments are instruction indices.
+    handlers: ((f: _Py_FrameObject, t: Thread) => void)[] = null;
+    ops: Uint8Array = null;
+    args: Int32Array = null;
+    // Byte offset of each instruction in code, for lnotab lookups.
+    offsets: Int32Array = null;
+    // Source line of each instruction, built from lnotab on first use; see
+    // getLine().
+    lines: Int32Array = null;
+    // Inline caches for LOAD_GLOBAL and LOAD_NAME, indexed by instruction.
+    // An entry holds the value last found along with the version tags of the
+    // namespaces that were searched, and is valid while those are unchanged.
+    cacheValues: IPy_Object[] = null;
+    cacheLocalsVersions: Float64Array = null;
+    cacheGlobalsVersions: Float64Array = null;
+    cacheBuiltinsVersions: Float64Array = null;
+    cacheHits: number = 0;
+    cacheMisses: number = 0;
+    // Property keys for names (i.e. '$' + name), for attribute access.
+    nameKeys: string[] = null;
+    // Inline caches for LOAD_ATTR and STORE_ATTR, indexed by instruction.
+    // An entry applies to instances with the given shape, whose attribute is
+    // in the given slot. For STORE_ATTR, attrTransitions holds the shape to
+    // move the instance to when the store adds the attribute.
+    attrShapes: Shape[] = null;
+    attrSlots: Int32Array = null;
+    attrTransitions: Shape[] = null;
+    // Flags LOAD_ATTR instructions whose result is only ever called, by a
+    // CALL_FUNCTION right after the loads of its arguments. These leave a
+    // native method unbound, with its receiver below it on the stack.
+    attrCalls: Uint8Array = null;
+    // Quickening state, indexed by instruction; see quicken.ts. A counter
+    // runs down to the next attempt at specializing the instruction for its
+    // operand types. The kind names the operand types of the specialization
+    // last installed; hits and misses count executions that found operands
+    // of those types and of others, which undid the specialization. Hits are
+    // only counted once quicken.enableStats() has been called.
+    quickCounters: Int32Array = null;
+    quickKinds: string[] = null;
+    quickHits: Float64Array = null;
+    quickMisses: Int32Array = null;
+    // Frames for this code that have returned and can be reused; see
+    // Py_FrameObject.create().
+    freeFrames: _Py_FrameObject[] = [];
+    // Calls and loop iterations counted towards compiling this code, and
+    // the compiled function once it has been; see compiler.instrument().
+    hotness: number = 0;
+    compiled: (f: _Py_FrameObject, t: Thread) => void = null;
+    // The handlers compiled code runs the instructions it doesn't compile
+    // inline by, which quickening specializes like the handlers above.
+    compiledHandlers: ((f: _Py_FrameObject, t: Thread) => void)[] = null;
+
     // Args are ordered by appearance in marshal format
     constructor(public argcount: number,
                 public nlocals: number,
@@ -26,5 +135,145 @@ class Py_CodeObject implements IPy_Object {
     isGenerator(): boolean {
         return !!(this.flags & 0x20);
     }
+
+    // Translates the raw bytecode into the instruction stream. Handlers are
+    // looked up in the optable, EXTENDED_ARG prefixes are folded into the
+    // argument of the following instruction, and jump arguments are resolved
+    // to the index of their target instruction.
+    decode(): void {
+        if (this.handlers !== null) {
+            return;
+        }
+        // XXX: Hack around circular reference.
+        var optable: typeof _optable = require('./optable'),
+            quicken: typeof _quicken = require('./quicken'),
+            code = this.code,
+            len = code.length,
+            // Maps each byte offset to the index of the instruction there.
+            indexOf = new Int32Array(len + 1),
+            count = 0, i: number, op: number;
+
+        for (i = 0; i < len; i += (op >= HAVE_ARGUMENT ? 3 : 1)) {
+            op = code[i];
+            indexOf[i] = count;
+            if (op !== opcodes.EXTENDED_ARG) {
+                count++;
+            }
+        }
+        indexOf[len] = count;
+
+        var handlers: ((f: _Py_FrameObject, t: Thread) => void)[] = new Array(count),
+            ops = new Uint8Array(count),
+            args = new Int32Array(count),
+            offsets = new Int32Array(count),
+            // Byte offset of a pending EXTENDED_ARG prefix, if any.
+            prefix = -1,
+            extended = 0, n = 0, arg: number,
+            cached = false, attrCached = false, quickened = false;
+        for (i = 0; i < len; i += (op >= HAVE_ARGUMENT ? 3 : 1)) {
+            op = code[i];
+            arg = 0;
+            if (op >= HAVE_ARGUMENT) {
+                arg = (extended << 16) | (code[i + 2] << 8) | code[i + 1];
+            }
+            if (op === opcodes.EXTENDED_ARG) {
+                if (prefix < 0) {
+                    prefix = i;
+                }
+                extended = arg;
+                continue;
+            }
+            if (relativeJumps[op]) {
+                arg = indexOf[i + 3 + arg];
+            } else if (absoluteJumps[op]) {
+                arg = indexOf[arg];
+            }
+            handlers[n] = optable[op] !== undefined ? optable[op] : unknownOpcode(op);
+            ops[n] = op;
+            args[n] = arg;
+            if (op === opcodes.LOAD_GLOBAL || op === opcodes.LOAD_NAME) {
+                cached = true;
+            } else if (op === opcodes.LOAD_ATTR || op === opcodes.STORE_ATTR) {
+                attrCached = true;
+            } else if (quicken.canSpecialize(op)) {
+                quickened = true;
+            }
+            // Instructions carrying an EXTENDED_ARG start at the prefix.
+            offsets[n] = prefix >= 0 ? prefix : i;
+            prefix = -1;
+            extended = 0;
+            n++;
+        }
+
+        this.ops = ops;
+        this.args = args;
+        this.offsets = offsets;
+        if (cached) {
+            this.cacheValues = new Array(count);
+            this.cacheLocalsVersions = new Float64Array(count);
+            this.cacheGlobalsVersions = new Float64Array(count);
+            this.cacheBuiltinsVersions = new Float64Array(count);
+        }
+        this.nameKeys = this.names.map((name: Py_Str) => '$' + name.toString());
+        if (attrCached) {
+            this.attrShapes = new Array(count);
+            this.attrTransitions = new Array(count);
+            for (i = 0; i < count; i++) {
+                // Distinct from the undefined shape of other objects.
+                this.attrShapes[i] = null;
+            }
+            this.attrSlots = new Int32Array(count);
+            this.attrCalls = findAttrCalls(ops, args);
+        }
+        if (quickened) {
+            this.quickCounters = new Int32Array(count);
+            quicken.initCounters(this.quickCounters);
+            this.quickKinds = new Array(count);
+            for (i = 0; i < count; i++) {
+                this.quickKinds[i] = null;
+            }
+            this.quickHits = new Float64Array(count);
+            this.quickMisses = new Int32Array(count);
+        }
+        this.handlers = handlers;
+        var peephole: typeof _peephole = require('./peephole'),
+            compiler: typeof _compiler = require('./compiler');
+        if (peephole.isEnabled()) {
+            peephole.optimize(this);
+        }
+        if (compiler.isEnabled()) {
+            compiler.instrument(this);
+        }
+    }
+
+    // Returns the source line of the instruction at index inst.
+    getLine(inst: number): number {
+        var lines = this.lines;
+        if (lines === null) {
+            lines = this.lines = this.buildLines();
+        }
+        // Positions outside the code count as past its last instruction.
+        return lines[inst >= 0 && inst < lines.length - 1 ? inst : lines.length - 1];
+    }
+
+    // Maps each instruction to its line, with one more entry for the end of
+    // the code. lnotab is a string of (byte increment, line increment) pairs.
+    private buildLines(): Int32Array {
+        var lnotab = this.lnotab.toString(),
+          offsets = this.offsets,
+          count = offsets.length,
+          lines = new Int32Array(count + 1),
+          line = this.firstlineno,
+          addr = 0, j = 0, i: number;
+        for (i = 0; i <= count; i++) {
+            while (j < lnotab.length && (i === count || addr + lnotab.charCodeAt(j) <= offsets[i])) {
+                addr += lnotab.charCodeAt(j);
+                line += lnotab.charCodeAt(j + 1);
+                j += 2;
+            }
+            lines[i] = line;
+        }
+        return lines;
+    }
 }
 export = Py_CodeObject;
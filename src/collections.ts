@@ -1,62 +1,236 @@
 import {True, False, None, NotImplemented,
-        Py_Int, Py_Long, Py_Object, Py_Slice, Py_Str
+        Py_Int, Py_Long, Py_Float, Py_Object, Py_Slice, Py_Str
        } from './primitives';
 import {IPy_FrameObj, Iterable, Iterator, IPy_Object} from './interfaces';
 import {Py_Type} from './enums';
-import {Py_SyncNativeFuncObject} from './nativefuncobject';
-import {ListIterator} from './iterator';
+import {Py_NativeMethod} from './nativefuncobject';
+import {ListIterator, SequenceIterator} from './iterator';
 import assert = require('./assert');
 import {Thread} from './threading';
+// !! Use only for type info !!
+import _builtins = require('./builtins');
 
 
-export class Py_List extends Py_Object implements Iterable {
-  private _list: IPy_Object[];
-  public $append = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    this.append(args[0]);
-    return None;
-  });
-  public $__getitem__ = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    return this.__getitem__(t, args[0]);
-  });
-  public $__delitem__ = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    return this.__delitem__(t, args[0]);
-  });
-  public $__setitem__ = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    return this.__setitem__(t, args[0], args[1]);
-  });
+// List storage strategies; see Py_List.
+const OBJECTS = 0,
+  INTS = 1,
+  FLOATS = 2,
+  RANGE = 3;
+// Room for items in typed storage, at least.
+const MIN_CAPACITY = 8;
+const NO_INTS = new Int32Array(0);
+
+function isSmallInt(x: IPy_Object): boolean {
+  var n: number;
+  return x.constructor === Py_Int && ((n = (<Py_Int> x).toNumber()) | 0) === n;
+}
+
+// The storage that can hold all of items. Empty lists start out with INTS.
+function storageFor(items: IPy_Object[]): number {
+  var storage = INTS, i: number;
+  for (i = 0; i < items.length && storage === INTS; i++) {
+    if (!isSmallInt(items[i])) {
+      storage = i === 0 && items[i].constructor === Py_Float ? FLOATS : OBJECTS;
+    }
+  }
+  for (; i < items.length && storage === FLOATS; i++) {
+    if (items[i].constructor !== Py_Float) {
+      storage = OBJECTS;
+    }
+  }
+  return storage;
+}
 
+/**
+ * Python lists keep their items in one of several kinds of storage, after
+ * PyPy's list strategies. Lists of nothing but ints that fit in 32 bits, or
+ * of nothing but floats, keep the bare numbers in a typed array, and box
+ * them again as they are read. Lists made by range() only keep their first
+ * item and step, until they are changed. Storing an item that the storage
+ * can't hold moves the list to an array of objects, for good; empty lists
+ * take on the storage of the first item stored instead.
+ */
+export class Py_List extends Py_Object implements Iterable {
+  private _storage: number;
+  // Items, with OBJECTS storage.
+  private _list: IPy_Object[] = null;
+  // Items, with INTS (an Int32Array) or FLOATS (a Float64Array) storage.
+  // Only the first _size are in use.
+  private _values: any = null;
+  // Number of items, with all but OBJECTS storage.
+  private _size: number = 0;
+  // First item and step, with RANGE storage.
+  private _start: number = 0;
+  private _step: number = 1;
   constructor(lst: IPy_Object[]) {
     super();
-    this._list = lst;
+    this.setItems(lst);
   }
   static fromIterable(x: Iterable) {
+    if (x instanceof Py_List) {
+      return (<Py_List> x)._slice(0, 1, (<Py_List> x).len());
+    }
     var it = x.iter();
     var list = new Py_List([]);
     for (var val = it.next(); val != null; val = it.next()) {
-        list._list.push(val);
+        list.append(val);
     }
     return list;
   }
+  // The list [start, start + step, ...] of length items, which holds no
+  // more than the first item and the step until it's changed.
+  static fromRange(start: number, step: number, length: number): Py_List {
+    var list = new Py_List([]);
+    list._storage = RANGE;
+    list._values = null;
+    list._start = start;
+    list._step = step;
+    list._size = length;
+    return list;
+  }
+  // A list of size zeroes, with INTS or FLOATS storage.
+  private static _typed(storage: number, size: number): Py_List {
+    var list = new Py_List([]);
+    list._storage = storage;
+    list._values = storage === INTS ? new Int32Array(size) : new Float64Array(size);
+    list._size = size;
+    return list;
+  }
   public getType(): Py_Type { return Py_Type.LIST; }
   public len(): number {
-    return this._list.length;
+    return this._storage === OBJECTS ? this._list.length : this._size;
+  }
+
+  // Returns the item at index i, which must be in range.
+  public item(i: number): IPy_Object {
+    switch (this._storage) {
+      case OBJECTS:
+        return this._list[i];
+      case INTS:
+        return Py_Int.fromNumber(this._values[i]);
+      case FLOATS:
+        return new Py_Float(this._values[i]);
+      default:
+        return Py_Int.fromNumber(this._start + i * this._step);
+    }
+  }
+
+  // Replaces the items with lst, which the list may keep as its storage.
+  public setItems(lst: IPy_Object[]): void {
+    var storage = this._storage = storageFor(lst);
+    if (storage === OBJECTS) {
+      this._list = lst;
+      this._values = null;
+      this._size = 0;
+    } else {
+      this._list = null;
+      this._values = lst.length === 0 ? NO_INTS :
+        storage === INTS ? new Int32Array(lst.length) : new Float64Array(lst.length);
+      for (var i = 0; i < lst.length; i++) {
+        this._values[i] = (<Py_Int> lst[i]).toNumber();
+      }
+      this._size = lst.length;
+    }
+  }
+
+  // The items as a typed array, if they are all small ints (an Int32Array)
+  // or all floats (a Float64Array), or null otherwise. Only the first len()
+  // numbers are items. Lists made by range() store their items first.
+  public unboxed(): any {
+    if (this._storage === RANGE) {
+      this._materialize();
+    }
+    return this._storage === OBJECTS ? null : this._values;
+  }
+
+  // Whether the storage can hold x.
+  private _accepts(x: IPy_Object): boolean {
+    switch (this._storage) {
+      case OBJECTS:
+        return true;
+      case INTS:
+        return isSmallInt(x);
+      case FLOATS:
+        return x.constructor === Py_Float;
+      default:
+        return false;
+    }
+  }
+
+  // Changes the storage into one that can hold x as well as the items.
+  private _makeRoomFor(x: IPy_Object): void {
+    if (this._storage === RANGE) {
+      this._materialize();
+      if (this._accepts(x)) {
+        return;
+      }
+    }
+    if (this.len() > 0) {
+      this._generalize();
+    } else if ((this._storage = storageFor([x])) === OBJECTS) {
+      this._list = [];
+      this._values = null;
+    } else {
+      this._values = this._storage === INTS ? NO_INTS : new Float64Array(0);
+    }
+  }
+
+  // Moves RANGE storage into a typed array, or to objects if the items
+  // don't all fit in 32 bits.
+  private _materialize(): void {
+    var size = this._size, last = this._start + (size - 1) * this._step, i: number;
+    if (size === 0 || ((this._start | 0) === this._start && (last | 0) === last)) {
+      this._storage = INTS;
+      this._values = new Int32Array(size);
+      for (i = 0; i < size; i++) {
+        this._values[i] = this._start + i * this._step;
+      }
+    } else {
+      this._generalize();
+    }
+  }
+
+  // Moves the items to OBJECTS storage.
+  private _generalize(): void {
+    if (this._storage !== OBJECTS) {
+      this._list = this.toArray();
+      this._storage = OBJECTS;
+      this._values = null;
+      this._size = 0;
+    }
   }
 
   public append(item: IPy_Object): IPy_Object {
-    this._list.push(item);
+    if (!this._accepts(item)) {
+      this._makeRoomFor(item);
+    }
+    if (this._storage === OBJECTS) {
+      this._list.push(item);
+    } else {
+      if (this._size === this._values.length) {
+        var grown = this._storage === INTS ?
+          new Int32Array(Math.max(MIN_CAPACITY, 2 * this._size)) :
+          new Float64Array(Math.max(MIN_CAPACITY, 2 * this._size));
+        grown.set(this._values);
+        this._values = grown;
+      }
+      this._values[this._size++] = (<Py_Int> item).toNumber();
+    }
     return None;
   }
 
   public iter(): Iterator {
-    return new ListIterator(this._list);
+    // The storage of a list of objects never changes again.
+    return this._storage === OBJECTS ? new ListIterator(this._list) : new SequenceIterator(this);
   }
   public toString(): string {
-    if (this._list.length == 0) {
+    var length = this.len();
+    if (length == 0) {
       return '[]';
     }
     var s = '[';
-    for (var x of this._list) {
-      s += `${x.__repr__()}, `;
+    for (var i = 0; i < length; i++) {
+      s += `${this.item(i).__repr__()}, `;
     }
     // Remove last ', ' from the end.
     return s.slice(0, -2) + ']';
@@ -68,31 +242,52 @@ export class Py_List extends Py_Object implements Iterable {
 
   public __add__(t: Thread, other: IPy_Object): Py_List {
     if (other instanceof Py_List) {
-      return new Py_List(this._list.concat((<Py_List> other)._list));
+      var list = <Py_List> other;
+      if ((this._storage === INTS || this._storage === FLOATS) && list._storage === this._storage) {
+        var sum = Py_List._typed(this._storage, this._size + list._size);
+        sum._values.set(this._values.subarray(0, this._size));
+        sum._values.set(list._values.subarray(0, list._size), this._size);
+        return sum;
+      }
+      return new Py_List(this.toArray().concat(list.toArray()));
     } else {
       throw new Error("???");
     }
   }
   public __len__(): Py_Int {
-    return new Py_Int(this.len());
+    return Py_Int.fromNumber(this.len());
   }
+
+  // The list of length items from index start on, step apart, with the same
+  // kind of storage.
+  private _slice(start: number, step: number, length: number): Py_List {
+    var list: Py_List, i: number, curr: number;
+    switch (this._storage) {
+      case OBJECTS:
+        var items: IPy_Object[] = [];
+        for (i = 0, curr = start; i < length; i += 1, curr += step) {
+          items.push(this._list[curr]);
+        }
+        return new Py_List(items);
+      case RANGE:
+        return Py_List.fromRange(this._start + start * this._step, this._step * step, length);
+      default:
+        list = Py_List._typed(this._storage, length);
+        for (i = 0, curr = start; i < length; i += 1, curr += step) {
+          list._values[i] = this._values[curr];
+        }
+        return list;
+    }
+  }
+
   public __getitem__(t: Thread, key: IPy_Object): IPy_Object {
     if (key.getType() === Py_Type.SLICE) {
-      var slice = <Py_Slice> key,
-        indices = slice.getIndices(this._list.length),
-        start = indices.start,
-        stop = indices.stop,
-        step = indices.step,
-        length = indices.length,
-        newArr: IPy_Object[] = [],
-        i: number,
-        curr: number;
-      for (i = 0, curr = start; i < length; i += 1, curr += step) {
-        newArr.push(this._list[curr]);
-      }
-        return new Py_List(newArr);
+      var indices = (<Py_Slice> key).getIndices(this.len());
+      return this._slice(indices.start, indices.step, indices.length);
     } else {
-      return this._list[standardizeKey(key, this._list.length)];
+      var i = standardizeKey(key, this.len());
+      // Out of range indices give undefined, as they would from an array.
+      return i >= 0 && i < this.len() ? this.item(i) : undefined;
     }
   }
 
@@ -101,6 +296,7 @@ export class Py_List extends Py_Object implements Iterable {
       var slice = <Py_Slice> key,
         step = slice.step === None ? 1 : (<Py_Int | Py_Long> slice.step).toNumber();
       var rlist = <Py_List> Py_List.fromIterable(<Iterable> val);
+      this._generalize();
 
       if (step === 1){
         var start = slice.start === None ? 0 : (<Py_Int> slice.start).toNumber(),
@@ -119,11 +315,19 @@ export class Py_List extends Py_Object implements Iterable {
         }
 
         for(var curr = start, i = 0; i < length; curr += step, i += 1){
-          this._list[curr] = rlist.__getitem__(t, new Py_Int(i));
+          this._list[curr] = rlist.__getitem__(t, Py_Int.fromNumber(i));
         }
       }
     } else {
-      this._list[standardizeKey(key, this._list.length)] = val;
+      var index = standardizeKey(key, this.len());
+      if (!this._accepts(val)) {
+        this._makeRoomFor(val);
+      }
+      if (this._storage === OBJECTS) {
+        this._list[index] = val;
+      } else {
+        this._values[index] = (<Py_Int> val).toNumber();
+      }
     }
     return None;
   }
@@ -133,6 +337,7 @@ export class Py_List extends Py_Object implements Iterable {
     if (key.getType() === Py_Type.SLICE){
       var slice = <Py_Slice> key,
       step = slice.step === None ? 1 : (<Py_Int | Py_Long> slice.step).toNumber();
+      this._generalize();
       if (step === 1){
         var start = slice.start === None ? 0 : (<Py_Int> slice.start).toNumber(),
           stop = slice.stop === None ? this._list.length : (<Py_Int> slice.stop).toNumber(),
@@ -168,13 +373,30 @@ export class Py_List extends Py_Object implements Iterable {
 
       }
     } else {
-      this._list.splice(standardizeKey(key, this._list.length), 1);
+      var index = standardizeKey(key, this.len());
+      if (this._storage === RANGE) {
+        this._materialize();
+      }
+      if (this._storage === OBJECTS) {
+        this._list.splice(index, 1);
+      } else if (index >= 0 && index < this._size) {
+        this._values.set(this._values.subarray(index + 1, this._size), index);
+        this._size--;
+      }
     }
     return None;
   }
 
+  // Returns the items. Only lists of objects return their own storage.
   public toArray(): any[] {
-    return this._list;
+    if (this._storage === OBJECTS) {
+      return this._list;
+    }
+    var items: IPy_Object[] = [];
+    for (var i = 0; i < this._size; i++) {
+      items.push(this.item(i));
+    }
+    return items;
   }
 }
 
@@ -185,13 +407,16 @@ function standardizeKey(key: IPy_Object, len: number): number {
   return fixedKey;
 }
 
+// 32-bit integer multiplication, for hash functions.
+const imul: (a: number, b: number) => number = (<any> Math).imul;
+
 export class Py_Tuple extends Py_Object implements Iterable {
   private _len: Py_Int;  // can't resize a tuple
   private _tuple: IPy_Object[];
   constructor(t: IPy_Object[]) {
     super();
     this._tuple = t;
-    this._len = new Py_Int(t.length);
+    this._len = Py_Int.fromNumber(t.length);
   }
   static fromIterable(x: Iterable) {
     var it = x.iter();
@@ -206,6 +431,10 @@ export class Py_Tuple extends Py_Object implements Iterable {
       return this._len.toNumber();
   }
 
+  public item(i: number): IPy_Object {
+    return this._tuple[i];
+  }
+
   public iter(): Iterator {
     return new ListIterator(this._tuple);
   }
@@ -225,6 +454,33 @@ export class Py_Tuple extends Py_Object implements Iterable {
     return this.len() !== 0;
   }
 
+  // Adapted from Python 2.7's tuple hash function.
+  public hash(): number {
+    var x = 0x345678, mult = 1000003, len = this._tuple.length, i: number;
+    for (i = 0; i < len; i++) {
+      x = imul(x ^ this._tuple[i].hash(), mult);
+      mult = (mult + 82520 + len + len) | 0;
+    }
+    x = (x + 97531) | 0;
+    return x === -1 ? -2 : x;
+  }
+
+  public __eq__(other: IPy_Object): IPy_Object {
+    if (!(other instanceof Py_Tuple)) {
+      return False;
+    }
+    var a = this._tuple, b = (<Py_Tuple> other)._tuple, i: number;
+    if (a.length !== b.length) {
+      return False;
+    }
+    for (i = 0; i < a.length; i++) {
+      if (!keysEqual(a[i], b[i])) {
+        return False;
+      }
+    }
+    return True;
+  }
+
   public __len__(): Py_Int {
     return this._len;
   }
@@ -278,143 +534,270 @@ export class Py_Tuple extends Py_Object implements Iterable {
  * However, in Python, only dictionary items keyed on a string
  * actually surface as object properties...
  *
- * Which brings me to our idiosyncratic two-bucket dictionary
- * design. The first bucket is for items keyed on a Python
- * string; those go into "_stringDict", keyed on the string
- * prepended with $ to prevent collisions with special JavaScript
- * properties. The second bucket is for items keyed on other
- * Python objects; like in Python, those are keyed on their
- * __hash__ value.
+ * Which brings me to our idiosyncratic dictionary design. Items
+ * live in a hash table (see below), except in dictionaries
+ * created with a JavaScript object as their "_stringDict": there,
+ * items keyed on a Python string are stored as properties of that
+ * object, keyed on the string prepended with $ to prevent
+ * collisions with special JavaScript properties.
  *
  * This design lets us use *arbitrary JavaScript objects as
  * _stringDict*, making it possible for Python objects to live
  * a dual existence as both Dictionary and Object. An object's
  * __dict__ property in Ninia is just a Py_Dict with the
  * object as its _stringDict. :)
+ *
+ * The hash table follows CPython 3.6's compact layout. Entries
+ * (hash, key, value) are appended to parallel arrays, so they stay
+ * in insertion order, and a power-of-two sized index array maps
+ * table slots to entries. Lookups probe the index array with
+ * CPython's perturbed open addressing, comparing cached hashes
+ * before calling __eq__. Deleting an item marks its slot as a
+ * dummy and clears its entry; the holes are squeezed out the next
+ * time the table is resized.
+ *
+ * Every dictionary also carries a version tag, which changes on
+ * each mutation. Tags are drawn from a single counter, so no two
+ * dictionary states ever share one (see PEP 509). The interpreter
+ * uses them to validate its inline caches. Code that writes to an
+ * object's properties directly must call touch() on its __dict__.
  */
+var lastDictVersion = 0;
+// Index array values for slots that are unused, or whose item was deleted.
+const EMPTY = -1;
+const DUMMY = -2;
+const MIN_SIZE = 8;
+const PERTURB_SHIFT = 5;
+
+function hashOf(key: IPy_Object): number {
+  return key.hash() | 0;
+}
+
+// Compares two keys with equal hashes, or two tuple items.
+function keysEqual(a: IPy_Object, b: IPy_Object): boolean {
+  if (a === b) {
+    return true;
+  }
+  if (a instanceof Py_Str) {
+    return b instanceof Py_Str && a.toString() === b.toString();
+  }
+  return a.__eq__ !== undefined && a.__eq__(b) === True;
+}
+
 export class Py_Dict extends Py_Object implements Iterable {
-  // Non-string keys.
-  protected _objectKeys: IPy_Object[];
-  // Stores items not keyed on a string.
-  protected _vals: { [hash: number]: IPy_Object };
-  // Stores items keyed on a string.
+  // Version tag; changes whenever the dictionary is modified.
+  public version: number;
+  // Maps table slots to entry numbers, or EMPTY / DUMMY.
+  protected _indices: Int32Array;
+  // Entries, in insertion order. Deleted entries have a null key.
+  protected _hashes: number[];
+  protected _keys: IPy_Object[];
+  protected _values: IPy_Object[];
+  // Number of live entries.
+  protected _used: number;
+  // Stores items keyed on a string, if not null.
   protected _stringDict: { [str: string]: IPy_Object };
-  constructor(stringDict: { [str: string]: IPy_Object } = {}) {
+  constructor(stringDict: { [str: string]: IPy_Object } = null) {
     super();
-    this._objectKeys = [];
-    this._vals = {};
     this._stringDict = stringDict;
+    this._reset(MIN_SIZE);
+    this.version = ++lastDictVersion;
+  }
+  // Marks the dictionary as modified.
+  public touch(): void {
+    this.version = ++lastDictVersion;
   }
   public getStringDict(): { [str: string]: IPy_Object } {
     return this._stringDict;
   }
-  public clone(): Py_Dict {
-    var clone = new Py_Dict(),
-      keys = Object.keys(this._vals), i: number, key: string;
-    for (i = 0; i < keys.length; i++) {
-      key = keys[i];
-      clone._vals[<any> key] = this._vals[<any> key];
+  // Notes a direct write to obj's properties, which bypasses set() / del().
+  public static touchAttrs(obj: IPy_Object): void {
+    var dict = (<any> obj).$__dict__;
+    if (dict instanceof Py_Dict) {
+      dict.touch();
+    }
+  }
+
+  // Empties the table, giving it size slots.
+  private _reset(size: number): void {
+    var indices = new Int32Array(size);
+    for (var i = 0; i < size; i++) {
+      indices[i] = EMPTY;
+    }
+    this._indices = indices;
+    this._hashes = [];
+    this._keys = [];
+    this._values = [];
+    this._used = 0;
+  }
+
+  // Returns the table slot holding key, or -1.
+  protected _find(key: IPy_Object, hash: number): number {
+    var indices = this._indices,
+      mask = indices.length - 1,
+      i = hash & mask,
+      perturb = hash >>> 0,
+      ix: number;
+    while ((ix = indices[i]) !== EMPTY) {
+      if (ix >= 0 && this._hashes[ix] === hash && keysEqual(this._keys[ix], key)) {
+        return i;
+      }
+      perturb >>>= PERTURB_SHIFT;
+      i = (i * 5 + perturb + 1) & mask;
+    }
+    return -1;
+  }
+
+  // Returns the first empty slot on hash's probe sequence.
+  private _findEmpty(hash: number): number {
+    var indices = this._indices,
+      mask = indices.length - 1,
+      i = hash & mask,
+      perturb = hash >>> 0;
+    while (indices[i] !== EMPTY) {
+      perturb >>>= PERTURB_SHIFT;
+      i = (i * 5 + perturb + 1) & mask;
     }
-    clone._objectKeys = this._objectKeys.slice(0);
-    keys = Object.keys(this._stringDict);
+    return i;
+  }
+
+  // Rebuilds the table with room for its live entries, dropping deleted
+  // ones.
+  private _resize(): void {
+    var hashes = this._hashes, keys = this._keys, values = this._values,
+      size = MIN_SIZE, i: number, n: number;
+    while (size <= this._used * 3) {
+      size *= 2;
+    }
+    this._reset(size);
     for (i = 0; i < keys.length; i++) {
-      key = keys[i];
-      clone._stringDict[key] = this._stringDict[key];
+      if (keys[i] !== null) {
+        n = this._keys.length;
+        this._indices[this._findEmpty(hashes[i])] = n;
+        this._hashes.push(hashes[i]);
+        this._keys.push(keys[i]);
+        this._values.push(values[i]);
+      }
     }
-    return clone;
+    this._used = this._keys.length;
   }
-  public $get = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    var res = this.get(args[0]);
-    if (res == undefined) {
-      if (args.length > 1) {
-        return args[1];
+
+  protected _lookup(key: IPy_Object, hash: number): IPy_Object {
+    var slot = this._find(key, hash);
+    return slot >= 0 ? this._values[this._indices[slot]] : undefined;
+  }
+
+  protected _insert(key: IPy_Object, hash: number, val: IPy_Object): void {
+    var slot = this._find(key, hash);
+    if (slot >= 0) {
+      this._values[this._indices[slot]] = val;
+      return;
+    }
+    // Keep at least a third of the slots empty. Every entry, deleted or
+    // not, fills a slot.
+    if ((this._keys.length + 1) * 3 > this._indices.length * 2) {
+      this._resize();
+    }
+    this._indices[this._findEmpty(hash)] = this._keys.length;
+    this._hashes.push(hash);
+    this._keys.push(key);
+    this._values.push(val);
+    this._used++;
+  }
+
+  protected _remove(key: IPy_Object, hash: number): boolean {
+    var slot = this._find(key, hash), ix: number;
+    if (slot < 0) {
+      return false;
+    }
+    ix = this._indices[slot];
+    this._indices[slot] = DUMMY;
+    this._keys[ix] = null;
+    this._values[ix] = null;
+    this._used--;
+    return true;
+  }
+
+  // Copies the items into an empty dictionary, reusing their hashes.
+  protected _copyTo(other: Py_Dict): void {
+    var keys = this._keys, i: number;
+    for (i = 0; i < keys.length; i++) {
+      if (keys[i] !== null) {
+        other._insert(keys[i], this._hashes[i], this._values[i]);
       }
-      return None;
     }
-    return res;
-  });
-  public $__getitem__ = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    return this.get(args[0]);
-  });
-  public $__setitem__ = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    this.set(args[0], args[1]);
-    return None;
-  });
-  public $__delitem__ = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    this.del(args[0]);
-    return None;
-  });
-  public $keys = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-    return new Py_List(this.keys());
-  });
+    if (this._stringDict !== null) {
+      Object.keys(this._stringDict).forEach((key: string) => {
+        other.set(new Py_Str(key.slice(1)), this._stringDict[key]);
+      });
+    }
+  }
+
+  public clone(): Py_Dict {
+    var clone = new Py_Dict();
+    this._copyTo(clone);
+    return clone;
+  }
   public get(key: IPy_Object): IPy_Object {
-    if (key instanceof Py_Str) {
+    if (this._stringDict !== null && key instanceof Py_Str) {
       return this._stringDict[`$${key.toString()}`];
-    } else {
-      var h = key.hash();
-      return this._vals[h];
     }
+    return this._lookup(key, hashOf(key));
   }
   public set(key: IPy_Object, val: IPy_Object): void {
-    if (key instanceof Py_Str) {
+    this.version = ++lastDictVersion;
+    if (this._stringDict !== null && key instanceof Py_Str) {
       this._stringDict[`$${key.toString()}`] = val;
     } else {
-      var h = key.hash();
-      if (this._vals[h] === undefined) {
-        this._objectKeys.push(key);
-      }
-      this._vals[h] = val;
+      this._insert(key, hashOf(key), val);
     }
   }
   public del(key: IPy_Object): void {
-    if (key instanceof Py_Str) {
+    this.version = ++lastDictVersion;
+    if (this._stringDict !== null && key instanceof Py_Str) {
       delete this._stringDict[`$${key.toString()}`];
     } else {
-      var h = key.hash();
-      if (this._vals[h] !== undefined) {
-        delete this._vals[h];
-      }
-      this._objectKeys.splice(this._objectKeys.indexOf(key), 1);
+      this._remove(key, hashOf(key));
     }
   }
   public iter(): Iterator {
-    return new ListIterator(this._objectKeys.concat(
-      Object.keys(this._stringDict).map(
-        (key: string) => new Py_Str(key.slice(1))
-      )));
+    return new ListIterator(this.keys());
   }
   public len(): number {
-      return Object.keys(this._stringDict).length + this._objectKeys.length;
+    return this._used + (this._stringDict !== null ? Object.keys(this._stringDict).length : 0);
   }
   public toPairs(): [IPy_Object,IPy_Object][] {
     var pairs: [IPy_Object, IPy_Object][] = [], i: number;
-    for (i = 0; i < this._objectKeys.length; i++) {
-      var key = this._objectKeys[i];
-      var h = key.hash();
-      var val = this._vals[h];
-      pairs.push([key, val]);
-    }
-    Object.keys(this._stringDict).forEach((key: string) => {
-      pairs.push(<[IPy_Object, IPy_Object]> [new Py_Str(key.slice(1)), this._stringDict[key]]);
-    });
+    for (i = 0; i < this._keys.length; i++) {
+      if (this._keys[i] !== null) {
+        pairs.push([this._keys[i], this._values[i]]);
+      }
+    }
+    if (this._stringDict !== null) {
+      Object.keys(this._stringDict).forEach((key: string) => {
+        pairs.push(<[IPy_Object, IPy_Object]> [new Py_Str(key.slice(1)), this._stringDict[key]]);
+      });
+    }
     return pairs;
   }
   public keys(): IPy_Object[] {
-    return this._objectKeys.concat(
-      Object.keys(this._stringDict).map(
-        (key: string) => new Py_Str(key.slice(1))
-      )
-    );
+    var keys: IPy_Object[] = [], i: number;
+    for (i = 0; i < this._keys.length; i++) {
+      if (this._keys[i] !== null) {
+        keys.push(this._keys[i]);
+      }
+    }
+    if (this._stringDict !== null) {
+      Object.keys(this._stringDict).forEach((key: string) => {
+        keys.push(new Py_Str(key.slice(1)));
+      });
+    }
+    return keys;
   }
   public toString(): string {
     var s = '{';
-    for (var key of this._objectKeys) {
-      var h = key.hash();
-      var val = this._vals[h];
-      s += `${key.__repr__()}: ${val.__repr__()}, `;
-    }
-    Object.keys(this._stringDict).forEach((key) => {
-      s += `'${key.slice(1)}': ${this._stringDict[key].__repr__()}, `;
+    this.toPairs().forEach((pair: [IPy_Object, IPy_Object]) => {
+      s += `${pair[0].__repr__()}: ${pair[1].__repr__()}, `;
     });
     // trim off last ', '
     return (s.length > 1 ? s.slice(0, -2)  : s) + '}';
@@ -425,7 +808,25 @@ export class Py_Dict extends Py_Object implements Iterable {
   }
 
   public __len__(): Py_Int {
-    return new Py_Int(this.len());
+    return Py_Int.fromNumber(this.len());
+  }
+
+  public __contains__(key: IPy_Object): typeof True {
+    return this.get(key) !== undefined ? True : False;
+  }
+
+  public __getitem__(t: Thread, key: IPy_Object): IPy_Object {
+    return this.get(key);
+  }
+
+  public __setitem__(t: Thread, key: IPy_Object, val: IPy_Object): IPy_Object {
+    this.set(key, val);
+    return None;
+  }
+
+  public __delitem__(t: Thread, key: IPy_Object): IPy_Object {
+    this.del(key);
+    return None;
   }
 
   public __eq__(o: IPy_Object): IPy_Object {
@@ -437,6 +838,7 @@ export class Py_Dict extends Py_Object implements Iterable {
   }
 }
 
+// Sets are dictionaries that map each item to itself.
 export class Py_Set extends Py_Dict implements IPy_Object {
   static fromArray(objects: IPy_Object[]): Py_Set {
     var res = new Py_Set();
@@ -454,64 +856,120 @@ export class Py_Set extends Py_Dict implements IPy_Object {
   }
 
   public add(x: IPy_Object): void {
-    this.set(x, x);
+    this._insert(x, hashOf(x), x);
+  }
+
+  public contains(x: IPy_Object): boolean {
+    return this._find(x, hashOf(x)) >= 0;
+  }
+
+  public clone(): Py_Set {
+    var clone = new Py_Set();
+    this._copyTo(clone);
+    return clone;
   }
 
   public toString(): string {
     var s = 'set([';
-    for (var key of this._objectKeys) {
+    for (var key of this.keys()) {
       s += key.__repr__() + ', ';
     }
-    Object.keys(this._stringDict).forEach((key) => {
-      s += key.slice(1) + ', ';
-    });
     return (s.length > 5 ? s.slice(0, -2) : s) + '])';
   }
 
+  // The in-place operators update this set. The others build a new set
+  // from a copy of this one, or from the items they keep, without copying
+  // the items of either set into arrays first.
+
   // set intersection
+  public __iand__(x: IPy_Object): IPy_Object {
+    if (!(x instanceof Py_Set)) {
+      return NotImplemented;
+    }
+    var keys = this._keys, i: number;
+    for (i = 0; i < keys.length; i++) {
+      if (keys[i] !== null && !(<Py_Set> x).contains(keys[i])) {
+        this._remove(keys[i], this._hashes[i]);
+      }
+    }
+    return this;
+  }
   public __and__(t: Thread, x: IPy_Object): IPy_Object {
     if (!(x instanceof Py_Set)) {
       return NotImplemented;
     }
     var res = new Py_Set(),
-      other: Py_Set = <Py_Set> x;
-    for (var key of this.keys()) {
-      if (other.get(key) !== undefined) {
-        res.add(key);
+      keys = this._keys, i: number;
+    for (i = 0; i < keys.length; i++) {
+      if (keys[i] !== null && (<Py_Set> x).contains(keys[i])) {
+        res._insert(keys[i], this._hashes[i], keys[i]);
       }
     }
     return res;
   }
 
   // set difference
+  public __isub__(x: IPy_Object): IPy_Object {
+    if (!(x instanceof Py_Set)) {
+      return NotImplemented;
+    }
+    var other = <Py_Set> x,
+      keys = other._keys, i: number;
+    for (i = 0; i < keys.length; i++) {
+      if (keys[i] !== null) {
+        this._remove(keys[i], other._hashes[i]);
+      }
+    }
+    return this;
+  }
   public __sub__(t: Thread, x: IPy_Object): IPy_Object {
     if (!(x instanceof Py_Set)) {
       return NotImplemented;
     }
     var res = new Py_Set(),
-      other: Py_Set = <Py_Set> x;
-    for (var key of this.keys()) {
-      if (other.get(key) === undefined) {
-        res.add(key);
+      keys = this._keys, i: number;
+    for (i = 0; i < keys.length; i++) {
+      if (keys[i] !== null && !(<Py_Set> x).contains(keys[i])) {
+        res._insert(keys[i], this._hashes[i], keys[i]);
       }
     }
     return res;
   }
 
   // set symmetric difference
+  public __ixor__(x: IPy_Object): IPy_Object {
+    if (!(x instanceof Py_Set)) {
+      return NotImplemented;
+    }
+    var other = <Py_Set> x,
+      keys = other._keys, i: number;
+    for (i = 0; i < keys.length; i++) {
+      if (keys[i] !== null && !this._remove(keys[i], other._hashes[i])) {
+        this._insert(keys[i], other._hashes[i], keys[i]);
+      }
+    }
+    return this;
+  }
   public __xor__(t: Thread, x: IPy_Object): IPy_Object {
-    // TODO: implement this directly
-    var left = this.__sub__(t, x);
-    var right = x.__sub__(t, this);
-    return left.__or__(t, right);
+    if (!(x instanceof Py_Set)) {
+      return NotImplemented;
+    }
+    return this.clone().__ixor__(x);
   }
 
   // set union
+  public __ior__(x: IPy_Object): IPy_Object {
+    if (!(x instanceof Py_Set)) {
+      return NotImplemented;
+    }
+    (<Py_Set> x)._copyTo(this);
+    return this;
+  }
   public __or__(t: Thread, x: IPy_Object): IPy_Object {
     if (!(x instanceof Py_Set)) {
       return NotImplemented;
     }
-    return Py_Set.fromArray(this.keys().concat((<Py_Set> x).keys()));
+    return this.clone().__ior__(x);
   }
 
   // subset
@@ -519,9 +977,9 @@ export class Py_Set extends Py_Dict implements IPy_Object {
     if (!(x instanceof Py_Set)) {
       return NotImplemented;
     }
-    var h: string, other: Py_Set = <Py_Set> x;
-    for (var key of this.keys()) {
-      if (other.get(key) === undefined) {
+    var keys = this._keys, i: number;
+    for (i = 0; i < keys.length; i++) {
+      if (keys[i] !== null && !(<Py_Set> x).contains(keys[i])) {
         return False;
       }
     }
@@ -529,3 +987,46 @@ export class Py_Set extends Py_Dict implements IPy_Object {
     return (this.len() == (<Py_Set> x).len())? False : True;
   }
 }
+
+// Native methods are created once per type rather than once per instance.
+// LOAD_ATTR binds them to the receiver when a program fetches one.
+(<any> Py_List.prototype).$append = new Py_NativeMethod((self: Py_List, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return self.append(args[0]);
+});
+(<any> Py_List.prototype).$sort = new Py_NativeMethod((self: Py_List, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  // XXX: Hack around circular reference.
+  var builtins: typeof _builtins = require('./builtins');
+  return builtins.sortList(self, t, f, args, kwargs);
+});
+(<any> Py_List.prototype).$__getitem__ = new Py_NativeMethod((self: Py_List, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return self.__getitem__(t, args[0]);
+});
+(<any> Py_List.prototype).$__delitem__ = new Py_NativeMethod((self: Py_List, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return self.__delitem__(t, args[0]);
+});
+(<any> Py_List.prototype).$__setitem__ = new Py_NativeMethod((self: Py_List, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return self.__setitem__(t, args[0], args[1]);
+});
+
+(<any> Py_Dict.prototype).$get = new Py_NativeMethod((self: Py_Dict, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  var res = self.get(args[0]);
+  if (res == undefined) {
+    if (args.length > 1) {
+      return args[1];
+    }
+    return None;
+  }
+  return res;
+});
+(<any> Py_Dict.prototype).$__getitem__ = new Py_NativeMethod((self: Py_Dict, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return self.get(args[0]);
+});
+(<any> Py_Dict.prototype).$__setitem__ = new Py_NativeMethod((self: Py_Dict, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return self.__setitem__(t, args[0], args[1]);
+});
+(<any> Py_Dict.prototype).$__delitem__ = new Py_NativeMethod((self: Py_Dict, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return self.__delitem__(t, args[0]);
+});
+(<any> Py_Dict.prototype).$keys = new Py_NativeMethod((self: Py_Dict, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+  return new Py_List(self.keys());
+});
@@ -0,0 +1,544 @@
+import {IPy_Object} from './interfaces';
+import {True, False, Py_Int, Py_Float} from './primitives';
+import {Py_List} from './collections';
+import opcodes = require('./opcodes');
+import quicken = require('./quicken');
+import {Thread} from './threading';
+// !! Use only for type info !!
+import _Py_CodeObject = require('./codeobject');
+import _Py_FrameObject = require('./frameobject');
+import _optable = require('./optable');
+import _Py_GeneratorObject = require('./genobject');
+// XXX: hack around name resolution in eval'd code
+var hardcoded_Py_Int = Py_Int;
+var hardcoded_Py_Float = Py_Float;
+var hardcoded_Py_List = Py_List;
+var hardcoded_True = True;
+var hardcoded_False = False;
+var hardcoded_bool = bool;
+var hardcoded_Py_GeneratorObject: typeof _Py_GeneratorObject = null;
+
+// XXX: Copy+paste of builtins.bool.
+function bool(x: IPy_Object): typeof True {
+    if (typeof(x) === 'object' && x.asBool) {
+        return x.asBool() ? True : False;
+    }
+    return True;
+}
+
+// Instructions compiled code may run, counted at loop back edges, before it
+// returns to the bytecode loop. Each return counts as one instruction
+// against the thread's budget, so this bounds how long a compiled loop can
+// keep the scheduler waiting.
+const sliceBudget = 200;
+
+// Instructions whose argument is the index of a jump target.
+const jumps: { [op: number]: boolean } = {};
+[opcodes.JUMP_FORWARD, opcodes.JUMP_ABSOLUTE, opcodes.JUMP_IF_FALSE_OR_POP,
+ opcodes.JUMP_IF_TRUE_OR_POP, opcodes.POP_JUMP_IF_FALSE, opcodes.POP_JUMP_IF_TRUE,
+ opcodes.CONTINUE_LOOP, opcodes.FOR_ITER, opcodes.SETUP_LOOP, opcodes.SETUP_EXCEPT,
+ opcodes.SETUP_FINALLY, opcodes.SETUP_WITH
+].forEach((op: number) => jumps[op] = true);
+
+// Int methods for the binary operations compiled inline.
+const intOps: { [op: number]: string } = {};
+intOps[opcodes.BINARY_ADD] = intOps[opcodes.INPLACE_ADD] = 'add';
+intOps[opcodes.BINARY_SUBTRACT] = intOps[opcodes.INPLACE_SUBTRACT] = 'sub';
+intOps[opcodes.BINARY_MULTIPLY] = intOps[opcodes.INPLACE_MULTIPLY] = 'mul';
+intOps[opcodes.BINARY_AND] = intOps[opcodes.INPLACE_AND] = 'and';
+intOps[opcodes.BINARY_OR] = intOps[opcodes.INPLACE_OR] = 'or';
+intOps[opcodes.BINARY_XOR] = intOps[opcodes.INPLACE_XOR] = 'xor';
+// These only raise when dividing by zero, which is left to the handler.
+intOps[opcodes.BINARY_MODULO] = intOps[opcodes.INPLACE_MODULO] = 'mod';
+intOps[opcodes.BINARY_FLOOR_DIVIDE] = intOps[opcodes.INPLACE_FLOOR_DIVIDE] = 'floordiv';
+const intDivisions: { [method: string]: boolean } = { 'mod': true, 'floordiv': true };
+
+// Float methods for the binary operations compiled inline. Division only
+// raises when dividing by zero, which is left to the handler.
+const floatOps: { [op: number]: string } = {};
+floatOps[opcodes.BINARY_ADD] = floatOps[opcodes.INPLACE_ADD] = 'add';
+floatOps[opcodes.BINARY_SUBTRACT] = floatOps[opcodes.INPLACE_SUBTRACT] = 'sub';
+floatOps[opcodes.BINARY_MULTIPLY] = floatOps[opcodes.INPLACE_MULTIPLY] = 'mul';
+floatOps[opcodes.BINARY_DIVIDE] = floatOps[opcodes.INPLACE_DIVIDE] = 'truediv';
+floatOps[opcodes.BINARY_TRUE_DIVIDE] = floatOps[opcodes.INPLACE_TRUE_DIVIDE] = 'truediv';
+
+// Int and float methods for COMPARE_OP's rich comparisons, by argument.
+const intComparisons = ['lt', 'le', 'eq', 'ne', 'gt', 'ge'];
+const COMPARE_IS = 8, COMPARE_IS_NOT = 9;
+
+// Instructions that always pop and push the same number of values, and so
+// are run by their handler with the values around them kept in locals:
+// [values popped, values pushed]. -1 stands for the instruction argument.
+const stackEffects: { [op: number]: [number, number] } = {};
+[opcodes.LOAD_GLOBAL, opcodes.LOAD_NAME, opcodes.LOAD_DEREF, opcodes.LOAD_CLOSURE
+].forEach((op: number) => stackEffects[op] = [0, 1]);
+[opcodes.STORE_GLOBAL, opcodes.STORE_NAME, opcodes.STORE_DEREF, opcodes.LIST_APPEND
+].forEach((op: number) => stackEffects[op] = [1, 0]);
+[opcodes.UNARY_POSITIVE, opcodes.UNARY_NEGATIVE, opcodes.UNARY_CONVERT,
+ opcodes.UNARY_INVERT, opcodes.GET_ITER
+].forEach((op: number) => stackEffects[op] = [1, 1]);
+[opcodes.BINARY_POWER, opcodes.BINARY_MULTIPLY, opcodes.BINARY_DIVIDE,
+ opcodes.BINARY_MODULO, opcodes.BINARY_ADD, opcodes.BINARY_SUBTRACT,
+ opcodes.BINARY_SUBSCR, opcodes.BINARY_FLOOR_DIVIDE, opcodes.BINARY_TRUE_DIVIDE,
+ opcodes.BINARY_LSHIFT, opcodes.BINARY_RSHIFT, opcodes.BINARY_AND,
+ opcodes.BINARY_XOR, opcodes.BINARY_OR, opcodes.INPLACE_POWER,
+ opcodes.INPLACE_MULTIPLY, opcodes.INPLACE_DIVIDE, opcodes.INPLACE_MODULO,
+ opcodes.INPLACE_ADD, opcodes.INPLACE_SUBTRACT, opcodes.INPLACE_FLOOR_DIVIDE,
+ opcodes.INPLACE_TRUE_DIVIDE, opcodes.INPLACE_LSHIFT, opcodes.INPLACE_RSHIFT,
+ opcodes.INPLACE_AND, opcodes.INPLACE_XOR, opcodes.INPLACE_OR, opcodes.COMPARE_OP
+].forEach((op: number) => stackEffects[op] = [2, 1]);
+stackEffects[opcodes.STORE_ATTR] = [2, 0];
+stackEffects[opcodes.STORE_SUBSCR] = [3, 0];
+stackEffects[opcodes.BUILD_TUPLE] = stackEffects[opcodes.BUILD_LIST] = [-1, 1];
+
+// Share of a code object's instructions that must be compiled inline for
+// compiling it to pay off. Compiled code runs the others by their handlers,
+// with more work around each call than in the bytecode loop.
+const minInlined = 0.6;
+
+export interface CompilerOptions {
+    // Calls of a code object plus iterations of its loops after which it is
+    // compiled.
+    threshold?: number;
+    // Compiles hot code however little of it compiles inline, so that tests
+    // run as much compiled code as they can.
+    always?: boolean;
+    // Receives the JavaScript generated for each code object.
+    dump?: (code: _Py_CodeObject, source: string) => void;
+}
+
+// Code objects are shared by every interpreter in the process (see
+// Unmarshaller.loadFile), and so is the compiler's configuration.
+var enabled = false,
+    threshold = 1000,
+    always = false,
+    dump: (code: _Py_CodeObject, source: string) => void = null;
+
+// Turns on compilation of hot code objects, for code decoded from now on.
+export function enable(options: CompilerOptions): void {
+    enabled = true;
+    if (options.threshold !== undefined) {
+        threshold = options.threshold;
+    }
+    if (options.always !== undefined) {
+        always = options.always;
+    }
+    if (options.dump !== undefined) {
+        dump = options.dump;
+    }
+}
+
+export function isEnabled(): boolean {
+    return enabled;
+}
+
+/**
+ * Counts calls of a freshly decoded code object, and iterations of its
+ * loops, and compiles it when they reach the threshold, if enough of it
+ * compiles inline (see worthCompiling). The counts are kept by wrapping
+ * the handlers of its first instruction and of its backward jumps, which
+ * are put back if the code isn't compiled.
+ */
+export function instrument(code: _Py_CodeObject): void {
+    // XXX: Hack around circular reference.
+    var optable: typeof _optable = require('./optable'),
+        handlers = code.handlers,
+        original = handlers.slice(0),
+        counted: number[] = [],
+        // Compiled code runs one instruction at a time through these, so
+        // they are the plain handlers rather than the peephole optimizer's.
+        base = handlers.map((h, i) => optable[code.ops[i]] !== undefined ? optable[code.ops[i]] : h),
+        count = (i: number) => {
+            counted.push(i);
+            handlers[i] = function(f: _Py_FrameObject, t: Thread) {
+                if (++code.hotness >= threshold && code.compiled === null) {
+                    if (always || worthCompiling(code)) {
+                        compile(code, base);
+                    } else {
+                        counted.forEach((j: number) => handlers[j] = original[j]);
+                    }
+                }
+                original[i](f, t);
+            };
+        };
+    count(0);
+    for (var i = 1; i < handlers.length; i++) {
+        // Besides loops' own jumps, jump threading can point a forward or
+        // conditional jump back at a loop.
+        if (jumps[code.ops[i]] && code.args[i] <= i) {
+            count(i);
+        }
+    }
+}
+
+// Whether enough of code's instructions are compiled inline, rather than
+// run by their handlers, for compiled code to be faster than the bytecode
+// loop.
+export function worthCompiling(code: _Py_CodeObject): boolean {
+    var count = code.ops.length, inlined = 0;
+    for (var i = 0; i < count; i++) {
+        if (isInlined(code, i)) {
+            inlined++;
+        }
+    }
+    return inlined >= minInlined * count;
+}
+
+/**
+ * Compiles a code object into a single JavaScript function, and installs it
+ * as the handler of every instruction the function can be entered at. base
+ * holds the code's original handlers.
+ *
+ * The function carries on from the frame's current instruction. Values on
+ * the frame's stack are kept in locals (v0, v1, ...) between instructions
+ * where possible, and simple instructions are compiled inline. Others are
+ * run by their handler, with the locals pushed to the stack first. When a
+ * handler suspends the frame (calls into a Python function, waits on an
+ * async native, yields), raises, or jumps somewhere unexpected, the
+ * function returns to the bytecode loop, which picks up from f.lastInst as
+ * usual.
+ */
+export function compile(code: _Py_CodeObject, base: ((f: _Py_FrameObject, t: Thread) => void)[]): void {
+    if (hardcoded_Py_GeneratorObject === null) {
+        // XXX: Hack around circular reference.
+        hardcoded_Py_GeneratorObject = require('./genobject');
+    }
+    var source = new CodeGenerator(code).generate(),
+        factory: (H: ((f: _Py_FrameObject, t: Thread) => void)[], K: IPy_Object[]) => (f: _Py_FrameObject, t: Thread) => void = eval(source),
+        // Quickening specializes these as it does the bytecode loop's.
+        fallbacks = code.compiledHandlers = base.slice(0),
+        compiled = factory(fallbacks, code.consts),
+        labels = findLabels(code);
+    if (dump !== null) {
+        dump(code, source);
+    }
+    if (code.quickCounters !== null) {
+        // Specialize the fallbacks after a short warmup.
+        quicken.initCounters(code.quickCounters);
+    }
+    code.compiled = compiled;
+    for (var i = 0; i < labels.length; i++) {
+        code.handlers[i] = labels[i] ? compiled : base[i];
+    }
+}
+
+// Instructions run by their handler, after which the values on the stack
+// are left there.
+function isGeneric(code: _Py_CodeObject, i: number): boolean {
+    var op = code.ops[i];
+    switch (op) {
+        case opcodes.NOP:
+        case opcodes.POP_TOP:
+        case opcodes.ROT_TWO:
+        case opcodes.ROT_THREE:
+        case opcodes.DUP_TOP:
+        case opcodes.UNARY_NOT:
+        case opcodes.LOAD_CONST:
+        case opcodes.LOAD_FAST:
+        case opcodes.STORE_FAST:
+        case opcodes.JUMP_FORWARD:
+        case opcodes.JUMP_ABSOLUTE:
+        case opcodes.POP_JUMP_IF_FALSE:
+        case opcodes.POP_JUMP_IF_TRUE:
+        case opcodes.FOR_ITER:
+            return false;
+        case opcodes.LOAD_ATTR:
+            // Pushes the receiver too, when the attribute is a native method.
+            return code.attrCalls[i] === 1;
+        default:
+            return stackEffects[op] === undefined;
+    }
+}
+
+// Whether instruction i is compiled to JavaScript of its own, at least for
+// the operands it usually has, rather than to a call of its handler.
+function isInlined(code: _Py_CodeObject, i: number): boolean {
+    var op = code.ops[i], arg = code.args[i];
+    if (intOps[op] !== undefined || floatOps[op] !== undefined || op === opcodes.BINARY_SUBSCR) {
+        return true;
+    }
+    if (op === opcodes.COMPARE_OP) {
+        return arg < intComparisons.length || arg === COMPARE_IS || arg === COMPARE_IS_NOT;
+    }
+    return !isGeneric(code, i) && stackEffects[op] === undefined && op !== opcodes.LOAD_ATTR;
+}
+
+// Flags the instructions compiled code can be entered at: the first one,
+// jump and exception handler targets, and those following an instruction
+// that may suspend the frame, where it resumes.
+function findLabels(code: _Py_CodeObject): Uint8Array {
+    var count = code.ops.length,
+        labels = new Uint8Array(count);
+    labels[0] = 1;
+    for (var i = 0; i < count; i++) {
+        if (jumps[code.ops[i]] && code.args[i] < count) {
+            labels[code.args[i]] = 1;
+        }
+        if (i + 1 < count && isGeneric(code, i)) {
+            labels[i + 1] = 1;
+        }
+    }
+    return labels;
+}
+
+class CodeGenerator {
+    private code: _Py_CodeObject;
+    private labels: Uint8Array;
+    private out: string[] = [];
+    // Values at the top of the frame's stack are held in locals v0 to
+    // v<depth - 1> rather than on the stack.
+    private depth: number = 0;
+    private maxDepth: number = 0;
+
+    constructor(code: _Py_CodeObject) {
+        this.code = code;
+        this.labels = findLabels(code);
+    }
+
+    private emit(line: string): void {
+        this.out.push(line);
+    }
+
+    private v(i: number): string {
+        if (i >= this.maxDepth) {
+            this.maxDepth = i + 1;
+        }
+        return `v${i}`;
+    }
+
+    // Pushes the values held in locals to the frame's stack.
+    private spill(): void {
+        var values: string[] = [];
+        for (var i = 0; i < this.depth; i++) {
+            values.push(this.v(i));
+        }
+        if (values.length > 0) {
+            this.emit(`f.stack.push(${values.join(', ')});`);
+        }
+        this.depth = 0;
+    }
+
+    // Moves values from the frame's stack into locals until there are at
+    // least n of them.
+    private take(n: number): void {
+        var missing = n - this.depth, i: number;
+        if (missing <= 0) {
+            return;
+        }
+        for (i = this.depth - 1; i >= 0; i--) {
+            this.emit(`${this.v(i + missing)} = ${this.v(i)};`);
+        }
+        for (i = missing - 1; i >= 0; i--) {
+            this.emit(`${this.v(i)} = f.stack.pop();`);
+        }
+        this.depth = n;
+    }
+
+    // Runs instruction i's handler. Control leaves the compiled code if the
+    // handler suspends the frame or transfers control.
+    private callHandler(i: number): void {
+        this.emit(`f.lastInst = ${i}; H[${i}](f, t);`);
+        this.emit(`if (f.returnToThread) return;`);
+        this.emit(`if (f.lastInst !== ${i}) { pc = f.lastInst + 1; continue loop; }`);
+    }
+
+    // Runs instruction i's handler, which pops `pops` values and pushes
+    // `pushes`, then moves the stack back into locals. When this is one
+    // branch of an inline fast path, the values have to end up in the same
+    // locals as on the other branch.
+    private slowPath(i: number, pops: number, pushes: number, branch: boolean = false): void {
+        // Values below those the handler pops stay on the stack.
+        var depth = Math.max(this.depth - pops, 0) + pushes;
+        this.spill();
+        this.callHandler(i);
+        if (!branch && this.labels[i + 1]) {
+            // The values would only be pushed back before the label.
+            this.depth = 0;
+            return;
+        }
+        for (var j = depth - 1; j >= 0; j--) {
+            this.emit(`${this.v(j)} = f.stack.pop();`);
+        }
+        this.depth = depth;
+    }
+
+    private jump(i: number, target: number): void {
+        if (target <= i) {
+            this.emit(`if ((n -= ${i - target + 1}) <= 0) { f.lastInst = ${target - 1}; return; }`);
+        }
+        this.emit(`pc = ${target}; continue loop;`);
+    }
+
+    private instruction(i: number): void {
+        var code = this.code,
+            op = code.ops[i],
+            arg = code.args[i],
+            d = this.depth,
+            effect = stackEffects[op],
+            a: string, b: string, test: string;
+        switch (op) {
+            case opcodes.NOP:
+                break;
+            case opcodes.POP_TOP:
+                if (d > 0) {
+                    this.depth--;
+                } else {
+                    this.emit(`f.stack.pop();`);
+                }
+                break;
+            case opcodes.ROT_TWO:
+                this.take(2);
+                this.emit(`x = v${d = this.depth - 1}; v${d} = v${d - 1}; v${d - 1} = x;`);
+                break;
+            case opcodes.ROT_THREE:
+                this.take(3);
+                d = this.depth - 1;
+                this.emit(`x = v${d}; v${d} = v${d - 1}; v${d - 1} = v${d - 2}; v${d - 2} = x;`);
+                break;
+            case opcodes.DUP_TOP:
+                this.take(1);
+                this.emit(`${this.v(this.depth)} = v${this.depth - 1};`);
+                this.depth++;
+                break;
+            case opcodes.UNARY_NOT:
+                this.take(1);
+                a = this.v(this.depth - 1);
+                this.emit(`${a} = hardcoded_bool(${a}) === hardcoded_True ? hardcoded_False : hardcoded_True;`);
+                break;
+            case opcodes.LOAD_CONST:
+                this.emit(`${this.v(d)} = K[${arg}];`);
+                this.depth++;
+                break;
+            case opcodes.LOAD_FAST:
+                // Unbound locals raise UnboundLocalError in the handler.
+                this.emit(`if ((${this.v(d)} = fl[${arg}]) === null) {`);
+                this.slowPath(i, 0, 1, true);
+                this.emit(`}`);
+                this.depth = d + 1;
+                break;
+            case opcodes.STORE_FAST:
+                this.take(1);
+                this.emit(`fl[${arg}] = v${--this.depth};`);
+                break;
+            case opcodes.JUMP_FORWARD:
+            case opcodes.JUMP_ABSOLUTE:
+                this.spill();
+                this.jump(i, arg);
+                break;
+            case opcodes.POP_JUMP_IF_FALSE:
+            case opcodes.POP_JUMP_IF_TRUE:
+                this.take(1);
+                this.emit(`c = v${--this.depth};`);
+                this.spill();
+                test = op === opcodes.POP_JUMP_IF_FALSE ? 'hardcoded_False' : 'hardcoded_True';
+                this.emit(`if (c === ${test} || (c !== hardcoded_True && c !== hardcoded_False && hardcoded_bool(c) === ${test})) {`);
+                this.jump(i, arg);
+                this.emit(`}`);
+                break;
+            case opcodes.FOR_ITER:
+                this.spill();
+                this.emit(`x = f.stack[f.stack.length - 1];`);
+                this.emit(`if (x.$__next__ !== undefined || x instanceof hardcoded_Py_GeneratorObject) {`);
+                this.callHandler(i);
+                this.emit(`pc = ${i + 1}; continue loop;`);
+                this.emit(`}`);
+                this.emit(`if ((${this.v(0)} = x.next()) == null) {`);
+                this.emit(`f.stack.pop();`);
+                this.jump(i, arg);
+                this.emit(`}`);
+                this.depth = 1;
+                break;
+            default:
+                if (op === opcodes.COMPARE_OP && arg < intComparisons.length) {
+                    this.take(2);
+                    a = this.v(this.depth - 2);
+                    b = this.v(this.depth - 1);
+                    this.emit(`if ((${a}.constructor === hardcoded_Py_Int || ${a}.constructor === hardcoded_Py_Float) && ${b}.constructor === ${a}.constructor) {`);
+                    this.emit(`${a} = ${a}.${intComparisons[arg]}(${b});`);
+                    this.emit(`} else {`);
+                    this.slowPath(i, 2, 1, true);
+                    this.emit(`}`);
+                } else if (intOps[op] !== undefined || floatOps[op] !== undefined) {
+                    this.take(2);
+                    a = this.v(this.depth - 2);
+                    b = this.v(this.depth - 1);
+                    if (intOps[op] !== undefined) {
+                        test = `${a}.constructor === hardcoded_Py_Int && ${b}.constructor === hardcoded_Py_Int`;
+                        if (intDivisions[intOps[op]]) {
+                            test += ` && ${b}.asBool()`;
+                        }
+                        this.emit(`if (${test}) {`);
+                        this.emit(`${a} = ${a}.${intOps[op]}(t, ${b});`);
+                        this.emit(`} else `);
+                    }
+                    if (floatOps[op] !== undefined) {
+                        test = `${a}.constructor === hardcoded_Py_Float && ${b}.constructor === hardcoded_Py_Float`;
+                        if (floatOps[op] === 'truediv') {
+                            test += ` && ${b}.value !== 0`;
+                        }
+                        this.emit(`if (${test}) {`);
+                        this.emit(`${a} = ${a}.${floatOps[op]}(t, ${b});`);
+                        this.emit(`} else `);
+                    }
+                    this.emit(`{`);
+                    this.slowPath(i, 2, 1, true);
+                    this.emit(`}`);
+                } else if (op === opcodes.BINARY_SUBSCR) {
+                    // Out of range indices give undefined, and are left to
+                    // the handler.
+                    this.take(2);
+                    a = this.v(this.depth - 2);
+                    b = this.v(this.depth - 1);
+                    this.emit(`if (${a}.constructor === hardcoded_Py_List && ${b}.constructor === hardcoded_Py_Int && (x = ${a}.__getitem__(t, ${b})) !== undefined) {`);
+                    this.emit(`${a} = x;`);
+                    this.emit(`} else {`);
+                    this.slowPath(i, 2, 1, true);
+                    this.emit(`}`);
+                } else if (op === opcodes.COMPARE_OP && (arg === COMPARE_IS || arg === COMPARE_IS_NOT)) {
+                    this.take(2);
+                    a = this.v(this.depth - 2);
+                    b = this.v(this.depth - 1);
+                    this.emit(`${a} = ${a} ${arg === COMPARE_IS ? '===' : '!=='} ${b} ? hardcoded_True : hardcoded_False;`);
+                    this.depth--;
+                } else if (!isGeneric(code, i)) {
+                    effect = effect !== undefined ? effect : [1, 1];
+                    this.slowPath(i, effect[0] < 0 ? arg : effect[0], effect[1]);
+                } else {
+                    this.spill();
+                    this.callHandler(i);
+                }
+        }
+    }
+
+    public generate(): string {
+        var code = this.code,
+            count = code.ops.length,
+            name = code.name.toString().replace(/\W/g, '_');
+        for (var i = 0; i < count; i++) {
+            if (this.labels[i]) {
+                this.spill();
+                this.emit(`case ${i}:`);
+            }
+            this.instruction(i);
+        }
+        var locals = ['x', 'c'];
+        for (i = 0; i < this.maxDepth; i++) {
+            locals.push(`v${i}`);
+        }
+        return `(function(H, K) {
+return function compiled_${name}(f, t) {
+var pc = f.lastInst, n = ${sliceBudget}, fl = f.fastlocals, ${locals.join(', ')};
+loop: for (;;) {
+switch (pc) {
+default:
+f.lastInst = pc - 1;
+return;
+${this.out.join('\n')}
+}
+f.lastInst = ${count - 1};
+return;
+}
+};
+})`;
+    }
+}
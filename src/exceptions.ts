@@ -53,18 +53,27 @@ inherit(KeyboardInterrupt, BaseException);
 export class NameError extends Exception {}
 inherit(NameError, Exception);
 
+export class UnboundLocalError extends NameError {}
+inherit(UnboundLocalError, NameError);
+
 export class ArithmeticError extends Exception {}
 inherit(ArithmeticError, Exception);
 
 export class ZeroDivisionError extends Exception {}
 inherit(ZeroDivisionError, ArithmeticError);
 
+export class OverflowError extends Exception {}
+inherit(OverflowError, ArithmeticError);
+
 export class AttributeError extends Exception {}
 inherit(AttributeError, Exception);
 
 export class TypeError extends Exception {}
 inherit(TypeError, Exception);
 
+export class ValueError extends Exception {}
+inherit(ValueError, Exception);
+
 export class StopIteration extends Exception {}
 inherit(StopIteration, Exception);
 
@@ -1,16 +1,21 @@
 import {IPy_Object, IPy_FrameObj} from './interfaces';
-import {Py_Type} from './enums';
+import {Py_Type, ThreadStatus} from './enums';
 import {Py_Str, Py_Int} from './primitives';
 import {Py_Dict, Py_Tuple} from './collections';
 import Py_CodeObject = require('./codeobject');
 import Py_FuncObject = require('./funcobject');
 import opcodes = require('./opcodes');
-import optable = require('./optable');
 import Py_Cell = require('./cell');
 import {Thread} from './threading';
 import assert = require('assert');
 import builtins = require('./builtins');
 import os = require('os');
+import profiler = require('./profiler');
+// !! Use only for type info !!
+import _Py_GeneratorObject = require('./genobject');
+
+// Frames kept on each code object's free list, at most.
+const MAX_FREE_FRAMES = 64;
 
 // Frame Objects are basically stack frames for functions, except they carry
 // extra context (e.g. globals, local scope, etc.). This class is not simplified
@@ -35,8 +40,13 @@ class Py_FrameObject implements IPy_FrameObj {
     // Current line number
     // XXX: Lazily update.
     lineNum: number = -1;
-    // Local namespace
+    // Local namespace. Optimized (function) frames keep their variables in
+    // fastlocals instead, and only build this dictionary on demand; see
+    // getLocals().
     locals: Py_Dict;
+    // Local variable slots, indexed like codeObj.varnames. Unbound slots
+    // hold null.
+    fastlocals: IPy_Object[];
     // Flag: 1 if running in restricted mode (TODO: What?)
     restricted: boolean = false;
     // This frame's stack
@@ -52,23 +62,68 @@ class Py_FrameObject implements IPy_FrameObj {
     env: Py_Cell[];
     // Signifies that the bytecode loop should return to the thread loop.
     returnToThread: boolean;
-    genFrame: boolean = false;
-    cb: (rv: IPy_Object) => void;
+    // The generator the frame runs the code of, if any.
+    generator: _Py_GeneratorObject = null;
+    // Whether the frame can be reused once it returns. Only frames from
+    // create() are, and only while no generator refers back to them.
+    recycle: boolean;
 
     constructor(back: IPy_FrameObj,
                 code: Py_CodeObject,
                 globals: Py_Dict,
                 locals: Py_Dict,
                 closure: IPy_Object[]) {
-        this.back = back;
         this.codeObj = code;
-        this.globals = globals;
-        this.locals = locals;
+        this.fastlocals = new Array(code.nlocals);
         this.stack = [];
-        this.shouldWriteSpace = false;
         this.blockStack = [];
         this.env = [];
-        var i: number;
+        this.init(back, globals, locals, closure);
+        code.decode();
+    }
+
+    // Returns a frame for code, taken from its free list if there is one.
+    // The frame goes back on the free list when it returns; see release().
+    static create(back: IPy_FrameObj,
+                  code: Py_CodeObject,
+                  globals: Py_Dict,
+                  closure: IPy_Object[]): Py_FrameObject {
+        var frame: Py_FrameObject;
+        if (code.freeFrames.length > 0) {
+            frame = code.freeFrames.pop();
+            frame.init(back, globals, null, closure);
+        } else {
+            frame = new Py_FrameObject(back, code, globals, null, closure);
+        }
+        frame.recycle = true;
+        return frame;
+    }
+
+    // Sets up the frame for a call, reusing its arrays.
+    private init(back: IPy_FrameObj,
+                 globals: Py_Dict,
+                 locals: Py_Dict,
+                 closure: IPy_Object[]): void {
+        var code = this.codeObj, i: number;
+        this.back = back;
+        this.globals = globals;
+        this.locals = locals;
+        this.lastInst = -1;
+        this.lineNum = 0;
+        for (i = 0; i < code.nlocals; i++) {
+            this.fastlocals[i] = null;
+        }
+        // A frame that returned normally has empty stacks.
+        if (this.stack.length > 0) {
+            this.stack = [];
+        }
+        this.shouldWriteSpace = false;
+        if (this.blockStack.length > 0) {
+            this.blockStack = [];
+        }
+        if (this.env.length > 0) {
+            this.env = [];
+        }
         for (i = 0; i < code.cellvars.length; i++) {
             this.env.push(new Py_Cell(null));
         }
@@ -76,10 +131,23 @@ class Py_FrameObject implements IPy_FrameObj {
         for (i = 0; i < code.freevars.length; i++) {
             this.env.push(<Py_Cell>closure[i]);
         }
-        this.lineNum = 0;
+        this.returnToThread = false;
+        this.generator = null;
+        this.recycle = false;
+    }
 
+    // Puts the frame on its code object's free list, if nothing else can
+    // refer to it once it has returned.
+    release(): void {
+        var free = this.codeObj.freeFrames;
+        if (this.recycle && free.length < MAX_FREE_FRAMES) {
+            this.back = null;
+            this.globals = null;
+            this.locals = null;
+            free.push(this);
+        }
     }
-    
+
     getType(): Py_Type {
         // XXX
         return Py_Type.OTHER;
@@ -104,44 +172,83 @@ class Py_FrameObject implements IPy_FrameObj {
       return this.stack[this.stack.length-1];
     }
 
-    // The frame's lastInst field keeps track of the last executed instruction.
-    readOp(): number {
-      this.lastInst += 1;
-      return this.codeObj.code[this.lastInst];
-    }
-
-    peekOp(): number {
-        // this.lastInst += 1;
-        return this.codeObj.code[this.lastInst];
+    // The frame's lastInst field holds the index of the instruction being
+    // executed in the code object's decoded instruction stream.
+    // Returns the (decoded) argument of the current instruction.
+    getArg(): number {
+      return this.codeObj.args[this.lastInst];
     }
 
-    // Arguments are stored as 2 bytes, little-endian.
-    readArg(): number {
-      this.lastInst += 1;
-      var low = this.codeObj.code[this.lastInst];
-      this.lastInst += 1;
-      var high = this.codeObj.code[this.lastInst];
-      return (high << 8) + low;
+    // exec is the Fetch-Execute-Decode loop for the interpreter. When an
+    // instruction calls or returns into another bytecode frame, the loop
+    // carries on in that frame. It returns to the thread loop when the thread
+    // stops running, when a native frame is on top, or when the thread's
+    // instruction budget runs out, so that the scheduler can preempt it; the
+    // next call picks up at the following instruction.
+    exec(t: Thread): void {
+        var profile = profiler.current();
+        if (profile === null) {
+            this.run(t, null);
+        } else {
+            profile.resume();
+            this.run(t, (code: Py_CodeObject, i: number, stack: IPy_Object[], t: Thread) => {
+                profile.instruction(code, i, stack, t);
+            });
+        }
     }
 
-    // exec is the Fetch-Execute-Decode loop for the interpreter.
-    exec(t: Thread): void {
-        this.returnToThread = false;
-        for (var op = this.readOp(); op != undefined; op = this.readOp()) {
-            var func = optable[op];
-            if (func == undefined) {
-                throw new Error(`Unknown opcode: ${opcodes[op]} (${op})`);
-            }
-            if (false) {  // debug
-                console.log(this.stack);
-                console.log(`${t.stackDepth()}: ${opcodes[op]}`);
+    // The loop itself. after, if not null, is called after each instruction
+    // with the code object, the instruction's index, and the stack it left
+    // behind; exec picks it once per call, so the loop costs no more than a
+    // null check when the profiler is off.
+    private run(t: Thread, after: (code: Py_CodeObject, i: number, stack: IPy_Object[], t: Thread) => void): void {
+        var f: Py_FrameObject = this,
+          handlers = f.codeObj.handlers,
+          length = handlers.length,
+          budget = t.budget,
+          top: IPy_FrameObj,
+          i: number;
+        f.returnToThread = false;
+        while ((i = ++f.lastInst) < length) {
+            handlers[i](f, t);
+            if (after !== null) {
+                after(f.codeObj, i, f.stack, t);
             }
-            func(this, t);
-            if (this.returnToThread) {
-                // End the bytecode loop; return to thread loop.
+            if (--budget <= 0) {
                 break;
             }
+            if (f.returnToThread) {
+                top = t.getTopOfStack();
+                if (!(top instanceof Py_FrameObject) || t.getStatus() !== ThreadStatus.RUNNING) {
+                    // End the bytecode loop; return to thread loop.
+                    break;
+                }
+                f = <Py_FrameObject> top;
+                handlers = f.codeObj.handlers;
+                length = handlers.length;
+                f.returnToThread = false;
+            }
         }
+        t.budget = budget;
+    }
+
+    // Returns the local namespace as a dictionary. For optimized frames, the
+    // dictionary is created on first use and refreshed from the local
+    // variable slots on every call, like PyFrame_FastToLocals.
+    getLocals(): Py_Dict {
+        var fast = this.fastlocals,
+          varnames = this.codeObj.varnames;
+        if (this.locals === null) {
+            this.locals = new Py_Dict();
+        }
+        for (var i = 0; i < fast.length; i++) {
+            if (fast[i] !== null) {
+                this.locals.set(varnames[i], fast[i]);
+            } else {
+                this.locals.del(varnames[i]);
+            }
+        }
+        return this.locals;
     }
 
     emptyStack() {
@@ -155,22 +262,20 @@ class Py_FrameObject implements IPy_FrameObj {
         val.$message = message;
         if (val === undefined)
             throw new Error(`Unknown exception type: '${type}'`);
-        t.addToTraceback(type + ': ' + message + os.EOL);
-        t.throwException(val);
+        t.raiseException(val, type + ': ' + message + os.EOL);
     }
 
     // search for exception handler in current frame
     tryCatchException(t: Thread, exc: IPy_Object): boolean {
         // push exception on stack
         this.push(exc);
-        t.raise_lno = (this.codeObj.firstlineno) + this.addr2line();
-        this.frame_add_traceback(t);
+        t.tb.addFrame(this.codeObj, this.lastInst);
         while (this.blockStack.length > 0) {
             var b = this.blockStack[this.blockStack.length - 1];
             this.blockStack.pop();
             if (b[3] === opcodes.SETUP_EXCEPT) {
-                this.setup_block(opcodes.EXCEPT_HANDLER);
                 var endPos: number = b[2];
+                this.blockStack.push([this.stack.length, this.lastInst, endPos, opcodes.EXCEPT_HANDLER]);
                 this.lastInst = endPos;
                 return true;
             }
@@ -183,74 +288,18 @@ class Py_FrameObject implements IPy_FrameObj {
         // Current frame cannot handle exception
         this.emptyStack();
         this.returnToThread = true;
-        return false;
-    }
-
-    unpack(str: string): [number,number][] {
-        var ln_byte_tuple: [number,number][] = [];
-        for (var i = 0, n = str.length; i < n; i+=2) {
-            var num1: number = str.charCodeAt(i);
-            var num2: number = str.charCodeAt(i+1);
-            ln_byte_tuple.push([num1, num2]);
+        if (this.generator !== null) {
+            this.generator.abort();
         }
-        return ln_byte_tuple;
-    }
-
-    addr2line(): number {
-        var lineno = 0;
-        var addr = 0;
-        var chars = this.codeObj.lnotab.toString();
-        var lnotab = this.unpack(chars);
-        for (var i = 0; i < lnotab.length; i++) {
-            addr += lnotab[i][0];
-            if (addr > this.lastInst) {
-                break;
-            }
-            lineno += lnotab[i][1];
-        }
-        return lineno;
-    }
-
-    get_current_line(t: Thread): number {
-        var current_line: number = (this.codeObj.firstlineno) + this.addr2line();
-        // Set whenever an exception handler is found
-        // If exception handler can't handle that exception, the line where exception occurred is added to traceback
-        if (t.raise_lno > 0) {
-            current_line = t.raise_lno ;
-            t.raise_lno = 0;
-        }
-        return current_line;
+        return false;
     }
 
     // Get current frame information, used by some of the python traceback.* functions
     getStackContents(t: Thread): [string, string, string, string] {
-        var current_line: number = this.get_current_line(t);
-        return [`${t.codefile[current_line - 1].trim() }`, `${this.codeObj.name.toString() }`, `${current_line}`, `${this.codeObj.filename.toString() }`];
-    }
-
-    frame_add_traceback(t: Thread): void {
-        var current_line: number = this.get_current_line(t);
-
-        t.tb.trace.push(`${t.codefile[current_line-1].trim()}`);
-        t.tb.trace.push(`${this.codeObj.name.toString()}`);
-        t.tb.trace.push(`${current_line}`);
-        t.tb.trace.push(`${this.codeObj.filename.toString() }`);
-
-        var tback: string = `  File "${this.codeObj.filename.toString()}", line ${current_line}, in ${this.codeObj.name.toString()}\n`;
-        if (t.codefile.length >= current_line) {
-            tback += `    ${t.codefile[current_line-1].trim()}\n`;
-        }
-        t.addToTraceback(tback);
+        var current_line: number = this.codeObj.getLine(this.lastInst);
+        return [t.getSourceLine(current_line), `${this.codeObj.name.toString() }`, `${current_line}`, `${this.codeObj.filename.toString() }`];
     }
 
-    setup_block(op: number): void {
-        var delta = this.readArg();
-        // push a block to the block stack
-        var stackSize = this.stack.length;
-        var loopPos = this.lastInst;
-        this.blockStack.push([stackSize, loopPos, loopPos+delta, op]);
-    }
-    
     resume(rv: IPy_Object): void {
         assert(rv !== undefined && rv !== null, "Must be a Py_Object.");
         this.push(rv);
@@ -267,7 +316,13 @@ class Py_FrameObject implements IPy_FrameObj {
             } else {
                 name = this.codeObj.freevars[i - numCellvars];
             }
-            cell.ob_ref = this.locals.get(name);
+            // Cells for arguments start out with the argument's value.
+            var slot = this.codeObj.varnames.indexOf(<Py_Str> name);
+            if (slot >= 0) {
+                cell.ob_ref = this.fastlocals[slot];
+            } else if (this.locals !== null) {
+                cell.ob_ref = this.locals.get(name);
+            }
         }
         return cell;
     }
@@ -15,6 +15,14 @@ import {Py_TrampolineFrameObject} from './nativefuncobject';
 import Py_CodeObject = require('./codeobject');
 import {Thread} from './threading';
 import Py_FrameObject = require('./frameobject');
+// !! Use only for type info !!
+import _Py_GeneratorObject = require('./genobject');
+
+// Code object flags (see Include/code.h).
+const CO_OPTIMIZED = 0x1,
+    CO_VARARGS = 0x4,
+    CO_VARKEYWORDS = 0x8,
+    CO_GENERATOR = 0x20;
 
 // Similar to frame objects, Function Objects wrap Python functions. However,
 // these are more the data representation of functions, and are transformed into
@@ -26,6 +34,9 @@ class Py_FuncObject extends Py_Object implements IPy_Function {
     closure: Py_Tuple;
     name: Py_Str;
     $func_code: Py_CodeObject;
+    // Whether positional arguments can go straight into the local variable
+    // slots; see callPositional().
+    fastCall: boolean;
 
     constructor(code: Py_CodeObject,
                 globals: Py_Dict,
@@ -39,38 +50,102 @@ class Py_FuncObject extends Py_Object implements IPy_Function {
         this.name = name;
         this.closure = closure;
         this.$func_code = code;
+        this.fastCall = (code.flags & (CO_OPTIMIZED | CO_VARARGS | CO_VARKEYWORDS | CO_GENERATOR)) === CO_OPTIMIZED;
     }
     getType(): Py_Type { return Py_Type.OTHER; }
     // XXX: Fix.
     hash(): number { return -1; }
 
     /**
-     * Folds arguments to the function into a locals dictionary.
+     * Binds arguments to the function into the frame's local variable slots.
+     * Positional arguments fill the leading varnames in order, keyword
+     * arguments are matched by name, and defaults fill the rest. Extra
+     * arguments are collected into the *args tuple and **kwargs dict if the
+     * function takes them.
      */
-    private args2locals(args: IPy_Object[], locals: Py_Dict) {
-        var varnames = this.code.varnames;
-        for (var name of varnames) {
-            if (locals.get(name) === undefined) {
-                if (args.length > 0) {
-                    locals.set(name, args.shift());
-                } else {
-                    locals.set(name, this.defaults.get(name));
-                }
+    private bindArgs(fastlocals: IPy_Object[], args: IPy_Object[], kwargs: Py_Dict) {
+        var code = this.code,
+            varnames = code.varnames,
+            argcount = code.argcount,
+            i: number, val: IPy_Object;
+        for (i = 0; i < argcount; i++) {
+            val = kwargs.get(varnames[i]);
+            if (val === undefined) {
+                val = i < args.length ? args[i] : this.defaults.get(varnames[i]);
             }
+            fastlocals[i] = val === undefined ? null : val;
+        }
+        if (code.flags & CO_VARARGS) {
+            fastlocals[i++] = new Py_Tuple(args.slice(argcount));
+        }
+        if (code.flags & CO_VARKEYWORDS) {
+            var extra = new Py_Dict(),
+                named = varnames.slice(0, argcount).map((name: Py_Str) => name.toString());
+            kwargs.toPairs().forEach((pair: [IPy_Object, IPy_Object]) => {
+                if (named.indexOf(pair[0].toString()) < 0) {
+                    extra.set(pair[0], pair[1]);
+                }
+            });
+            fastlocals[i] = extra;
         }
     }
 
-    makeFrame(caller: IPy_FrameObj, args: IPy_Object[], locals: Py_Dict): Py_FrameObject {
-        this.args2locals(args, locals);
-        return new Py_FrameObject(caller, this.code, (caller.back ? caller.globals : caller.locals), locals, (this.closure ? this.closure.toArray() : []));
+    makeFrame(caller: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): Py_FrameObject {
+        // Only optimized code (i.e. function bodies) uses fast locals; class
+        // bodies and the like need a real namespace dictionary.
+        var locals = (this.code.flags & CO_OPTIMIZED) ? null : new Py_Dict(),
+            frame = new Py_FrameObject(caller, this.code, (caller.back ? caller.globals : caller.locals), locals, (this.closure ? this.closure.toArray() : []));
+        this.bindArgs(frame.fastlocals, args, kwargs);
+        return frame;
+    }
+
+    /**
+     * Fast path for calls with argc positional arguments and nothing else.
+     * The arguments are popped off the caller's stack straight into the
+     * local variable slots of a recycled frame, followed by the function
+     * itself. Only valid if fastCall is set and argc is at most argcount.
+     */
+    callPositional(t: Thread, caller: Py_FrameObject, argc: number) {
+        var code = this.code,
+            varnames = code.varnames,
+            stack = caller.stack,
+            frame = Py_FrameObject.create(caller, code, (caller.back ? caller.globals : caller.locals), (this.closure ? this.closure.toArray() : [])),
+            fastlocals = frame.fastlocals,
+            i: number, val: IPy_Object;
+        for (i = argc; i < code.argcount; i++) {
+            val = this.defaults.get(varnames[i]);
+            fastlocals[i] = val === undefined ? null : val;
+        }
+        // Positional arguments come in backwards (stack) order.
+        for (i = argc - 1; i >= 0; i--) {
+            fastlocals[i] = stack.pop();
+        }
+        stack.pop();
+        t.framePush(frame);
+    }
+
+    // Calling a generator function returns a generator, which runs the
+    // code in the frame the call sets up.
+    private makeGenerator(frame: Py_FrameObject): _Py_GeneratorObject {
+        // XXX: Hack around circular reference.
+        var Py_GeneratorObject: typeof _Py_GeneratorObject = require('./genobject');
+        return new Py_GeneratorObject(frame);
     }
 
     exec(t: Thread, caller: IPy_FrameObj, args: IPy_Object[], locals: Py_Dict) {
-        t.framePush(this.makeFrame(caller, args, locals));
+        var frame = this.makeFrame(caller, args, locals);
+        if (this.code.flags & CO_GENERATOR) {
+            caller.resume(this.makeGenerator(frame), null);
+        } else {
+            t.framePush(frame);
+        }
     }
 
     exec_from_native(t: Thread, caller: IPy_FrameObj, args: IPy_Object[], locals: Py_Dict, cb: (rv?: IPy_Object, exc?: IPy_Object) => void) {
         var frame = this.makeFrame(caller, args, locals);
+        if (this.code.flags & CO_GENERATOR) {
+            return cb(this.makeGenerator(frame));
+        }
         t.framePush(new Py_TrampolineFrameObject(caller, locals, cb))
         t.framePush(frame);
     }
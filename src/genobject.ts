@@ -1,44 +1,166 @@
 // Python Generator object
-import {IPy_Object, IPy_Function, IPy_FrameObj, Iterator, Iterable
-       } from './interfaces';
-import {None, Py_Str} from './primitives';
+import {IPy_Object, IPy_FrameObj} from './interfaces';
+import {None, Py_Object} from './primitives';
 import {Py_Dict} from './collections';
+import {Py_NativeMethod, Py_TrampolineFrameObject} from './nativefuncobject';
+import {StopIteration} from './exceptions';
+import {ThreadStatus} from './enums';
 import {Thread} from './threading';
-import Py_FrameObject = require('./frameobject');
-import Py_FuncObject = require('./funcobject');
-import {Py_SyncNativeFuncObject, Py_AsyncNativeFuncObject} from './nativefuncobject';
-
-class Py_GeneratorObject extends Py_FuncObject implements Iterator, Iterable {
-    thread: Thread;
-    frame: Py_FrameObject;
-
-    exec(t: Thread, caller: IPy_FrameObj, args: IPy_Object[], locals: Py_Dict) {
-        this.thread = t;
-        this.frame = this.makeFrame(caller, args, locals);
-        // Mark as the generator frame
-        this.frame.genFrame = true;
-    }
-    
-    public iter(): Iterator {
+// !! Use only for type info !!
+import _Py_FrameObject = require('./frameobject');
+
+/**
+ * A generator, made by calling a function whose code contains yield. It
+ * owns the frame the function's code runs in, which is switched to by
+ * resume() and away from by YIELD_VALUE and RETURN_VALUE, all within the
+ * bytecode loop: the generator frame goes on top of the thread's stack,
+ * and comes off again with the value for the frame that resumed it.
+ */
+class Py_GeneratorObject extends Py_Object {
+    frame: _Py_FrameObject;
+    // Whether the frame is on the thread's stack.
+    running: boolean = false;
+    // Whether the code has returned or raised, so that the generator can't
+    // be resumed.
+    finished: boolean = false;
+    // Where the FOR_ITER that resumed the generator jumps once it's
+    // exhausted, or -1 if it was resumed by next() or send().
+    private loopExit: number = -1;
+    // Whether the generator was resumed by native code; see resumeFromNative.
+    private fromNative: boolean = false;
+
+    constructor(frame: _Py_FrameObject) {
+        super();
+        this.frame = frame;
+        frame.generator = this;
+    }
+
+    // Generators have no next(): native code reads their items with
+    // resumeFromNative, and the bytecode loop with resume().
+    public iter(): IPy_Object {
         return this;
     }
 
-    // TODO: Fix next() for generator objects (currently if $__next__ is present on an iterator, it is called instead)
-    public next(): IPy_Object {
-        this.thread.framePush(this.frame);
-        return None;
+    /**
+     * Carries on running the generator's code in place of caller, which is
+     * on top of t's stack, with value as the result of the yield it stopped
+     * at. The code's next yield pushes the yielded value on caller's stack
+     * and continues caller. If the code returns, a FOR_ITER (loopExit >= 0)
+     * jumps to loopExit, while next() and send() raise StopIteration.
+     */
+    public resume(t: Thread, caller: _Py_FrameObject, value: IPy_Object, loopExit: number): void {
+        var frame = this.frame;
+        if (this.running) {
+            caller.raise_exception_here(t, "generator already executing", "ValueError");
+            return;
+        }
+        if (this.finished) {
+            this.exhausted(t, caller, loopExit);
+            return;
+        }
+        if (frame.lastInst >= 0) {
+            frame.push(value);
+        } else if (value !== None) {
+            caller.raise_exception_here(t, "can't send non-None value to a just-started generator", "TypeError");
+            return;
+        }
+        frame.back = caller;
+        this.loopExit = loopExit;
+        this.fromNative = false;
+        this.running = true;
+        t.framePush(frame);
+        caller.returnToThread = true;
     }
 
-    public $__next__ = new Py_AsyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv: IPy_Object) => void) => {
-        // Callback is saved and invoked when generator frame encounters YIELD_VALUE
-        this.frame.cb = cb;
-        this.thread.framePush(this.frame);
-    });
+    /**
+     * Carries on running the generator's code for native code working on
+     * behalf of caller, like next() does. cb receives the value the code
+     * yields, or null once the generator is exhausted, from the bytecode
+     * loop: the generator's frame goes on the stack above a trampoline
+     * frame, which the yield or return resumes.
+     */
+    public resumeFromNative(t: Thread, caller: IPy_FrameObj, cb: (value: IPy_Object) => void): void {
+        var frame = this.frame;
+        if (this.running) {
+            throw new Error('ValueError: generator already executing');
+        }
+        if (this.finished) {
+            cb(null);
+            return;
+        }
+        if (frame.lastInst >= 0) {
+            frame.push(None);
+        }
+        frame.back = new Py_TrampolineFrameObject(caller, new Py_Dict(), (rv: IPy_Object, exc: IPy_Object) => {
+            cb(exc === null ? rv : null);
+        });
+        this.fromNative = true;
+        this.running = true;
+        t.framePush(frame.back);
+        t.framePush(frame);
+        t.setStatus(ThreadStatus.RUNNABLE);
+    }
+
+    // Called by YIELD_VALUE: switches back to the frame that resumed the
+    // generator, with value.
+    public suspend(t: Thread, value: IPy_Object): void {
+        var frame = this.frame;
+        t.framePop();
+        this.running = false;
+        frame.back.resume(value, null);
+        frame.returnToThread = true;
+    }
 
-    public $next = this.$__next__;
+    // Called by RETURN_VALUE: switches back to the frame that resumed the
+    // generator, which carries on as if it had found the generator finished.
+    public finish(t: Thread): void {
+        var frame = this.frame;
+        t.framePop();
+        this.running = false;
+        this.finished = true;
+        frame.returnToThread = true;
+        if (this.fromNative) {
+            frame.back.resume(None, StopIteration.prototype);
+        } else {
+            this.exhausted(t, <_Py_FrameObject> frame.back, this.loopExit);
+        }
+    }
+
+    // Called when an exception propagates out of the generator's code.
+    public abort(): void {
+        this.running = false;
+        this.finished = true;
+    }
+
+    private exhausted(t: Thread, caller: _Py_FrameObject, loopExit: number): void {
+        if (loopExit >= 0) {
+            // Pop the generator and leave the loop.
+            caller.pop();
+            caller.lastInst = loopExit - 1;
+        } else {
+            caller.raise_exception_here(t, "", "StopIteration");
+        }
+    }
 
     public toString(): string {
-        return `<generator object ${this.name} at ${this.hash()}>`;
+        return `<generator object ${this.frame.codeObj.name} at ${this.hash()}>`;
     }
 }
+
+// next() and send() are called from bytecode frames only. Their result is
+// the value the generator yields, which is pushed on the caller's stack by
+// YIELD_VALUE rather than returned here.
+(<any> Py_GeneratorObject.prototype).$next = new Py_NativeMethod((self: Py_GeneratorObject, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+    self.resume(t, <_Py_FrameObject> f, None, -1);
+    return None;
+});
+(<any> Py_GeneratorObject.prototype).$send = new Py_NativeMethod((self: Py_GeneratorObject, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
+    if (args.length !== 1) {
+        (<_Py_FrameObject> f).raise_exception_here(t, `send() takes exactly one argument (${args.length} given)`, "TypeError");
+        return None;
+    }
+    self.resume(t, <_Py_FrameObject> f, args[0], -1);
+    return None;
+});
+
 export = Py_GeneratorObject;
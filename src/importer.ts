@@ -0,0 +1,230 @@
+import {Py_Str} from './primitives';
+import opcodes = require('./opcodes');
+import path = require('path');
+import fs = require('fs');
+import Py_CodeObject = require('./codeobject');
+// !! Use only for type info !!
+import _unmarshal = require('./unmarshal');
+import _Py_Sys = require('./sys');
+import {Bundle} from './bundle';
+
+// Opcodes at or above this value are followed by a 2-byte argument.
+const HAVE_ARGUMENT = opcodes.STORE_NAME;
+
+// Returns the names imported by IMPORT_NAME instructions in code, including
+// the code objects nested in it.
+export function findImports(code: Py_CodeObject, names: string[]): string[] {
+    var bytes = code.code, extended = 0, arg: number, op: number, i: number;
+    for (i = 0; i < bytes.length; i += (op >= HAVE_ARGUMENT ? 3 : 1)) {
+        op = bytes[i];
+        if (op >= HAVE_ARGUMENT) {
+            arg = (extended << 16) | (bytes[i + 2] << 8) | bytes[i + 1];
+            extended = op === opcodes.EXTENDED_ARG ? arg : 0;
+            if (op === opcodes.IMPORT_NAME) {
+                names.push(code.names[arg].toString());
+            }
+        }
+    }
+    code.consts.forEach((c: any) => {
+        if (c instanceof Py_CodeObject) {
+            findImports(c, names);
+        }
+    });
+    return names;
+}
+
+/**
+ * Finds and loads modules for __import__.
+ *
+ * Each directory on the search path is listed once, and the listing is kept,
+ * so that finding a module, or finding that it is missing, needs no further
+ * I/O. The listings are dropped whenever sys.path changes.
+ *
+ * Loading a module also prefetches the modules it imports: they are found,
+ * read and unmarshalled in parallel, before the code that imports them runs.
+ *
+ * Modules in mounted bundles take precedence over the file system.
+ */
+export class ModuleResolver {
+    private sys: _Py_Sys;
+    // Files in each directory searched so far, by absolute path. Missing
+    // directories have no files.
+    private listings: { [dir: string]: { [file: string]: boolean } } = {};
+    // Callbacks waiting for directories to be listed.
+    private pendingListings: { [dir: string]: ((files: { [file: string]: boolean }) => void)[] } = {};
+    // Callbacks waiting for modules to load, by file.
+    private pendingLoads: { [file: string]: ((err: any, code?: Py_CodeObject) => void)[] } = {};
+    // Files whose imports have been prefetched.
+    private prefetched: { [file: string]: boolean } = {};
+    // sys.path at the time of the last lookup.
+    private pathKey: string = null;
+    // Bundles to load modules and sources from.
+    private bundles: Bundle[] = [];
+
+    constructor(sys: _Py_Sys) {
+        this.sys = sys;
+    }
+
+    public mount(bundle: Bundle): void {
+        this.bundles.push(bundle);
+    }
+
+    private findBundle(name: string): Bundle {
+        for (var i = 0; i < this.bundles.length; i++) {
+            if (this.bundles[i].hasModule(name)) {
+                return this.bundles[i];
+            }
+        }
+        return null;
+    }
+
+    /**
+     * Finds and loads the module name, as imported by a module in dir.
+     * Passes the file the module comes from and its code to cb, or neither
+     * if the module can't be found.
+     */
+    public find(name: string, dir: string, cb: (err: any, file?: string, code?: Py_CodeObject) => void): void {
+        var bundle = this.findBundle(name), code: Py_CodeObject;
+        if (bundle !== null) {
+            try {
+                code = bundle.getCode(name);
+            } catch (e) {
+                return cb(e);
+            }
+            return cb(null, bundle.getFile(name), code);
+        }
+        this.resolve(name, this.searchPath(dir), (file: string) => {
+            if (file === null) {
+                return cb(null);
+            }
+            this.load(file, (err: any, code?: Py_CodeObject) => cb(err, file, code));
+        });
+    }
+
+    /**
+     * Reads a source file, for tracebacks, and passes its lines to cb. There
+     * are no lines if it can't be read.
+     */
+    public readSource(file: string, cb: (lines: string[]) => void): void {
+        var source: string;
+        for (var i = 0; i < this.bundles.length; i++) {
+            source = this.bundles[i].getSource(file);
+            if (source !== null) {
+                return cb(source.split('\n'));
+            }
+        }
+        fs.readFile(file, (err: NodeJS.ErrnoException, data: Buffer) => {
+            cb(err ? [] : data.toString('utf8').split('\n'));
+        });
+    }
+
+    /**
+     * Returns the directories to search for modules imported by a module in
+     * dir: dir itself, then the rest of sys.path.
+     */
+    public searchPath(dir: string): string[] {
+        var entries = this.sys.$path.toArray().map((entry: Py_Str) => entry.toString()),
+            key = entries.join('\0');
+        if (key !== this.pathKey) {
+            this.pathKey = key;
+            this.listings = {};
+            this.prefetched = {};
+        }
+        return [dir].concat(entries.slice(1)).map((p: string) => path.resolve(p));
+    }
+
+    private listDir(dir: string, cb: (files: { [file: string]: boolean }) => void): void {
+        var files = this.listings[dir];
+        if (files !== undefined) {
+            return cb(files);
+        }
+        if (this.pendingListings[dir] !== undefined) {
+            this.pendingListings[dir].push(cb);
+            return;
+        }
+        this.pendingListings[dir] = [cb];
+        fs.readdir(dir, (err: NodeJS.ErrnoException, names: string[]) => {
+            var waiting = this.pendingListings[dir];
+            files = {};
+            if (!err) {
+                names.forEach((name: string) => files[name] = true);
+            }
+            this.listings[dir] = files;
+            delete this.pendingListings[dir];
+            waiting.forEach((cb) => cb(files));
+        });
+    }
+
+    /**
+     * Finds the .pyc file for the module name in dirs, which are listed in
+     * parallel. Passes null to cb if there is none.
+     */
+    public resolve(name: string, dirs: string[], cb: (file: string) => void): void {
+        var file = `${name}.pyc`,
+            found: boolean[] = new Array(dirs.length),
+            remaining = dirs.length;
+        if (remaining === 0) {
+            return cb(null);
+        }
+        dirs.forEach((dir: string, i: number) => {
+            this.listDir(dir, (files: { [file: string]: boolean }) => {
+                found[i] = files[file] === true;
+                if (--remaining === 0) {
+                    for (i = 0; i < dirs.length; i++) {
+                        if (found[i]) {
+                            return cb(path.join(dirs[i], file));
+                        }
+                    }
+                    cb(null);
+                }
+            });
+        });
+    }
+
+    /**
+     * Reads and unmarshals the module in file, then starts prefetching the
+     * modules it imports. Requests for a file that is already being loaded
+     * wait for that load.
+     */
+    public load(file: string, cb: (err: any, code?: Py_CodeObject) => void): void {
+        //!!! CIRCULAR REFERENCE HACK!!!
+        var Unmarshaller: typeof _unmarshal = require('./unmarshal');
+        if (this.pendingLoads[file] !== undefined) {
+            this.pendingLoads[file].push(cb);
+            return;
+        }
+        this.pendingLoads[file] = [cb];
+        Unmarshaller.loadFile(file, (err: any, code?: Py_CodeObject) => {
+            var waiting = this.pendingLoads[file];
+            delete this.pendingLoads[file];
+            if (!err) {
+                this.prefetch(code, file);
+            }
+            waiting.forEach((cb) => cb(err, code));
+        });
+    }
+
+    /**
+     * Starts loading the modules imported by code, the code of the module in
+     * file. Modules that are already imported, or can't be found, are
+     * skipped.
+     */
+    public prefetch(code: Py_CodeObject, file: string): void {
+        var dirs = this.searchPath(path.dirname(file)),
+            modules = this.sys.$modules,
+            ignore = (err: any) => {};
+        if (this.prefetched[file]) {
+            return;
+        }
+        this.prefetched[file] = true;
+        findImports(code, []).forEach((name: string) => {
+            if (modules.get(new Py_Str(name)) === undefined && this.findBundle(name) === null) {
+                this.resolve(name, dirs, (found: string) => {
+                    if (found !== null) {
+                        this.load(found, ignore);
+                    }
+                });
+            }
+        });
+    }
+}
@@ -12,6 +12,11 @@ export interface IPy_FrameObj extends IPy_Object {
   globals: Py_Dict;
   locals: Py_Dict;
   
+  /**
+   * Returns the frame's local namespace as a dictionary, building it from
+   * the frame's local variable slots if needed.
+   */
+  getLocals(): Py_Dict;
   exec(t: Thread): void;
   /**
    * PRECONDITION: The function associated with the stack frame is in the middle of a Python function call.
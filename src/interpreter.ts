@@ -5,26 +5,32 @@ import Py_FrameObject = require('./frameobject');
 import Py_CodeObject = require('./codeobject');
 import {Thread, ThreadPool} from './threading';
 import Py_Sys = require('./sys');
-import fs = require('fs');
+import {Bundle} from './bundle';
+import {OutputDevice, stdout} from './output';
+import compiler = require('./compiler');
+import peephole = require('./peephole');
+import profiler = require('./profiler');
 
 // The Interpreter uses a simple Fetch-Decode-Execute loop to execute Python
 // code. Each program is first unmarshalled into a Py_CodeObject. The
 // interpreter then wraps the code object inside a frame object, which tracks
 // the execution state of the code (e.g. stack, instruction pointer, etc.). The
 // interpreter can be configured to output to any device as long as it has a
-// "write" method. The interpreter does not maintain its own stack.
+// "write" method; by default it writes to standard output, buffered. The
+// interpreter does not maintain its own stack.
 class Interpreter {
     sys: Py_Sys;
-    constructor() {
+    constructor(output: OutputDevice = stdout()) {
         // XXX: Hack around circular reference issue.
         circularRefHack();
-        this.sys = new Py_Sys('Lib', []);
+        this.sys = new Py_Sys('Lib', [], output);
     }
     
     // Interpret wraps a code object in a frame and executes it.
     // This is the "base frame" and has no pointer to a previous frame.
     interpret(code: Py_CodeObject, debug: boolean, callback: () => void) {
-        var scope = new Py_Dict();
+        // Module namespaces keep their names as properties of an object.
+        var scope = new Py_Dict({});
         var f = new Py_FrameObject(null, code, scope, scope, []);
         f.globals.getStringDict()[`$__file__`] = code.filename;
         // Create new Thread, push the Py_FrameObject on it and then run it
@@ -34,13 +40,42 @@ class Interpreter {
         t.isMainThread = true;
         tpool.mainThread = t;
         t.framePush(f);
+        // Start loading the modules the program imports.
+        this.sys.resolver.prefetch(code, code.filename.toString());
         // Read .py file corresponding to .pyc file and save it in t.codefile
-        fs.readFile(f.codeObj.filename.toString(), function (err, data) {
-            var codefile = data.toString('utf8').split('\n');
-            t.codefile = codefile;                  
+        this.sys.resolver.readSource(f.codeObj.filename.toString(), function (codefile: string[]) {
+            t.codefile = codefile;
             // Change Thread status to RUNNABLE
             t.setStatus(ThreadStatus.RUNNABLE);
         });
     }
+
+    // Makes the modules and sources in a bundle available to programs.
+    mount(bundle: Bundle): void {
+        this.sys.resolver.mount(bundle);
+    }
+
+    // Compiles hot code objects to JavaScript from now on; see compiler.ts.
+    // This applies to every interpreter in the process.
+    enableCompiler(options: compiler.CompilerOptions = {}): void {
+        compiler.enable(options);
+    }
+
+    // Turns the peephole optimizer, which is on by default, on or off for
+    // code run from now on; see peephole.ts. This applies to every
+    // interpreter in the process.
+    setPeepholeEnabled(enabled: boolean): void {
+        peephole.setEnabled(enabled);
+    }
+
+    // Profiles all code run from now on, by every interpreter in the
+    // process, until stopProfiler is called; see profiler.ts.
+    startProfiler(options: profiler.ProfilerOptions = {}): profiler.Profile {
+        return profiler.start(options);
+    }
+
+    stopProfiler(): void {
+        profiler.stop();
+    }
 }
 export = Interpreter;
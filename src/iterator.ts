@@ -1,14 +1,20 @@
 import {True, False, Py_Int, Py_Object} from './primitives';
 import {Iterator, Iterable, IPy_Object, IPy_FrameObj} from './interfaces';
 import {Thread} from './threading';
+// !! Use only for type info !!
+import _collections = require('./collections');
+var Py_Tuple: typeof _collections.Py_Tuple = null;
 
-export class ListIterator extends Py_Object implements Iterator {
+export class ListIterator extends Py_Object implements Iterator, Iterable {
     private pos: number = 0;
     private list: IPy_Object[];
     constructor(list: IPy_Object[]) {
         super();
         this.list = list;
     }
+    public iter(): Iterator {
+        return this;
+    }
     public next(): IPy_Object {
         var ret: IPy_Object = null;
         if (this.pos < this.list.length) {
@@ -22,6 +28,36 @@ export class ListIterator extends Py_Object implements Iterator {
     }
 }
 
+// Sequences read one item at a time, such as lists whose items aren't kept
+// in an array of objects.
+export interface Sequence {
+    len(): number;
+    item(i: number): IPy_Object;
+}
+
+export class SequenceIterator extends Py_Object implements Iterator, Iterable {
+    private pos: number = 0;
+    private seq: Sequence;
+    constructor(seq: Sequence) {
+        super();
+        this.seq = seq;
+    }
+    public iter(): Iterator {
+        return this;
+    }
+    public next(): IPy_Object {
+        var ret: IPy_Object = null;
+        if (this.pos < this.seq.len()) {
+            ret = this.seq.item(this.pos);
+            this.pos += 1;
+        }
+        return ret;
+    }
+    public toString(): string {
+        return "listiterator";
+    }
+}
+
 export class XRange extends Py_Object implements Iterator, Iterable {
     private start: number = 0;
     private index: number = 0;
@@ -71,7 +107,7 @@ export class XRange extends Py_Object implements Iterator, Iterable {
     public next(): Py_Int {
         var ret: Py_Int = null;
         if (this.index < this._len) {
-            ret = new Py_Int(this.start + this.index * this.step);
+            ret = Py_Int.fromNumber(this.start + this.index * this.step);
             this.index += 1;
         }
         return ret;
@@ -80,6 +116,9 @@ export class XRange extends Py_Object implements Iterator, Iterable {
     public len(): number {
            return this._len;
     }
+    public item(i: number): Py_Int {
+        return Py_Int.fromNumber(this.start + i * this.step);
+    }
     public toString(): string {
         return "xrange";
     }
@@ -89,6 +128,64 @@ export class XRange extends Py_Object implements Iterator, Iterable {
     }
 }
 
+// The items of a sequence, from the last to the first, as reversed() gives
+// them.
+export class ReversedIterator extends Py_Object implements Iterator, Iterable {
+    private pos: number;
+    private seq: Sequence;
+    constructor(seq: Sequence) {
+        super();
+        this.seq = seq;
+        this.pos = seq.len();
+    }
+    public iter(): Iterator {
+        return this;
+    }
+    public next(): IPy_Object {
+        var ret: IPy_Object = null;
+        // The sequence may have shrunk since.
+        if (this.pos > 0 && this.pos <= this.seq.len()) {
+            this.pos -= 1;
+            ret = this.seq.item(this.pos);
+        } else {
+            this.pos = 0;
+        }
+        return ret;
+    }
+    public toString(): string {
+        return "reversed";
+    }
+}
+
+// Pairs of a count, from start on, and the items of an iterator, as
+// enumerate() gives them.
+export class Enumerate extends Py_Object implements Iterator, Iterable {
+    private count: number;
+    private it: Iterator;
+    constructor(it: Iterator, start: number) {
+        super();
+        if (Py_Tuple === null) {
+            // XXX: Hack around circular reference.
+            Py_Tuple = (<typeof _collections> require('./collections')).Py_Tuple;
+        }
+        this.it = it;
+        this.count = start;
+    }
+    public iter(): Iterator {
+        return this;
+    }
+    public next(): IPy_Object {
+        var item = this.it.next();
+        if (item == null) {
+            return null;
+        }
+        return new Py_Tuple([Py_Int.fromNumber(this.count++), item]);
+    }
+    public toString(): string {
+        return "enumerate";
+    }
+}
+
 // builtin xrange()
 export function xrange(t: Thread, f: IPy_FrameObj, args: any[], kwargs: any): XRange {
     return new XRange(args, kwargs);
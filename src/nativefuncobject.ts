@@ -8,18 +8,22 @@ import enums = require('./enums');
 
 /**
  * A Trampoline frame object.
- * "Bounces" the return value through a provided callback.
+ * "Bounces" the return value through a provided callback. A trampoline
+ * that catches exceptions bounces exceptions raised by the frames above it
+ * through the callback as well, in place of a return value.
  */
 export class Py_TrampolineFrameObject implements IPy_FrameObj {
     private _cb: (rv: IPy_Object, exc: IPy_Object) => void;
     private _rv: IPy_Object = null;
     private _exc: IPy_Object = null;
+    private _catches: boolean;
     globals: Py_Dict;
     locals: Py_Dict;
     back: IPy_FrameObj;
     
-    constructor(caller: IPy_FrameObj, locals: Py_Dict, cb: (rv: IPy_Object, exc: IPy_Object) => void) {
+    constructor(caller: IPy_FrameObj, locals: Py_Dict, cb: (rv: IPy_Object, exc: IPy_Object) => void, catches: boolean = false) {
         this._cb = cb;
+        this._catches = catches;
         this.locals = locals;
         // Copy caller's globals.
         // TODO: Is there ever a case where you DON'T do this?
@@ -47,6 +51,10 @@ export class Py_TrampolineFrameObject implements IPy_FrameObj {
         this._cb(this._rv, this._exc);
     }
     
+    public getLocals(): Py_Dict {
+        return this.locals;
+    }
+
     public resume(rv: IPy_Object, exc: IPy_Object): void {
         // Store the return value. Wait for the thread to
         // exec the frame again before providing to callback.
@@ -54,9 +62,11 @@ export class Py_TrampolineFrameObject implements IPy_FrameObj {
         this._exc = exc;
     }
 
-    // TODO: Exception handling for trampolie frames
     tryCatchException(t: Thread, exc: IPy_Object): boolean {
-        return false;
+        if (this._catches) {
+            this.resume(None, exc);
+        }
+        return this._catches;
     }
 
     getStackContents(t: Thread): [string, string, string, string] {
@@ -85,12 +95,18 @@ export class Py_SyncNativeFuncObject implements IPy_Function {
         return -1;
     }
   
+    // Calls the function, and returns its result. Bytecode calls it
+    // directly; see call_func.
+    public call(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
+        var rv = this._f(t, f, args, kwargs);
+        // XXX: Ensure the function returns an object!
+        return rv !== undefined ? rv : None;
+    }
+
     public exec(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) {
         // Need to have a frame on there for asyncReturn to work.
         t.framePush(new Py_TrampolineFrameObject(f, kwargs, () => {}));
-        var rv = this._f(t, f, args, kwargs);
-        // XXX: Ensure the function returns an object!
-        t.asyncReturn(rv !== undefined ? rv : None);
+        t.asyncReturn(this.call(t, f, args, kwargs));
     }
 
     public exec_from_native(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv?: IPy_Object, exc?: IPy_Object) => void) {
@@ -99,6 +115,72 @@ export class Py_SyncNativeFuncObject implements IPy_Function {
     }
 }
 
+/**
+ * A synchronous native method of a built-in type. Each method is created
+ * once and stored on the type's prototype; it receives the instance it is
+ * called on as an extra first argument. LOAD_ATTR binds it to the instance
+ * when the attribute is fetched.
+ */
+export class Py_NativeMethod implements IPy_Object {
+    private _f: (self: IPy_Object, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => IPy_Object;
+
+    constructor(f: (self: IPy_Object, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => IPy_Object) {
+        this._f = f;
+    }
+
+    public getType(): Py_Type {
+        // XXX
+        return Py_Type.OTHER;
+    }
+
+    // XXX
+    public hash() {
+        return -1;
+    }
+
+    public call(self: IPy_Object, t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
+        var rv = this._f(self, t, f, args, kwargs);
+        return rv !== undefined ? rv : None;
+    }
+
+    public bind(self: IPy_Object): Py_BoundNativeMethod {
+        return new Py_BoundNativeMethod(self, this);
+    }
+}
+
+/**
+ * A native method bound to the instance it was fetched from.
+ */
+export class Py_BoundNativeMethod implements IPy_Function {
+    constructor(public self: IPy_Object, public method: Py_NativeMethod) {}
+
+    public getType(): Py_Type {
+        // XXX
+        return Py_Type.OTHER;
+    }
+
+    // XXX
+    public hash() {
+        return -1;
+    }
+
+    public call(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): IPy_Object {
+        return this.method.call(this.self, t, f, args, kwargs);
+    }
+
+    public exec(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) {
+        // Read the receiver before anything else runs; see LOAD_ATTR.
+        var self = this.self;
+        // Need to have a frame on there for asyncReturn to work.
+        t.framePush(new Py_TrampolineFrameObject(f, kwargs, () => {}));
+        t.asyncReturn(this.method.call(self, t, f, args, kwargs));
+    }
+
+    public exec_from_native(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv?: IPy_Object, exc?: IPy_Object) => void) {
+        cb(this.method.call(this.self, t, f, args, kwargs));
+    }
+}
+
 /**
  * Represents an asynchronous "native" function (written in JavaScript).
  */
@@ -140,6 +222,53 @@ export class Py_AsyncNativeFuncObject implements IPy_Function {
         }
     }
 
+    /**
+     * Calls the function from bytecode frame f, on top of t's stack. Most
+     * functions complete before returning, in which case the result is
+     * pushed on f's stack (or the exception raised) right away, and this
+     * returns true. Otherwise this returns false, and the call carries on
+     * as exec's would: f resumes once the function completes.
+     */
+    public callInline(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict): boolean {
+        // The function may push frames of its own, which return into this
+        // one, so it has to be in place before the call.
+        var myFrame = new Py_TrampolineFrameObject(f, kwargs, () => {}),
+            inline = true,
+            completed = false,
+            result: IPy_Object = null,
+            error: IPy_Object = null;
+        t.framePush(myFrame);
+        this._f(t, f, args, kwargs, (rv: IPy_Object, exc?: IPy_Object) => {
+            if (inline) {
+                completed = true;
+                result = rv;
+                error = exc;
+            } else if (exc) {
+                t.framePop();
+                t.setStatus(enums.ThreadStatus.RUNNABLE);
+                t.throwException(exc);
+            } else {
+                t.asyncReturn(rv);
+            }
+        });
+        inline = false;
+        if (t.getTopOfStack() !== myFrame) {
+            // The function pushed frames, or ended the thread.
+            return false;
+        }
+        if (!completed) {
+            t.setStatus(ThreadStatus.ASYNC_WAITING);
+            return false;
+        }
+        t.framePop();
+        if (error) {
+            t.throwException(error);
+        } else {
+            f.resume(result, null);
+        }
+        return true;
+    }
+
     public exec_from_native(t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict, cb: (rv?: IPy_Object, exc?: IPy_Object) => void) {
         // Bypass thread.
         this._f(t, f, args, kwargs, cb);
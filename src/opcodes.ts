@@ -152,5 +152,13 @@ enum Opcodes {
     SET_ADD              = 146,
     MAP_ADD              = 147,
     EXCEPT_HANDLER       = 257,
+    // Superinstructions, which stand for the instruction they replace and
+    // the one after it; see peephole.ts.
+    LOAD_FAST_LOAD_FAST  = 258,
+    LOAD_FAST_LOAD_CONST = 259,
+    STORE_FAST_LOAD_FAST = 260,
+    COMPARE_OP_POP_JUMP_IF_FALSE = 261,
+    COMPARE_OP_POP_JUMP_IF_TRUE  = 262,
+    LOAD_CONST_RETURN_VALUE      = 263,
 }
 export = Opcodes;
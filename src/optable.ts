@@ -12,14 +12,21 @@ var Py_FuncObject: typeof _Py_FuncObject = null;
 var Py_GeneratorObject: typeof _Py_GeneratorObject = null;
 // XXX: hack around name resoltion in eval'd code
 var hardcoded_Py_Dict = Py_Dict;
+var hardcoded_Py_Int = Py_Int;
 var hardcoded_ThreadStatus = ThreadStatus;
 import opcodes = require('./opcodes');
+import quicken = require('./quicken');
 import builtins = require('./builtins');
 import Py_CodeObject = require('./codeobject');
 import Py_Cell = require('./cell');
 import {Thread} from './threading';
 import nativefuncobject = require('./nativefuncobject')
+import {Py_NativeMethod, Py_BoundNativeMethod, Py_SyncNativeFuncObject, Py_AsyncNativeFuncObject} from './nativefuncobject';
+import {slotOf, getAttr, setAttr, delAttr} from './shape';
 const NotImplemented = builtins.$NotImplemented;
+// The builtins namespace, viewed as a dictionary so that the inline caches
+// can check its version tag.
+const builtinsDict = new Py_Dict(<any> builtins);
 
 // XXX: Copy+paste of builtins.bool.
 function bool(x: IPy_Object): typeof True {
@@ -116,10 +123,19 @@ optable[opcodes.UNARY_INVERT] = generateUnaryOpcode('__invert__');
 // 4. If this is the case, try the reverse operation (rop) function
 // 5. If rop is similarly undefined or returns NotImplemented, the
 //    operation is not permitted for the given types.
+// Operations on two ints skip all of this and call the int method directly.
 function generateBinaryOp(funcName: string, inplace: boolean, reversible: boolean): (f: Py_FrameObject, t: Thread) => void {
+    var intOp = (<any> Py_Int.prototype)[funcName] !== undefined;
     return eval(`
 function BINARY_${funcName}(f, t) {
     var b = f.pop(), a = f.${inplace ? 'peek' : 'pop'}(), res;
+    ${intOp ? `
+    if (a.constructor === hardcoded_Py_Int && b.constructor === hardcoded_Py_Int) {
+        ${inplace ? 'f.pop();' : ''}
+        f.push(a.${funcName}(t, b));
+        return;
+    }
+    ` : ''}
     ${inplace ? `
     if (a['__i${funcName}__']) {
         a.__i${funcName}__(b);
@@ -200,18 +216,18 @@ optable[opcodes.PRINT_ITEM] = function(f: Py_FrameObject, t: Thread) {
     var a = f.pop();
     // see https://docs.python.org/2/reference/simple_stmts.html#print
     if (f.shouldWriteSpace) {
-        process.stdout.write(' ');
+        t.sys.output.write(' ');
     }
     if (a.__str__) {
         var s = a.__str__().toString(),
           lastChar = s.slice(-1);
-        process.stdout.write(s);
+        t.sys.output.write(s);
         f.shouldWriteSpace = (lastChar != '\t' && lastChar != '\n');
     } else if (a.$__str__) {
         f.returnToThread = true;
         a.$__str__.exec_from_native(t, f, [], new Py_Dict(), (str: Py_Str) => {
             var s: string = str.toString();
-            process.stdout.write(s);
+            t.sys.output.write(s);
             var lastChar = s.slice(-1);
             f.shouldWriteSpace = (lastChar != '\t' && lastChar != '\n');
             t.setStatus(ThreadStatus.RUNNABLE);
@@ -219,24 +235,23 @@ optable[opcodes.PRINT_ITEM] = function(f: Py_FrameObject, t: Thread) {
     }
 }
 
-optable[opcodes.PRINT_NEWLINE] = function(f: Py_FrameObject) {
-    process.stdout.write("\n");
+optable[opcodes.PRINT_NEWLINE] = function(f: Py_FrameObject, t: Thread) {
+    t.sys.output.write("\n");
     f.shouldWriteSpace = false;
 }
 
 optable[opcodes.RETURN_VALUE] = function(f: Py_FrameObject, t: Thread) {
-    // If a generator frame is exhausted, we raise StopIteration exception
-    // StopIteration exceptions generated by generators inside a for loop are ALWAYS caught
-    // So we set up an EXCEPT_HANDLER, AFTER a generator has been exhausted, and then raise StopIteration which is immediately caught
-    if (f.genFrame) {
-        f.genFrame = false;
-
-        // If generator was called inside a loop,  
-        // TODO: Find a better way of handling StopIteration exception
-        if (t.loop_exc_block.length > 0) {
-            (<Py_FrameObject>f.back).blockStack.push(t.loop_exc_block.pop());
-        }
-        f.raise_exception_here(t, "", "StopIteration");
+    if (f.generator !== null) {
+        // The generator is exhausted; its return value is always None.
+        f.pop();
+        f.generator.finish(t);
+    }
+    else if (f.recycle) {
+        // Called through Py_FuncObject.callPositional(), by the frame right
+        // below, so there is nothing to resume but the caller.
+        t.framePop();
+        (<Py_FrameObject> f.back).push(f.pop());
+        f.release();
     }
     else {
         t.asyncReturn(f.pop());
@@ -245,37 +260,56 @@ optable[opcodes.RETURN_VALUE] = function(f: Py_FrameObject, t: Thread) {
 }
 
 optable[opcodes.STORE_NAME] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     var val = f.pop();
     var name = f.codeObj.names[i];
-    f.locals.set(name, val);
+    f.getLocals().set(name, val);
 }
 
 optable[opcodes.DELETE_NAME] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     var name = f.codeObj.names[i];
-    f.locals.del(name);
+    f.getLocals().del(name);
 }
 
+// LOAD_ATTR and STORE_ATTR cache the instance shape seen at each instruction;
+// see Py_CodeObject.attrShapes.
 optable[opcodes.STORE_ATTR] = function(f: Py_FrameObject) {
-    var i = f.readArg();
-    var obj = f.pop();
-    var attr = f.pop();
-    var name = f.codeObj.names[i];
+    var code = f.codeObj,
+        i = f.lastInst,
+        obj = <any> f.pop(),
+        attr = f.pop();
+    if (obj.shape === code.attrShapes[i]) {
+        obj.slots[code.attrSlots[i]] = attr;
+        if (code.attrTransitions[i] !== null) {
+            obj.shape = code.attrTransitions[i];
+        }
+        return;
+    }
+    var key = code.nameKeys[f.getArg()],
+        shape = obj.shape;
     // TODO: use __setattr__ here
-    (<any> obj)[`$${name.toString()}`] = attr;
+    setAttr(obj, key, attr);
+    if (shape) {
+        if (obj.shape) {
+            code.attrShapes[i] = shape;
+            code.attrSlots[i] = obj.shape.slotOf(key);
+            code.attrTransitions[i] = obj.shape !== shape ? obj.shape : null;
+        }
+    } else {
+        Py_Dict.touchAttrs(obj);
+    }
 }
 
 optable[opcodes.DELETE_ATTR] = function(f: Py_FrameObject) {
-    var i = f.readArg();
     var obj = f.pop();
-    var name = f.codeObj.names[i];
     // TODO: use __delattr__ here
-    delete (<any> obj)[`$${name.toString()}`];
+    delAttr(obj, f.codeObj.nameKeys[f.getArg()]);
+    Py_Dict.touchAttrs(obj);
 }
 
 optable[opcodes.UNPACK_SEQUENCE] = function(f: Py_FrameObject, t: Thread) {
-    var val = f.pop(), i: number = f.readArg() - 1;
+    var val = f.pop(), i: number = f.getArg() - 1;
     if (i < 0) {
         // Not sure if possible, but guard against the possibility.
         // Would cause issues in async case.
@@ -284,14 +318,14 @@ optable[opcodes.UNPACK_SEQUENCE] = function(f: Py_FrameObject, t: Thread) {
 
     if (val.__getitem__) {
         for (; i >= 0; i--) {
-            f.push(val.__getitem__(t, new Py_Int(i)));
+            f.push(val.__getitem__(t, Py_Int.fromNumber(i)));
         } 
     } else if (val.$__getitem__) {
         // Pop from stack, and reverse the order of elements, and push back into stack
         // e.g. 1 2 3 -> 3 2 1
         function processNext() {
             if (i >= 0) {
-                val.$__getitem__.exec_from_native(t, f, [new Py_Int(i--)], new Py_Dict(), (res: IPy_Object) => {
+                val.$__getitem__.exec_from_native(t, f, [Py_Int.fromNumber(i--)], new Py_Dict(), (res: IPy_Object) => {
                     f.push(res);
                     processNext();
                 });
@@ -307,62 +341,89 @@ optable[opcodes.UNPACK_SEQUENCE] = function(f: Py_FrameObject, t: Thread) {
 }
 
 optable[opcodes.STORE_GLOBAL] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     var val = f.pop();
     var name = f.codeObj.names[i];
     f.globals.set(name, val);
 }
 
 optable[opcodes.DELETE_GLOBAL] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     var name = f.codeObj.names[i];
     f.globals.del(name);
 }
 
 optable[opcodes.LOAD_CONST] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     f.push(f.codeObj.consts[i]);
 }
 
+// LOAD_NAME and LOAD_GLOBAL consult the code object's inline cache first; see
+// Py_CodeObject.cacheValues.
 optable[opcodes.LOAD_NAME] = function(f: Py_FrameObject, t: Thread) {
-    var i = f.readArg();
-    var name = f.codeObj.names[i];
-    var val = f.locals.get(name) || f.globals.get(name) || (<any> builtins)[`$${name.toString()}`];
+    var code = f.codeObj,
+        i = f.lastInst,
+        locals = f.getLocals();
+    if (code.cacheLocalsVersions[i] === locals.version &&
+        code.cacheGlobalsVersions[i] === f.globals.version &&
+        code.cacheBuiltinsVersions[i] === builtinsDict.version) {
+        code.cacheHits++;
+        f.push(code.cacheValues[i]);
+        return;
+    }
+    code.cacheMisses++;
+    var name = code.names[f.getArg()];
+    var val = locals.get(name) || f.globals.get(name) || builtinsDict.get(name);
     // throw NameError
     if (val === undefined) {
         var message = `global name '${name}' is not defined`;
         f.raise_exception_here(t, message, "NameError");
         return;
     }
+    code.cacheValues[i] = val;
+    code.cacheLocalsVersions[i] = locals.version;
+    code.cacheGlobalsVersions[i] = f.globals.version;
+    code.cacheBuiltinsVersions[i] = builtinsDict.version;
     f.push(val);
 }
 
 optable[opcodes.LOAD_GLOBAL] = function(f: Py_FrameObject, t: Thread) {
-    var i = f.readArg();
-    var name = f.codeObj.names[i];
-    var val = f.globals.get(name) || (<any> builtins)[`$${name.toString()}`];
+    var code = f.codeObj,
+        i = f.lastInst;
+    if (code.cacheGlobalsVersions[i] === f.globals.version &&
+        code.cacheBuiltinsVersions[i] === builtinsDict.version) {
+        code.cacheHits++;
+        f.push(code.cacheValues[i]);
+        return;
+    }
+    code.cacheMisses++;
+    var name = code.names[f.getArg()];
+    var val = f.globals.get(name) || builtinsDict.get(name);
     // throw NameError
     if (val === undefined) {
         var message = `global name '${name}' is not defined`;
         f.raise_exception_here(t, message, "NameError");
         return;
     }
+    code.cacheValues[i] = val;
+    code.cacheGlobalsVersions[i] = f.globals.version;
+    code.cacheBuiltinsVersions[i] = builtinsDict.version;
     f.push(val);
 }
 
 optable[opcodes.LOAD_DEREF] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     f.push(f.getDeref(i).ob_ref);
 }
 
 optable[opcodes.STORE_DEREF] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     var obj = f.pop();
     f.env[i].ob_ref = obj;
 }
 
 optable[opcodes.LOAD_CLOSURE] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     f.push(f.getDeref(i));
 }
 
@@ -381,9 +442,13 @@ enum ComparisonOp {
 }
 
 optable[opcodes.COMPARE_OP] = function(f: Py_FrameObject, t: Thread) {
-    var op = <ComparisonOp> f.readArg();
+    var op = <ComparisonOp> f.getArg();
     var b = f.pop();
     var a = f.pop();
+    if (op <= ComparisonOp.GTE && a.constructor === Py_Int && b.constructor === Py_Int) {
+        f.push(compareInts(op, <Py_Int> a, <Py_Int> b));
+        return;
+    }
     switch (op) {
         case ComparisonOp.LT:
             doCmpOp(t, f, a, b, '__lt__', '__gt__');
@@ -401,23 +466,32 @@ optable[opcodes.COMPARE_OP] = function(f: Py_FrameObject, t: Thread) {
             doCmpOp(t, f, a, b, '__gt__', '__lt__');
             break;
         case ComparisonOp.GTE:
-            doCmpOp(t, f, a, b, '__gte__', '__lte__');
+            doCmpOp(t, f, a, b, '__ge__', '__le__');
             break;
         case ComparisonOp.IN:
-            doCmpOp(t, f, b, a, '__contains__', null);
-            break;
         case ComparisonOp.NOT_IN:
-            doCmpOp(t, f, b, a, '__contains__', null);
-            f.push(bool(f.pop()) === True ? False : True);
+            initPyFuncObj();
+            if (b instanceof Py_GeneratorObject) {
+                // The generator's code runs until it yields a, or returns.
+                f.returnToThread = true;
+                builtins.contains(t, f, b, a, (found: boolean) => {
+                    f.push(found === (op === ComparisonOp.IN) ? True : False);
+                    t.setStatus(ThreadStatus.RUNNABLE);
+                });
+            } else {
+                doCmpOp(t, f, b, a, '__contains__', null);
+                if (op === ComparisonOp.NOT_IN) {
+                    f.push(bool(f.pop()) === True ? False : True);
+                }
+            }
             break;
         case ComparisonOp.IS:
-            // TODO: Python does pointer comparison.
-            // Does this mean IS fails for integers...???
-            // https://github.com/python/cpython/blob/2.7/Python/ceval.c#L4786
-            f.push(a.hash() === b.hash() ? True : False);
+            // Pointer comparison, as in CPython. Hashes won't do: equal
+            // numbers hash equally.
+            f.push(a === b ? True : False);
             break;
         case ComparisonOp.IS_NOT:
-            f.push(a.hash() !== b.hash() ? True : False);
+            f.push(a !== b ? True : False);
             break;
         case ComparisonOp.EXC_MATCH:
             a = t.exc;
@@ -434,6 +508,24 @@ optable[opcodes.COMPARE_OP] = function(f: Py_FrameObject, t: Thread) {
     }
 }
 
+// Fast path for rich comparisons between two ints.
+function compareInts(op: ComparisonOp, a: Py_Int, b: Py_Int): IPy_Object {
+    switch (op) {
+        case ComparisonOp.LT:
+            return a.lt(b);
+        case ComparisonOp.LTE:
+            return a.le(b);
+        case ComparisonOp.EQ:
+            return a.eq(b);
+        case ComparisonOp.NEQ:
+            return a.ne(b);
+        case ComparisonOp.GT:
+            return a.gt(b);
+        default:
+            return a.ge(b);
+    }
+}
+
 function doCmpOp(t: Thread, f: Py_FrameObject, a: IPy_Object, b: IPy_Object, funcA: string, funcB: string) {
     if ((<any> a)[funcA]) {
         f.push((<(b: IPy_Object) => IPy_Object> (<any> a)[funcA])(b));
@@ -442,15 +534,19 @@ function doCmpOp(t: Thread, f: Py_FrameObject, a: IPy_Object, b: IPy_Object, fun
     if ((<any> a)[`$${funcA}`]) {
         var py_fn: IPy_Function = (<any> a)[`$${funcA}`]
         f.returnToThread = true;
-        py_fn.exec_from_native(t, f, [a, b], new Py_Dict(), (res: IPy_Object) => {
-            if (res != NotImplemented || funcB === null)
+        // The method is bound to a already.
+        py_fn.exec_from_native(t, f, [b], new Py_Dict(), (res: IPy_Object) => {
+            if (res != NotImplemented || funcB === null) {
+                f.push(res);
+                t.setStatus(ThreadStatus.RUNNABLE);
                 return;
+            }
             if ((<any> b)[funcB]) {
                 f.push((<(a: IPy_Object) => IPy_Object> (<any> b)[funcB])(a));
                 t.setStatus(ThreadStatus.RUNNABLE);
             } else if ((<any> b)[`$${funcB}`]) {
                 var py_fn: IPy_Function = (<any> b)[`$${funcB}`];
-                py_fn.exec_from_native(t, f, [b, a], new Py_Dict(), (res: IPy_Object) => {
+                py_fn.exec_from_native(t, f, [a], new Py_Dict(), (res: IPy_Object) => {
                     f.push(res);
                     t.setStatus(ThreadStatus.RUNNABLE);
                 });
@@ -463,13 +559,14 @@ function doCmpOp(t: Thread, f: Py_FrameObject, a: IPy_Object, b: IPy_Object, fun
     throw new Error(`Object lacks ${funcA} property.`);
 }
 
+// Jump arguments are decoded into the index of the target instruction. The
+// bytecode loop increments lastInst before executing, hence the "- 1".
 optable[opcodes.JUMP_FORWARD] = function(f: Py_FrameObject) {
-    var delta = f.readArg();
-    f.lastInst += delta
+    f.lastInst = f.getArg() - 1;
 }
 
 optable[opcodes.JUMP_IF_FALSE_OR_POP] = function(f: Py_FrameObject) {
-    var target = f.readArg();
+    var target = f.getArg();
     if (bool(f.peek()) === True) {
         f.pop();
     } else {
@@ -478,7 +575,7 @@ optable[opcodes.JUMP_IF_FALSE_OR_POP] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.JUMP_IF_TRUE_OR_POP] = function(f: Py_FrameObject) {
-    var target = f.readArg();
+    var target = f.getArg();
     if (bool(f.peek()) === True) {
         f.lastInst = target - 1;
     } else {
@@ -487,12 +584,12 @@ optable[opcodes.JUMP_IF_TRUE_OR_POP] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.JUMP_ABSOLUTE] = function(f: Py_FrameObject) {
-    var target = f.readArg();
-    f.lastInst = target - 1;  // XXX: readOp increments before reading
+    var target = f.getArg();
+    f.lastInst = target - 1;
 }
 
 optable[opcodes.POP_JUMP_IF_FALSE] = function(f: Py_FrameObject) {
-    var target = f.readArg();
+    var target = f.getArg();
 
     if (bool(f.pop()) === False) {
         f.lastInst = target - 1;
@@ -500,35 +597,42 @@ optable[opcodes.POP_JUMP_IF_FALSE] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.POP_JUMP_IF_TRUE] = function(f: Py_FrameObject) {
-    var target = f.readArg();
+    var target = f.getArg();
     if (bool(f.pop()) === True) {
         f.lastInst = target - 1;
     }
 }
 
-optable[opcodes.LOAD_FAST] = function(f: Py_FrameObject) {
-    var i = f.readArg();
-    var name = f.codeObj.varnames[i];
-    f.push(f.locals.get(name));
+optable[opcodes.LOAD_FAST] = function(f: Py_FrameObject, t: Thread) {
+    var i = f.getArg();
+    var val = f.fastlocals[i];
+    if (val === null) {
+        var message = `local variable '${f.codeObj.varnames[i]}' referenced before assignment`;
+        f.raise_exception_here(t, message, "UnboundLocalError");
+        return;
+    }
+    f.push(val);
 }
 
 optable[opcodes.STORE_FAST] = function(f: Py_FrameObject) {
-    var i = f.readArg();
-    var val = f.pop();
-    f.locals.set(f.codeObj.varnames[i], val);
+    f.fastlocals[f.getArg()] = f.pop();
 }
 
-optable[opcodes.DELETE_FAST] = function(f: Py_FrameObject) {
-    var i = f.readArg();
-    f.locals.del(f.codeObj.varnames[i]);
+optable[opcodes.DELETE_FAST] = function(f: Py_FrameObject, t: Thread) {
+    var i = f.getArg();
+    if (f.fastlocals[i] === null) {
+        var message = `local variable '${f.codeObj.varnames[i]}' referenced before assignment`;
+        f.raise_exception_here(t, message, "UnboundLocalError");
+        return;
+    }
+    f.fastlocals[i] = null;
 }
 
 function add_exc(f: Py_FrameObject, t: Thread, exc: any, message: string): void {
     t.tb.exc_value = message;
     exc.$message = new Py_Str(message + os.EOL);
-    t.addToTraceback(exc.$message);
     f.push(exc);
-    t.throwException(exc);
+    t.raiseException(exc, exc.$message.toString());
 }
 
 // push exceptions on stack
@@ -558,8 +662,7 @@ function do_raise(f: Py_FrameObject, t: Thread, cause: IPy_Object, exc: any): vo
     }
 }
 optable[opcodes.RAISE_VARARGS] = function(f: Py_FrameObject, t:Thread) {
-    t.clearTraceback();
-    var i = f.readArg();
+    var i = f.getArg();
     var cause: IPy_Object = null, exc: any = null;
     switch (i) {
         case 2:
@@ -577,7 +680,7 @@ optable[opcodes.RAISE_VARARGS] = function(f: Py_FrameObject, t:Thread) {
 
 // Helper function for all the CALL_FUNCTION* opcodes
 function call_func(f: Py_FrameObject, t: Thread, has_kw: boolean, has_varargs: boolean) {
-    var x = f.readArg();
+    var x = f.getArg();
     var num_args = x & 0xff;
     var num_kwargs = (x >> 8) & 0xff;
     var args: IPy_Object[] = new Array(num_args);
@@ -604,23 +707,59 @@ function call_func(f: Py_FrameObject, t: Thread, has_kw: boolean, has_varargs: b
 
     var func = f.pop();
 
+    // A method left unbound by LOAD_ATTR; see Py_CodeObject.attrCalls.
+    if (func instanceof Py_NativeMethod) {
+        nativeReturn(f, t, f.lastInst, (<Py_NativeMethod> func).call(f.pop(), t, f, args, kwargs));
+        return;
+    }
+
     // Hack for class objects, which are callable.
     if (!(<any> func)['exec'] && (<any> func)['$__call__']) {
         func = (<any> func).$__call__;
     }
 
-    initPyFuncObj();
-    if (func instanceof Py_GeneratorObject) {
-        // This sets up the frame, but doesn't run the code.
-        (<IPy_Function> func).exec(t, f, args, kwargs);
-        return f.push(func);
+    // Native functions return straight into this frame, without a
+    // trampoline frame or a trip through the thread loop.
+    if (func instanceof Py_SyncNativeFuncObject || func instanceof Py_BoundNativeMethod) {
+        nativeReturn(f, t, f.lastInst, (<Py_SyncNativeFuncObject> func).call(t, f, args, kwargs));
+        return;
+    }
+    if (func instanceof Py_AsyncNativeFuncObject) {
+        if (!(<Py_AsyncNativeFuncObject> func).callInline(t, f, args, kwargs)) {
+            f.returnToThread = true;
+        }
+        return;
     }
 
     f.returnToThread = true;
     (<IPy_Function> func).exec(t, f, args, kwargs);
 }
 
+// Finishes a call to a native function made by the instruction at inst in
+// f, which returned rv. The result goes on f's stack, unless the function
+// raised and the stack was unwound to a handler, or it switched to another
+// frame (a generator's) that will push the result when it returns to f.
+function nativeReturn(f: Py_FrameObject, t: Thread, inst: number, rv: IPy_Object): void {
+    if (t.getTopOfStack() !== f) {
+        f.returnToThread = true;
+    } else if (f.lastInst === inst) {
+        f.push(rv);
+    }
+}
+
 optable[opcodes.CALL_FUNCTION] = function(f: Py_FrameObject, t: Thread) {
+    var argc = f.getArg(), func: _Py_FuncObject;
+    // Python functions called with positional arguments only; keyword
+    // arguments are counted in the high byte. Generator functions aren't
+    // fastCall, so they take the general path.
+    if (argc <= 0xff) {
+        func = <_Py_FuncObject> f.stack[f.stack.length - argc - 1];
+        if (func.constructor === Py_FuncObject && func.fastCall && argc <= func.code.argcount) {
+            f.returnToThread = true;
+            func.callPositional(t, f, argc);
+            return;
+        }
+    }
     call_func(f, t, false, false);
 }
 
@@ -645,7 +784,7 @@ function initPyFuncObj() {
 }
 
 optable[opcodes.MAKE_FUNCTION] = function(f: Py_FrameObject) {
-    var numDefault = f.readArg(),
+    var numDefault = f.getArg(),
       defaults = new Py_Dict();
 
     var code = <Py_CodeObject> f.pop();
@@ -654,17 +793,11 @@ optable[opcodes.MAKE_FUNCTION] = function(f: Py_FrameObject) {
     }
 
     initPyFuncObj();
-    var func: IPy_Function;
-    if (code.isGenerator()) {
-        func = new Py_GeneratorObject(code, f.globals, defaults, code.name);
-    } else {
-        func = new Py_FuncObject(code, f.globals, defaults, code.name);
-    }
-    f.push(func);
+    f.push(new Py_FuncObject(code, f.globals, defaults, code.name));
 }
 
 optable[opcodes.MAKE_CLOSURE] = function(f: Py_FrameObject) {
-    var numDefault = f.readArg();
+    var numDefault = f.getArg();
     var defaults = new Py_Dict();
 
     var code = <Py_CodeObject> f.pop();
@@ -689,11 +822,11 @@ optable[opcodes.SLICE_0] = function(f: Py_FrameObject, t: Thread) {
     var a = f.pop();
     if (a.__getitem__) {
         // Assumption: types with __getitem__ also have __len__.
-        f.push(a.__getitem__(t, new Py_Slice(new Py_Int(0), a.__len__(), None)));
+        f.push(a.__getitem__(t, new Py_Slice(Py_Int.fromNumber(0), a.__len__(), None)));
     } else if (a.$__getitem__ && a.$__len__) {
         f.returnToThread = true;
         a.$__len__.exec_from_native(t, f, [], new Py_Dict(), (rv: IPy_Object) => {
-            a.$__getitem__.exec_from_native(t, f, [new Py_Slice(new Py_Int(0), rv, None)], new Py_Dict(), (rv: IPy_Object) => {
+            a.$__getitem__.exec_from_native(t, f, [new Py_Slice(Py_Int.fromNumber(0), rv, None)], new Py_Dict(), (rv: IPy_Object) => {
                 f.push(rv);
                 t.setStatus(ThreadStatus.RUNNABLE);
             });
@@ -725,10 +858,10 @@ optable[opcodes.SLICE_2] = function(f: Py_FrameObject, t: Thread) {
     var b = f.pop();
     var a = f.pop();
     if (a.__getitem__) {
-        f.push(a.__getitem__(t, new Py_Slice(new Py_Int(0), b, None)));
+        f.push(a.__getitem__(t, new Py_Slice(Py_Int.fromNumber(0), b, None)));
     } else if (a.$__getitem__) {
         f.returnToThread = true;
-        a.$__getitem__.exec(t, f, [new Py_Slice(new Py_Int(0), b, None)], new Py_Dict());
+        a.$__getitem__.exec(t, f, [new Py_Slice(Py_Int.fromNumber(0), b, None)], new Py_Dict());
     } else {
         throw new Error(`TypeError: ${b} does not support __getitem__`);
     }
@@ -748,45 +881,44 @@ optable[opcodes.SLICE_3] = function(f: Py_FrameObject, t: Thread) {
     }
 }
 
-optable[opcodes.STORE_SLICE_0] = function(f: Py_FrameObject, t: Thread) {
-    var seq = f.pop();
-    var value = f.pop();
-    if (seq.__setitem__) {
-        seq.__setitem__(t, new Py_Slice(None, None, None), value);
+// seq[slice] = value. The items of a generator come from running its code,
+// so the assignment waits for them.
+function storeSlice(f: Py_FrameObject, t: Thread, seq: IPy_Object, slice: Py_Slice, value: IPy_Object) {
+    initPyFuncObj();
+    if (seq.__setitem__ && value instanceof Py_GeneratorObject) {
+        f.returnToThread = true;
+        builtins.collect(t, f, value, (items: IPy_Object[]) => {
+            seq.__setitem__(t, slice, new Py_List(items));
+            t.setStatus(ThreadStatus.RUNNABLE);
+        });
+    } else if (seq.__setitem__) {
+        seq.__setitem__(t, slice, value);
     } else if (seq.$__setitem__) {
         f.returnToThread = true;
-        seq.$__setitem__.exec(t, f, [new Py_Slice(None, None, None), value], new Py_Dict());
+        seq.$__setitem__.exec(t, f, [slice, value], new Py_Dict());
     } else {
         throw new Error(`TypeError: ${seq} does not support __setitem__`);
     }
 }
 
+optable[opcodes.STORE_SLICE_0] = function(f: Py_FrameObject, t: Thread) {
+    var seq = f.pop();
+    var value = f.pop();
+    storeSlice(f, t, seq, new Py_Slice(None, None, None), value);
+}
+
 optable[opcodes.STORE_SLICE_1] = function(f: Py_FrameObject, t: Thread) {
     var start = f.pop();
     var seq = f.pop();
     var value = f.pop();
-    if (seq.__setitem__) {
-        seq.__setitem__(t, new Py_Slice(start, None, None), value);
-    } else if (seq.$__setitem__) {
-        f.returnToThread = true;
-        seq.$__setitem__.exec(t, f, [new Py_Slice(start, None, None), value], new Py_Dict());
-    } else {
-        throw new Error(`TypeError: ${seq} does not support __setitem__`);
-    }
+    storeSlice(f, t, seq, new Py_Slice(start, None, None), value);
 }
 
 optable[opcodes.STORE_SLICE_2] = function(f: Py_FrameObject, t: Thread) {
     var end = f.pop();
     var seq = f.pop();
     var value = f.pop();
-    if (seq.__setitem__) {
-        seq.__setitem__(t, new Py_Slice(None, end, None), value);
-    } else if (seq.$__setitem__) {
-        f.returnToThread = true;
-        seq.$__setitem__.exec(t, f, [new Py_Slice(None, end, None), value], new Py_Dict());
-    } else {
-        throw new Error(`TypeError: ${seq} does not support __setitem__`);
-    }
+    storeSlice(f, t, seq, new Py_Slice(None, end, None), value);
 }
 
 optable[opcodes.STORE_SLICE_3] = function(f: Py_FrameObject, t: Thread) {
@@ -794,14 +926,7 @@ optable[opcodes.STORE_SLICE_3] = function(f: Py_FrameObject, t: Thread) {
     var start = f.pop();
     var seq = f.pop();
     var value = f.pop();
-    if (seq.__setitem__) {
-        seq.__setitem__(t, new Py_Slice(start, end, None), value);
-    } else if (seq.$__setitem__) {
-        f.returnToThread = true;
-        seq.$__setitem__.exec(t, f, [new Py_Slice(start, end, None), value], new Py_Dict());
-    } else {
-        throw new Error(`TypeError: ${seq} does not support __setitem__`);
-    }
+    storeSlice(f, t, seq, new Py_Slice(start, end, None), value);
 }
 
 optable[opcodes.DELETE_SLICE_0] = function(f: Py_FrameObject, t: Thread) {
@@ -862,7 +987,9 @@ optable[opcodes.STORE_SUBSCR] = function(f: Py_FrameObject, t: Thread) {
     var key = f.pop();
     var obj = f.pop();
     var value = f.pop();
-    if (obj.__setitem__) {
+    if (key instanceof Py_Slice) {
+        storeSlice(f, t, obj, key, value);
+    } else if (obj.__setitem__) {
         obj.__setitem__(t, key, value);
     } else if (obj.$__setitem__) {
         f.returnToThread = true;
@@ -887,7 +1014,7 @@ optable[opcodes.DELETE_SUBSCR] = function(f: Py_FrameObject, t: Thread) {
 }
 
 optable[opcodes.BUILD_TUPLE] = function(f: Py_FrameObject) {
-    var count = f.readArg();
+    var count = f.getArg();
     var l = new Array(count);
     for (var i = count-1; i >= 0; i--){
         l[i] = f.pop();
@@ -896,7 +1023,7 @@ optable[opcodes.BUILD_TUPLE] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.BUILD_LIST] = function(f: Py_FrameObject) {
-    var count = f.readArg();
+    var count = f.getArg();
     var l = new Array(count);
     for (var i = count-1; i >= 0; i--){
         l[i] = f.pop();
@@ -905,7 +1032,7 @@ optable[opcodes.BUILD_LIST] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.BUILD_SET] = function(f: Py_FrameObject) {
-    var count = f.readArg();
+    var count = f.getArg();
     var l = new Array(count);
     for (var i = count-1; i >= 0; i--){
         l[i] = f.pop();
@@ -915,7 +1042,7 @@ optable[opcodes.BUILD_SET] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.BUILD_MAP] = function(f: Py_FrameObject, t: Thread) {
-    var count = f.readArg();
+    var count = f.getArg();
     var d = builtins.dict(t, f, [], new Py_Dict());
     f.push(d);
 }
@@ -928,16 +1055,12 @@ optable[opcodes.STORE_MAP] = function(f: Py_FrameObject) {
 }
 
 function setup_block(f: Py_FrameObject, t: Thread, op: number) {
-    var delta = f.readArg();
+    // Blocks end just before their target, so jumping to endPos resumes there.
+    var endPos = f.getArg() - 1;
     // push a block to the block stack
     var stackSize = f.stack.length;
     var loopPos = f.lastInst;
-    f.blockStack.push([stackSize, loopPos, loopPos+delta, op]);
-
-    // For handling StopIteration exceptions inside of for loops, generated by exhausted generators
-    if (op === opcodes.SETUP_LOOP) {
-        t.loop_exc_block.push([stackSize, loopPos, loopPos + delta, opcodes.SETUP_EXCEPT]);
-    }
+    f.blockStack.push([stackSize, loopPos, endPos, op]);
 }
 
 optable[opcodes.SETUP_LOOP] = (f: Py_FrameObject, t:Thread) => setup_block(f, t, opcodes.SETUP_LOOP);
@@ -956,9 +1079,9 @@ optable[opcodes.BREAK_LOOP] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.CONTINUE_LOOP] = function(f: Py_FrameObject) {
-    var target = f.readArg();
+    var target = f.getArg();
     var b = f.blockStack[f.blockStack.length-1];
-    if (b[1] === target) {
+    if (b[1] + 1 === target) {
         // we continue back to the loop start
         f.lastInst = target-1;
     } else {
@@ -969,21 +1092,21 @@ optable[opcodes.CONTINUE_LOOP] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.SET_ADD] = function(f: Py_FrameObject, t: Thread) {
-    var i = f.readArg();
+    var i = f.getArg();
     var x = f.pop();
     var set = <Py_Set> f.stack[f.stack.length - i];
     set.add(x);
 }
 
 optable[opcodes.LIST_APPEND] = function(f: Py_FrameObject) {
-    var i = f.readArg();
+    var i = f.getArg();
     var x = f.pop();
     var lst = <Py_List> f.stack[f.stack.length - i];
     lst.append(x);
 }
 
 optable[opcodes.MAP_ADD] = function(f: Py_FrameObject, t: Thread) {
-    var i = f.readArg();
+    var i = f.getArg();
     var key = f.pop();
     var val = f.pop();
     var dict = <Py_Dict> f.stack[f.stack.length - i];
@@ -1009,8 +1132,15 @@ optable[opcodes.GET_ITER] = function(f: Py_FrameObject, t: Thread) {
 }
 
 optable[opcodes.FOR_ITER] = function(f: Py_FrameObject, t: Thread) {
-    var delta = f.readArg();
+    var target = f.getArg();
     var iter = <Iterator> f.peek();
+    initPyFuncObj();
+    if (iter instanceof Py_GeneratorObject) {
+        // Switches to the generator's frame, which pushes the next value
+        // on this frame's stack or jumps to target.
+        (<_Py_GeneratorObject> iter).resume(t, f, None, target);
+        return;
+    }
     // Calls $__next__() if it exists, otherwise, next() on the iterator
     if (iter.$__next__) {
         iter.$__next__.exec_from_native(t, f, [], new Py_Dict(), (rv: IPy_Object) => {
@@ -1024,31 +1154,27 @@ optable[opcodes.FOR_ITER] = function(f: Py_FrameObject, t: Thread) {
             f.push(res);
         } else {
             f.pop();
-            f.lastInst += delta;
+            f.lastInst = target - 1;
         }
     }
 }
 
 optable[opcodes.YIELD_VALUE] = function(f: Py_FrameObject, t: Thread) {
-    var res = f.peek();
-    // Push on calling frame's stack
-    t.asyncReturn(res);
-    f.cb(res);
-    f.returnToThread = true;
+    f.generator.suspend(t, f.pop());
 }
 
 optable[opcodes.IMPORT_NAME] = function(f: Py_FrameObject, t: Thread) {
-    var name_idx = f.readArg();
+    var name_idx = f.getArg();
     // see https://docs.python.org/2/library/functions.html#__import__
     var fromlist = f.pop();
     var level = f.pop();
     var name = f.codeObj.names[name_idx];
     f.returnToThread = true;
-    builtins.$__import__.exec(t, f, [name, f.globals, f.locals, fromlist, level], new Py_Dict());
+    builtins.$__import__.exec(t, f, [name, f.globals, f.locals !== null ? f.locals : None, fromlist, level], new Py_Dict());
 }
 
 optable[opcodes.IMPORT_FROM] = function(f: Py_FrameObject) {
-    var name_idx = f.readArg();
+    var name_idx = f.getArg();
     // Don't pop it off.
     var mod = f.peek();
     var name = f.codeObj.names[name_idx];
@@ -1064,26 +1190,49 @@ optable[opcodes.IMPORT_STAR] = function(f: Py_FrameObject) {
         if (key.length > 1 && key[0] == '$' && key[1] != '_') {
             // strip off the leading $
             py_key = new Py_Str(key.slice(1));
-            f.locals.set(py_key, (<any> mod)[key]);
+            f.getLocals().set(py_key, (<any> mod)[key]);
         }
     }
 }
 
 // Replaces TOS with getattr(TOS, co_names[namei]).
-optable[opcodes.LOAD_ATTR] = function(f: Py_FrameObject, t: Thread) { 
-    var name = f.codeObj.names[f.readArg()].toString(),
-        obj = f.pop(),
-        val = (<any> obj)[`$${name}`];
+optable[opcodes.LOAD_ATTR] = function(f: Py_FrameObject, t: Thread) {
+    var code = f.codeObj,
+        i = f.lastInst,
+        obj = <any> f.pop(),
+        val: IPy_Object, slot: number;
+    if (obj.shape === code.attrShapes[i]) {
+        // A slot of -1 means the attribute is not stored on the instance.
+        slot = code.attrSlots[i];
+        val = slot >= 0 ? obj.slots[slot] : obj[code.nameKeys[f.getArg()]];
+    } else {
+        var key = code.nameKeys[f.getArg()];
+        slot = slotOf(obj, key);
+        if (obj.shape && key !== '$__dict__') {
+            code.attrShapes[i] = obj.shape;
+            code.attrSlots[i] = slot;
+            code.attrTransitions[i] = null;
+        }
+        val = slot >= 0 ? obj.slots[slot] : getAttr(obj, key);
+    }
     if (val === undefined) {
-        var message = `'function' object has no attribute '${name}'\n`;
+        var message = `'function' object has no attribute '${code.names[f.getArg()]}'\n`;
         f.raise_exception_here(t, message, "AttributeError");
+    } else if (val instanceof Py_NativeMethod) {
+        if (code.attrCalls[i]) {
+            // call_func picks the receiver up from below the method.
+            f.push(obj);
+            f.push(val);
+        } else {
+            f.push((<Py_NativeMethod> val).bind(obj));
+        }
     } else {
         f.push(val);
     }
 }
 
 optable[opcodes.BUILD_SLICE] = function(f: Py_FrameObject) {
-    var argv = f.readArg(), step: IPy_Object, start: IPy_Object, stop: IPy_Object;
+    var argv = f.getArg(), step: IPy_Object, start: IPy_Object, stop: IPy_Object;
     if (argv === 3) {
         step = f.pop();
     } else {
@@ -1095,7 +1244,7 @@ optable[opcodes.BUILD_SLICE] = function(f: Py_FrameObject) {
 }
 
 optable[opcodes.LOAD_LOCALS] = function(f: Py_FrameObject) {
-    f.push(f.locals);
+    f.push(f.getLocals());
 }
 
 optable[opcodes.BUILD_CLASS] = function(f: Py_FrameObject, t: Thread) {
@@ -1135,4 +1284,89 @@ optable[opcodes.WITH_CLEANUP] = function(f: Py_FrameObject, t: Thread) {
     var result = f.pop();
 }
 
+// Superinstructions are installed by the peephole optimizer in place of the
+// first of two instructions, whose arguments they read from the code object.
+// They carry out both, leaving lastInst on the second, or do just the first
+// when that is the simplest way to get the second to raise.
+optable[opcodes.LOAD_FAST_LOAD_FAST] = function(f: Py_FrameObject, t: Thread) {
+    var args = f.codeObj.args,
+        i = f.lastInst,
+        a = f.fastlocals[args[i]],
+        b = f.fastlocals[args[i + 1]];
+    if (a === null || b === null) {
+        optable[opcodes.LOAD_FAST](f, t);
+        return;
+    }
+    f.push(a);
+    f.push(b);
+    f.lastInst = i + 1;
+}
+
+optable[opcodes.LOAD_FAST_LOAD_CONST] = function(f: Py_FrameObject, t: Thread) {
+    var code = f.codeObj,
+        i = f.lastInst,
+        a = f.fastlocals[code.args[i]];
+    if (a === null) {
+        optable[opcodes.LOAD_FAST](f, t);
+        return;
+    }
+    f.push(a);
+    f.push(code.consts[code.args[i + 1]]);
+    f.lastInst = i + 1;
+}
+
+optable[opcodes.STORE_FAST_LOAD_FAST] = function(f: Py_FrameObject, t: Thread) {
+    var args = f.codeObj.args,
+        i = f.lastInst,
+        fastlocals = f.fastlocals,
+        b: IPy_Object;
+    fastlocals[args[i]] = f.pop();
+    b = fastlocals[args[i + 1]];
+    if (b !== null) {
+        f.push(b);
+        f.lastInst = i + 1;
+    }
+}
+
+function generateCompareAndJump(jumpIf: typeof True): (f: Py_FrameObject, t: Thread) => void {
+    return function(f: Py_FrameObject, t: Thread) {
+        var code = f.codeObj,
+            i = f.lastInst,
+            op = <ComparisonOp> code.args[i],
+            n = f.stack.length,
+            a = f.stack[n - 2],
+            b = f.stack[n - 1];
+        if (op <= ComparisonOp.GTE && a.constructor === Py_Int && b.constructor === Py_Int) {
+            f.pop();
+            f.pop();
+            if (compareInts(op, <Py_Int> a, <Py_Int> b) === jumpIf) {
+                f.lastInst = code.args[i + 1] - 1;
+            } else {
+                f.lastInst = i + 1;
+            }
+            return;
+        }
+        optable[opcodes.COMPARE_OP](f, t);
+    };
+}
+
+optable[opcodes.COMPARE_OP_POP_JUMP_IF_FALSE] = generateCompareAndJump(False);
+optable[opcodes.COMPARE_OP_POP_JUMP_IF_TRUE] = generateCompareAndJump(True);
+
+optable[opcodes.LOAD_CONST_RETURN_VALUE] = function(f: Py_FrameObject, t: Thread) {
+    var code = f.codeObj;
+    f.push(code.consts[code.args[f.lastInst]]);
+    f.lastInst++;
+    optable[opcodes.RETURN_VALUE](f, t);
+}
+
+// Instructions that can be specialized for their operand types start out
+// on adaptive handlers; see quicken.ts.
+Object.keys(optable).forEach((key: string) => {
+    var op = parseInt(key, 10);
+    if (quicken.canSpecialize(op)) {
+        optable[op] = quicken.adaptive(op, optable[op]);
+    }
+});
+
 export = optable;
@@ -0,0 +1,95 @@
+// Buffered output is written out once this many characters have built up.
+const DEFAULT_BUFFER_SIZE = 65536;
+
+/**
+ * Anything the interpreter can print to. Devices that buffer their output
+ * write it out when flush() is called.
+ */
+export interface OutputDevice {
+    write(str: string): void;
+    flush?(): void;
+}
+
+/**
+ * Collects the output written to another device, and writes it out in one
+ * piece when the buffer is full, at the end of each line if line buffered,
+ * or when flushed. The interpreter flushes its output whenever it yields to
+ * the event loop, and when the program exits.
+ */
+export class BufferedOutput implements OutputDevice {
+    private sink: OutputDevice;
+    private lineBuffered: boolean;
+    private bufferSize: number;
+    private chunks: string[] = [];
+    // Characters in chunks.
+    private size: number = 0;
+
+    constructor(sink: OutputDevice, lineBuffered: boolean = false, bufferSize: number = DEFAULT_BUFFER_SIZE) {
+        this.sink = sink;
+        this.lineBuffered = lineBuffered;
+        this.bufferSize = bufferSize;
+    }
+
+    public write(str: string): void {
+        this.chunks.push(str);
+        this.size += str.length;
+        if (this.size >= this.bufferSize || (this.lineBuffered && str.indexOf('\n') !== -1)) {
+            this.flush();
+        }
+    }
+
+    public flush(): void {
+        if (this.size > 0) {
+            var str = this.chunks.join('');
+            this.chunks = [];
+            this.size = 0;
+            this.sink.write(str);
+        }
+        if (this.sink.flush) {
+            this.sink.flush();
+        }
+    }
+}
+
+/**
+ * Keeps everything written to it in memory.
+ */
+export class MemoryOutput implements OutputDevice {
+    private chunks: string[] = [];
+
+    public write(str: string): void {
+        this.chunks.push(str);
+    }
+
+    // Returns everything written since the last call to clear().
+    public getContents(): string {
+        var str = this.chunks.join('');
+        this.chunks = [str];
+        return str;
+    }
+
+    public clear(): void {
+        this.chunks = [];
+    }
+}
+
+/**
+ * Appends output to a text area, or any other element with a value.
+ */
+export class TextAreaOutput implements OutputDevice {
+    private element: { value: string };
+
+    constructor(element: { value: string }) {
+        this.element = element;
+    }
+
+    public write(str: string): void {
+        this.element.value += str;
+    }
+}
+
+// The default output device: standard output, line buffered if it is a
+// terminal.
+export function stdout(): OutputDevice {
+    return new BufferedOutput(process.stdout, (<any> process.stdout).isTTY === true);
+}
@@ -0,0 +1,168 @@
+import {IPy_Object} from './interfaces';
+import {Py_Int, Py_Long, Py_Float} from './primitives';
+import opcodes = require('./opcodes');
+import {Thread} from './threading';
+// !! Use only for type info !!
+import _Py_CodeObject = require('./codeobject');
+import _Py_FrameObject = require('./frameobject');
+import _optable = require('./optable');
+
+/**
+ * The peephole optimizer rewrites the handlers of a freshly decoded code
+ * object. Instructions are never added, removed or moved, so jump targets,
+ * inline caches and line numbers stay as they are; instead, the handler of
+ * the first instruction of a sequence is replaced by one that carries out
+ * the whole sequence and skips the rest. The other instructions keep their
+ * handlers, so jumping into the middle of a sequence still works. It:
+ *
+ * - points jumps to unconditional jumps at their final target,
+ * - folds arithmetic on two number constants, and
+ * - fuses common pairs into superinstructions (see optable.ts).
+ *
+ * Handlers that can raise leave lastInst on the instruction that raised, so
+ * tracebacks and exception handlers see the same instruction they would
+ * without the optimizer.
+ */
+
+var enabled = true;
+
+// Turns the optimizer on or off, for code decoded from now on.
+export function setEnabled(on: boolean): void {
+    enabled = on;
+}
+
+export function isEnabled(): boolean {
+    return enabled;
+}
+
+// Jumps whose target is their argument, and which can be pointed past an
+// unconditional jump.
+const threadedJumps: { [op: number]: boolean } = {};
+[opcodes.JUMP_FORWARD, opcodes.JUMP_ABSOLUTE, opcodes.POP_JUMP_IF_FALSE,
+ opcodes.POP_JUMP_IF_TRUE, opcodes.JUMP_IF_FALSE_OR_POP, opcodes.JUMP_IF_TRUE_OR_POP
+].forEach((op: number) => threadedJumps[op] = true);
+
+// Number methods for the binary operations that can be folded.
+const foldedOps: { [op: number]: string } = {};
+foldedOps[opcodes.BINARY_POWER] = 'pow';
+foldedOps[opcodes.BINARY_MULTIPLY] = 'mul';
+foldedOps[opcodes.BINARY_DIVIDE] = 'div';
+foldedOps[opcodes.BINARY_MODULO] = 'mod';
+foldedOps[opcodes.BINARY_ADD] = 'add';
+foldedOps[opcodes.BINARY_SUBTRACT] = 'sub';
+foldedOps[opcodes.BINARY_FLOOR_DIVIDE] = 'floordiv';
+foldedOps[opcodes.BINARY_TRUE_DIVIDE] = 'truediv';
+foldedOps[opcodes.BINARY_LSHIFT] = 'lshift';
+foldedOps[opcodes.BINARY_RSHIFT] = 'rshift';
+foldedOps[opcodes.BINARY_AND] = 'and';
+foldedOps[opcodes.BINARY_XOR] = 'xor';
+foldedOps[opcodes.BINARY_OR] = 'or';
+
+// Superinstructions, by the opcodes of the pair they replace.
+const superinstructions: { [first: number]: { [second: number]: number } } = {};
+function addSuperinstruction(first: number, second: number, op: number): void {
+    if (superinstructions[first] === undefined) {
+        superinstructions[first] = {};
+    }
+    superinstructions[first][second] = op;
+}
+addSuperinstruction(opcodes.LOAD_FAST, opcodes.LOAD_FAST, opcodes.LOAD_FAST_LOAD_FAST);
+addSuperinstruction(opcodes.LOAD_FAST, opcodes.LOAD_CONST, opcodes.LOAD_FAST_LOAD_CONST);
+addSuperinstruction(opcodes.STORE_FAST, opcodes.LOAD_FAST, opcodes.STORE_FAST_LOAD_FAST);
+addSuperinstruction(opcodes.COMPARE_OP, opcodes.POP_JUMP_IF_FALSE, opcodes.COMPARE_OP_POP_JUMP_IF_FALSE);
+addSuperinstruction(opcodes.COMPARE_OP, opcodes.POP_JUMP_IF_TRUE, opcodes.COMPARE_OP_POP_JUMP_IF_TRUE);
+addSuperinstruction(opcodes.LOAD_CONST, opcodes.RETURN_VALUE, opcodes.LOAD_CONST_RETURN_VALUE);
+
+export function optimize(code: _Py_CodeObject): void {
+    // XXX: Hack around circular reference.
+    var optable: typeof _optable = require('./optable'),
+        ops = code.ops,
+        args = code.args,
+        handlers = code.handlers,
+        count = ops.length,
+        i: number, folded: IPy_Object, pairs: { [second: number]: number };
+
+    for (i = 0; i < count; i++) {
+        if (threadedJumps[ops[i]]) {
+            args[i] = finalTarget(code, args[i]);
+        }
+    }
+    for (i = 0; i < count - 1; i++) {
+        if (i + 2 < count && ops[i] === opcodes.LOAD_CONST && ops[i + 1] === opcodes.LOAD_CONST &&
+            foldedOps[ops[i + 2]] !== undefined) {
+            folded = fold(foldedOps[ops[i + 2]], code.consts[args[i]], code.consts[args[i + 1]]);
+            if (folded !== null) {
+                handlers[i] = loadFolded(folded);
+                continue;
+            }
+        }
+        pairs = superinstructions[ops[i]];
+        if (pairs !== undefined && pairs[ops[i + 1]] !== undefined) {
+            handlers[i] = optable[pairs[ops[i + 1]]];
+        }
+    }
+}
+
+// Follows a chain of unconditional jumps from target.
+function finalTarget(code: _Py_CodeObject, target: number): number {
+    var ops = code.ops, seen = 0;
+    // The bound stops at loops made only of jumps.
+    while (target < ops.length && (ops[target] === opcodes.JUMP_ABSOLUTE || ops[target] === opcodes.JUMP_FORWARD) &&
+           seen++ < ops.length) {
+        target = code.args[target];
+    }
+    return target;
+}
+
+function isNumber(x: IPy_Object): boolean {
+    return x.constructor === Py_Int || x.constructor === Py_Long || x.constructor === Py_Float;
+}
+
+// Returns the result of a binary operation on two constants, or null when
+// it can't be worked out ahead of time: the operands aren't numbers, or the
+// operation would raise or could build a huge number.
+function fold(funcName: string, a: IPy_Object, b: IPy_Object): IPy_Object {
+    // The operation is carried out on the wider of the two types.
+    if (!isNumber(a) || !isNumber(b) || (<any> a)[funcName] === undefined ||
+        (<any> b)[funcName] === undefined) {
+        return null;
+    }
+    var n: number = (<any> b).toNumber();
+    switch (funcName) {
+        case 'div':
+        case 'truediv':
+        case 'floordiv':
+        case 'mod':
+            if (!b.asBool()) {
+                return null;
+            }
+            break;
+        case 'pow':
+            if (!(n >= 0 && n <= 64)) {
+                return null;
+            }
+            break;
+        case 'lshift':
+            if (!(n >= 0 && n <= 64)) {
+                return null;
+            }
+            break;
+        case 'rshift':
+            if (n < 0) {
+                return null;
+            }
+            break;
+    }
+    // What the handler would do: the __op__ methods of numbers convert the
+    // operands to the wider type and call the operation, which only uses the
+    // thread to raise.
+    var result: IPy_Object = (<any> a)[`__${funcName}__`](<Thread> null, b);
+    return isNumber(result) ? result : null;
+}
+
+function loadFolded(value: IPy_Object): (f: _Py_FrameObject, t: Thread) => void {
+    return function LOAD_FOLDED(f: _Py_FrameObject) {
+        f.push(value);
+        f.lastInst += 2;
+    };
+}
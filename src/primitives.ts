@@ -1,15 +1,16 @@
-/// <reference path="../bower_components/DefinitelyTyped/decimal.js/decimal.js.d.ts" />
 import {Py_Type} from './enums';
 import {IPy_Number, IPy_Object, Iterator} from './interfaces';
-import Decimal = require('decimal.js');
 // Use for type information ONLY to avoid circular ref!
 import _collections = require('./collections');
 var collections: typeof _collections = null;
+import _iterator = require('./iterator');
+var iterator: typeof _iterator = null;
 import {Thread} from './threading';
 import Py_FrameObject = require('./frameobject');
 
 export function circularRefHack() {
   collections = require('./collections');
+  iterator = require('./iterator');
 };
 
 // Represents singleton types.
@@ -50,6 +51,12 @@ export const NotImplemented = new SingletonClass("NotImplemented");
 
 var ref = 1;
 
+// Returns a count that goes up by one for every Py_Object created; the
+// profiler uses it to count allocations.
+export function allocationCount(): number {
+    return ref;
+}
+
 export class Py_Object implements IPy_Object {
     private _ref: number;
     constructor() {
@@ -205,6 +212,19 @@ export class Py_Str extends Py_Object {
     public len(): number {
       return this._str.length;
     }
+    public item(i: number): Py_Str {
+      return Py_Str.fromJS(this._str[i]);
+    }
+    public iter(): Iterator {
+      return new iterator.SequenceIterator(this);
+    }
+    // Substrings, rather than only the characters iter() gives.
+    public __contains__(x: IPy_Object): typeof True {
+      if (!(x instanceof Py_Str)) {
+        throw new Error(`TypeError: 'in <string>' requires string as left operand`);
+      }
+      return this._str.indexOf(x.toString()) !== -1 ? True : False;
+    }
 
     public toString(): string {
         return this._str;
@@ -221,19 +241,42 @@ export class Py_Str extends Py_Object {
         return this;
     }
     public __len__(): Py_Int {
-        return new Py_Int(this._str.length);
+        return Py_Int.fromNumber(this._str.length);
     }
+    // Strings compare by character codes, as CPython's do by bytes.
     public __eq__(other: IPy_Object): IPy_Object {
       if (other instanceof Py_Str) {
-        var cmp = this._str.localeCompare(other.toString());
-        return Py_Boolean.fromJS(cmp == 0);
+        return Py_Boolean.fromJS(this._str === other.toString());
+      }
+      return NotImplemented;
+    }
+    public __ne__(other: IPy_Object): IPy_Object {
+      if (other instanceof Py_Str) {
+        return Py_Boolean.fromJS(this._str !== other.toString());
       }
       return NotImplemented;
     }
     public __lt__(other: IPy_Object): IPy_Object {
       if (other instanceof Py_Str) {
-        var cmp = this._str.localeCompare(other.toString());
-        return Py_Boolean.fromJS(cmp < 0);
+        return Py_Boolean.fromJS(this._str < other.toString());
+      }
+      return NotImplemented;
+    }
+    public __le__(other: IPy_Object): IPy_Object {
+      if (other instanceof Py_Str) {
+        return Py_Boolean.fromJS(this._str <= other.toString());
+      }
+      return NotImplemented;
+    }
+    public __gt__(other: IPy_Object): IPy_Object {
+      if (other instanceof Py_Str) {
+        return Py_Boolean.fromJS(this._str > other.toString());
+      }
+      return NotImplemented;
+    }
+    public __ge__(other: IPy_Object): IPy_Object {
+      if (other instanceof Py_Str) {
+        return Py_Boolean.fromJS(this._str >= other.toString());
       }
       return NotImplemented;
     }
@@ -274,7 +317,7 @@ export class Py_Str extends Py_Object {
         if (rhs_idx == 0 && num_matches == 1) {
           obj = other;
         } else {
-          obj = other.__getitem__(t, new Py_Int(rhs_idx));
+          obj = other.__getitem__(t, Py_Int.fromNumber(rhs_idx));
           rhs_idx++;
         }
         s += format(fmt[1], fmt[2], fmt[3], fmt[4], fmt[5], obj);
@@ -290,13 +333,17 @@ function format(mapping: string, conv_flags: string, field_width: string,
   // XXX: really hacky attempt at covering the common cases
   if (mapping !== undefined) {
     // mapping is a JS string '(dict_key)', and obj is a Py_Dict
-    // XXX: use non-private methods for this
-    obj = (<any> obj)._stringDict[`$${mapping.slice(1,-1)}`];
+    obj = (<_collections.Py_Dict> obj).get(Py_Str.fromJS(mapping.slice(1,-1)));
   }
   switch (conv_type) {
     case 's': return obj.__str__().toString();
     case 'r': return obj.__repr__().toString();
-    case 'd': return ((<IPy_Number>obj).asLong().toNumber()|0).toString();
+    case 'd':
+      if (obj instanceof Py_Long) {
+        return obj.value.toString();
+      }
+      var n = (<IPy_Number>obj).asFloat().toNumber();
+      return (n < 0 ? Math.ceil(n) : Math.floor(n)).toString();
     case 'f':
       var x = (<IPy_Number>obj).asFloat().toNumber();
       if (precision !== undefined) {
@@ -307,6 +354,15 @@ function format(mapping: string, conv_flags: string, field_width: string,
   return '';
 }
 
+// Modulo with the sign of the divisor, as in Python. Exact for any numbers.
+function pyMod(a: number, b: number): number {
+  var r = a % b;
+  if (r !== 0 && (r < 0) !== (b < 0)) {
+    r += b;
+  }
+  return r;
+}
+
 function widenTo(a: IPy_Number, widerType: Py_Type): IPy_Number {
   switch (widerType) {
     case Py_Type.LONG:
@@ -351,7 +407,7 @@ function generateCmpOp(name: string): (b: IPy_Number) => IPy_Number {
         typeDiff = aType - bType;
       if (bType > ${Py_Type.COMPLEX}) {
         // b is not a number. Thus it is always less than a.
-	      return (new exports.Py_Int(aType)).${name}(new exports.Py_Int(bType));
+	      return (exports.Py_Int.fromNumber(aType)).${name}(exports.Py_Int.fromNumber(bType));
       } else if (typeDiff > 0) {
         // a is wider than b
         b = widenTo(b, aType);
@@ -364,19 +420,54 @@ function generateCmpOp(name: string): (b: IPy_Number) => IPy_Number {
   })()`);
 }
 
+// Like CPython, we preallocate the integers in [-5, 256]; Py_Int.fromNumber hands
+// out these shared instances instead of allocating new ones.
+const SMALL_INT_MIN = -5;
+const SMALL_INT_MAX = 256;
+var smallInts: Py_Int[] = [];
+
+// Integers beyond this magnitude are not exactly representable as JS numbers,
+// and are promoted to Py_Long.
+const MAX_SAFE_INT = 9007199254740991;
+function isSafeInt(n: number): boolean {
+    return n <= MAX_SAFE_INT && n >= -MAX_SAFE_INT;
+}
+
+// Numbers that compare equal must hash equally, whatever their type.
+// Integral values hash to their low 32 bits; like strings, they avoid -1.
+function hashIntegral(n: number): number {
+    var h = n | 0;
+    return h === -1 ? -2 : h;
+}
+
 // Py_Int represents the Python Integer class. Integers are marshalled as 32 and
 // 64 bit integers, but they are handled as 64 bit ints. This class follows the
-// latter design by quietly handling the small ints.
+// latter design by quietly handling the small ints. Operations whose results
+// do not fit in a JS number promote to Py_Long.
+// Use Py_Int.fromNumber rather than the constructor to create integers.
 export class Py_Int extends Py_Object implements IPy_Number {
     protected value: number;
     constructor(val: number) {
         super();
         this.value = val;
     }
+    public static fromNumber(val: number): Py_Int {
+        if (val >= SMALL_INT_MIN && val <= SMALL_INT_MAX) {
+            var inst = smallInts[val - SMALL_INT_MIN];
+            // Undefined for non-integral values.
+            if (inst !== undefined) {
+                return inst;
+            }
+        }
+        return new Py_Int(val);
+    }
 
     getType(): Py_Type { return Py_Type.INT; }
+    hash(): number {
+      return hashIntegral(this.value);
+    }
     asLong(): Py_Long {
-      return new Py_Long(new Decimal(this.value));
+      return Py_Long.fromNumber(this.value);
     }
     asFloat(): Py_Float {
       return new Py_Float(this.value);
@@ -385,14 +476,26 @@ export class Py_Int extends Py_Object implements IPy_Number {
       return new Py_Complex(this.asFloat(), new Py_Float(0));
     }
 
-    // The following are very self explanatory.
-    add(t: Thread, other: Py_Int): Py_Int { return new Py_Int((this.value + other.value) | 0); }
-    sub(t: Thread, other: Py_Int): Py_Int { return new Py_Int((this.value - other.value) | 0); }
-    mul(t: Thread, other: Py_Int): Py_Int { return new Py_Int((this.value * other.value) | 0); }
+    // The following are very self explanatory. Results that don't fit are
+    // recomputed exactly as longs.
+    add(t: Thread, other: Py_Int): Py_Int | Py_Long {
+      var res = this.value + other.value;
+      return isSafeInt(res) ? Py_Int.fromNumber(res) : this.asLong().add(t, other.asLong());
+    }
+    sub(t: Thread, other: Py_Int): Py_Int | Py_Long {
+      var res = this.value - other.value;
+      return isSafeInt(res) ? Py_Int.fromNumber(res) : this.asLong().sub(t, other.asLong());
+    }
+    mul(t: Thread, other: Py_Int): Py_Int | Py_Long {
+      var res = this.value * other.value;
+      return isSafeInt(res) ? Py_Int.fromNumber(res) : this.asLong().mul(t, other.asLong());
+    }
     floordiv(t: Thread, other: Py_Int): Py_Int {
-      if (other.value === 0)
+      var a = this.value, b = other.value;
+      if (b === 0)
         throwZeroDivisionError(t);
-      return new Py_Int((this.value / other.value) | 0);
+      // Exact, unlike Math.floor(a / b).
+      return Py_Int.fromNumber((a - pyMod(a, b)) / b);
     }
 
     // Future division is always in effect
@@ -410,48 +513,83 @@ export class Py_Int extends Py_Object implements IPy_Number {
     // 2. a == (a // b) * b + (a % b)
     // These are useful for defining modulo for different types though
     mod(t: Thread, other: Py_Int): Py_Int {
-      var a = this.value, b = other.value;
-      if (b === 0)
+      if (other.value === 0)
         throwZeroDivisionError(t);
-      var res = (a - (b * Math.floor(a / b))) | 0;
-      return new Py_Int(res);
+      return Py_Int.fromNumber(pyMod(this.value, other.value));
     }
 
     divmod(t: Thread, other: Py_Int): _collections.Py_Tuple {
         return new collections.Py_Tuple([this.floordiv(t, other), this.mod(t, other)]);
     }
 
-    pow(t: Thread, other: Py_Int): Py_Float | Py_Int {
-      var res = Math.pow(this.value, other.value);
-      if ((res|0) != res) {
-        return new Py_Float(res);
+    // Exponentiation by squaring, switching to longs on overflow. Negative
+    // exponents produce floats.
+    pow(t: Thread, other: Py_Int): Py_Float | Py_Int | Py_Long {
+      var base = this.value, exp = other.value, res = 1;
+      if (exp < 0) {
+        return new Py_Float(Math.pow(base, exp));
+      }
+      while (exp > 0) {
+        if (exp % 2 === 1) {
+          res *= base;
+        }
+        exp = Math.floor(exp / 2);
+        if (exp > 0) {
+          base *= base;
+        }
+        if (!isSafeInt(res) || !isSafeInt(base)) {
+          return this.asLong().pow(t, other.asLong());
+        }
       }
-      return new Py_Int(res | 0);
+      return Py_Int.fromNumber(res);
     }
 
-    lshift(t: Thread, other: Py_Int): Py_Int {
-      return new Py_Int(this.value << other.value);
+    lshift(t: Thread, other: Py_Int): Py_Int | Py_Long {
+      if (other.value < 0) {
+        throwNegativeShiftCount(t);
+        return Py_Int.fromNumber(0);
+      }
+      var res = this.value * Math.pow(2, other.value);
+      return isSafeInt(res) ? Py_Int.fromNumber(res) : this.asLong().lshift(t, other.asLong());
     }
 
     rshift(t: Thread, other: Py_Int): Py_Int {
-      return new Py_Int(this.value >> other.value);
+      if (other.value < 0) {
+        throwNegativeShiftCount(t);
+        return Py_Int.fromNumber(0);
+      }
+      return Py_Int.fromNumber(Math.floor(this.value / Math.pow(2, other.value)));
     }
 
+    // JS bitwise operators only work on 32 bits; wider ints go through BigInt.
+    // The result always fits in an int.
     and(t: Thread, other: Py_Int): Py_Int {
-      return new Py_Int(this.value & other.value);
+      var a = this.value, b = other.value;
+      if ((a | 0) === a && (b | 0) === b) {
+        return Py_Int.fromNumber(a & b);
+      }
+      return Py_Int.fromNumber(this.asLong().and(t, other.asLong()).toNumber());
     }
 
     xor(t: Thread, other: Py_Int): Py_Int {
-      return new Py_Int(this.value ^ other.value);
+      var a = this.value, b = other.value;
+      if ((a | 0) === a && (b | 0) === b) {
+        return Py_Int.fromNumber(a ^ b);
+      }
+      return Py_Int.fromNumber(this.asLong().xor(t, other.asLong()).toNumber());
     }
 
     or(t: Thread, other: Py_Int): Py_Int {
-      return new Py_Int(this.value | other.value);
+      var a = this.value, b = other.value;
+      if ((a | 0) === a && (b | 0) === b) {
+        return Py_Int.fromNumber(a | b);
+      }
+      return Py_Int.fromNumber(this.asLong().or(t, other.asLong()).toNumber());
     }
 
     // Negation is obvious and simple.
     __neg__(t: Thread): Py_Int {
-      return new Py_Int((this.value * -1) | 0);
+      return Py_Int.fromNumber(-this.value);
     }
 
     // Apparently unary plus doesn't really do much.
@@ -468,7 +606,7 @@ export class Py_Int extends Py_Object implements IPy_Number {
     }
 
     __invert__(t: Thread): Py_Int {
-      return new Py_Int(~this.value);
+      return Py_Int.fromNumber(-this.value - 1);
     }
 
     lt(other: Py_Int): Py_Boolean {
@@ -503,6 +641,10 @@ export class Py_Int extends Py_Object implements IPy_Number {
     }
 }
 
+for (var n = SMALL_INT_MIN; n <= SMALL_INT_MAX; n++) {
+  smallInts.push(new Py_Int(n));
+}
+
 class Py_Boolean extends Py_Int {
   constructor(val: boolean) {
     super(val ? 1 : 0);
@@ -519,132 +661,175 @@ class Py_Boolean extends Py_Int {
 export const True = new Py_Boolean(true);
 export const False = new Py_Boolean(false);
 
-const MAX_INT = new Decimal('9007199254740991');
-const MIN_INT = new Decimal('-9007199254740991');
+// Py_Long is backed by the engine's native arbitrary-precision integers
+// (BigInt). TypeScript doesn't know about BigInt, so values are typed as any,
+// and BigInt constants are built with big() rather than written as literals.
+const big: (val: number | string) => any = (<any> global).BigInt;
+const BIG_ZERO = big(0);
+const BIG_ONE = big(1);
+const BIG_MAX_INT = big(MAX_SAFE_INT);
+const BIG_MIN_INT = big(-MAX_SAFE_INT);
 
 export class Py_Long extends Py_Object implements IPy_Number {
-    value: decimal.Decimal;
-    constructor(val: decimal.Decimal) {
+    // A native BigInt.
+    value: any;
+    constructor(val: any) {
         super();
         this.value = val;
     }
 
     getType(): Py_Type { return Py_Type.LONG; }
+    hash(): number {
+      return hashIntegral(Number((<any> big).asIntN(32, this.value)));
+    }
     asLong(): Py_Long {
       return this;
     }
     asFloat(): Py_Float {
-      return new Py_Float(this.value.toNumber());
+      return new Py_Float(Number(this.value));
     }
     asComplex(): Py_Complex {
       return new Py_Complex(this.asFloat(), new Py_Float(0));
     }
 
     // Long is a step above integer in the hierarchy. They represent
-    // arbitrary-precision decimal numbers.
+    // arbitrary-precision integers. n must be integral.
     static fromNumber(n: number) {
-        var d = new Decimal(n);
-        return new Py_Long(d);
+        return new Py_Long(big(n));
     }
 
-    // fromString allows us to leverage the power of the underlying Decimal
-    // class to easily convert from Py_Int to Py_Long.
+    // Parses a (decimal) string of digits.
     static fromString(s: string) {
-        var d = new Decimal(s);
-        return new Py_Long(d);
+        return new Py_Long(big(s));
+    }
+
+    // Builds a long from the digits of its magnitude in base 2**bitsPerDigit,
+    // least significant first, as in the marshal format. Digits are combined
+    // into JS numbers of up to 48 bits before touching BigInts.
+    static fromDigits(digits: number[], bitsPerDigit: number, negative: boolean): Py_Long {
+        var perChunk = Math.floor(48 / bitsPerDigit),
+          base = Math.pow(2, bitsPerDigit),
+          value = BIG_ZERO,
+          i = digits.length, j: number, count: number, chunk: number;
+        while (i > 0) {
+          count = Math.min(perChunk, i);
+          chunk = 0;
+          for (j = i - 1; j >= i - count; j--) {
+            chunk = chunk * base + digits[j];
+          }
+          value = (value << big(count * bitsPerDigit)) + big(chunk);
+          i -= count;
+        }
+        return new Py_Long(negative ? -value : value);
     }
 
     // The following should be self explanatary, to an extent.
     add(t: Thread, other: Py_Long): Py_Long {
-      return new Py_Long(this.value.plus(other.value));
+      return new Py_Long(this.value + other.value);
     }
 
     sub(t: Thread, other: Py_Long): Py_Long {
-      return new Py_Long(this.value.minus(other.value));
+      return new Py_Long(this.value - other.value);
     }
 
     mul(t: Thread, other: Py_Long): Py_Long {
-      return new Py_Long(this.value.times(other.value));
+      return new Py_Long(this.value * other.value);
     }
 
-    // Note: The Decimal type DOES have a divideToInteger function. In Python,
-    // the floor division operator always rounds towards negative infinity.
-    // Therefore, the slightly longer div(...).floor() method chain should be
-    // used.
+    // BigInt division truncates towards zero. In Python, the floor division
+    // operator always rounds towards negative infinity, so quotients of
+    // operands with different signs are adjusted downwards.
     floordiv(t: Thread, other: Py_Long): Py_Long {
-      if (other.value.isZero())
+      var a = this.value, b = other.value, q: any;
+      if (b === BIG_ZERO)
         throwZeroDivisionError(t);
-      return new Py_Long(this.value.div(other.value).floor());
+      q = a / b;
+      if (a % b !== BIG_ZERO && (a < BIG_ZERO) !== (b < BIG_ZERO)) {
+        q -= BIG_ONE;
+      }
+      return new Py_Long(q);
     }
 
     // True division, always.
-    div(t: Thread, other: Py_Long): Py_Long {
+    div(t: Thread, other: Py_Long): Py_Float {
         return this.truediv(t, other);
     }
 
-    truediv(t: Thread, other: Py_Long): Py_Long {
-      if (other.value.isZero())
+    truediv(t: Thread, other: Py_Long): Py_Float {
+      if (other.value === BIG_ZERO)
         throwZeroDivisionError(t);
-      return new Py_Long(this.value.div(other.value));
+      return this.asFloat().truediv(t, other.asFloat());
     }
 
     // As stated previously, Python's unusual mod rules come into play here.
     // (a % b) has b's sign, and a == (a // b) * b + (a % b)
     mod(t: Thread, other: Py_Long): Py_Long {
-      if (other.value.isZero())
+      var b = other.value, r: any;
+      if (b === BIG_ZERO)
         throwZeroDivisionError(t);
-      return this.sub(t,other.mul(t, this.floordiv(t, other)));
+      r = this.value % b;
+      if (r !== BIG_ZERO && (r < BIG_ZERO) !== (b < BIG_ZERO)) {
+        r += b;
+      }
+      return new Py_Long(r);
     }
 
     divmod(t: Thread, other: Py_Long): _collections.Py_Tuple {
       return new collections.Py_Tuple([this.floordiv(t, other), this.mod(t, other)]);
     }
 
-    // Thankfully, Decimal has a toPower function.
-    pow(t: Thread, other: Py_Long): Py_Long {
-      return new Py_Long(this.value.toPower(other.value));
+    // Exponentiation by squaring. Negative exponents produce floats.
+    pow(t: Thread, other: Py_Long): Py_Long | Py_Float {
+      var base = this.value, exp = other.value, res = BIG_ONE;
+      if (exp < BIG_ZERO) {
+        return this.asFloat().pow(t, other.asFloat());
+      }
+      while (exp > BIG_ZERO) {
+        if ((exp & BIG_ONE) === BIG_ONE) {
+          res *= base;
+        }
+        exp >>= BIG_ONE;
+        if (exp > BIG_ZERO) {
+          base *= base;
+        }
+      }
+      return new Py_Long(res);
     }
 
-    // These are a bitty "hacky" but they get the job done.
+    // BigInt shifts and bitwise operators use two's complement semantics for
+    // negative numbers, like Python's.
     lshift(t: Thread, other: Py_Long): Py_Long {
-      return new Py_Long(this.value.times(Decimal.pow(2, other.value)));
+      if (other.value < BIG_ZERO) {
+        throwNegativeShiftCount(t);
+        return new Py_Long(BIG_ZERO);
+      }
+      return new Py_Long(this.value << other.value);
     }
 
     rshift(t: Thread, other: Py_Long): Py_Long {
-      return new Py_Long(this.value.divToInt(Decimal.pow(2, other.value)));
+      if (other.value < BIG_ZERO) {
+        throwNegativeShiftCount(t);
+        return new Py_Long(BIG_ZERO);
+      }
+      return new Py_Long(this.value >> other.value);
     }
 
-    // And, Xor and Or require messing with the guts of Decimal
-    // Totally doable, but for now, not implemented
-    // Future reference: Decimal's 'c' field is number[] (array of digits)
-    // res[i] = a[i] | b[i]
-    // But might need to treat negative numbers differently?
     and(t: Thread, other: Py_Long): Py_Long {
-      if (this.fitsInJsNumber() && other.fitsInJsNumber()) {
-        return Py_Long.fromNumber(this.toNumber() & other.toNumber());
-      }
-      throw new Error('Py_Long __and__ for wide numbers is NYI');
+      return new Py_Long(this.value & other.value);
     }
     xor(t: Thread, other: Py_Long): Py_Long {
-      if (this.fitsInJsNumber() && other.fitsInJsNumber()) {
-        return Py_Long.fromNumber(this.toNumber() ^ other.toNumber());
-      }
-      throw new Error('Py_Long __xor__ for wide numbers is NYI');
+      return new Py_Long(this.value ^ other.value);
     }
     or(t: Thread, other: Py_Long): Py_Long {
-      if (this.fitsInJsNumber() && other.fitsInJsNumber()) {
-        return Py_Long.fromNumber(this.toNumber() | other.toNumber());
-      }
-      throw new Error('Py_Long __or__ for wide numbers is NYI');
+      return new Py_Long(this.value | other.value);
     }
 
     fitsInJsNumber(): boolean {
-      return (this.value.lessThanOrEqualTo(MAX_INT) &&
-              this.value.greaterThanOrEqualTo(MIN_INT));
+      return this.value <= BIG_MAX_INT && this.value >= BIG_MIN_INT;
     }
 
     __neg__(t: Thread): Py_Long {
-        return this.mul(t, Py_Long.fromString("-1"));
+        return new Py_Long(-this.value);
     }
 
     __pos__(t: Thread): Py_Long {
@@ -652,34 +837,33 @@ export class Py_Long extends Py_Object implements IPy_Number {
     }
 
     __abs__(t: Thread): Py_Long {
-        if (this.value.isNegative())
+        if (this.value < BIG_ZERO)
             return this.__neg__(t);
         else
             return this;
     }
 
-    // ~x = (-x) - 1 for integers, so we emulate that here
     __invert__(t: Thread): Py_Long {
-        return this.__neg__(t).sub(t, Py_Long.fromString("1"));
+        return new Py_Long(~this.value);
     }
 
     lt(other: Py_Long): Py_Boolean {
-      return this.value.lessThan(other.value) ? True : False;
+      return this.value < other.value ? True : False;
     }
     le(other: Py_Long): Py_Boolean {
-      return this.value.lessThanOrEqualTo(other.value) ? True : False;
+      return this.value <= other.value ? True : False;
     }
     eq(other: Py_Long): Py_Boolean {
-      return this.value.equals(other.value) ? True : False;
+      return this.value === other.value ? True : False;
     }
     ne(other: Py_Long): Py_Boolean {
-      return !this.value.equals(other.value) ? True : False;
+      return this.value !== other.value ? True : False;
     }
     gt(other: Py_Long): Py_Boolean {
-      return this.value.greaterThan(other.value) ? True : False;
+      return this.value > other.value ? True : False;
     }
     ge(other: Py_Long): Py_Boolean {
-      return this.value.greaterThanOrEqualTo(other.value) ? True : False;
+      return this.value >= other.value ? True : False;
     }
 
     toString(): string {
@@ -687,7 +871,7 @@ export class Py_Long extends Py_Object implements IPy_Number {
     }
 
     toNumber(): number {
-      return this.value.toNumber();
+      return Number(this.value);
     }
 
     __str__(): Py_Str {
@@ -695,7 +879,7 @@ export class Py_Long extends Py_Object implements IPy_Number {
     }
 
     asBool(): boolean {
-      return this.toNumber() !== 0;
+      return this.value !== BIG_ZERO;
     }
 }
 
@@ -703,6 +887,9 @@ export class Py_Long extends Py_Object implements IPy_Number {
 // Py_Float emulates the Python Floating-point numeric class. Py_Float is
 // basically a wrapper around JavaScript's numbers.
 // Note that edge cases with e.g. NaN, +/-Infinity are not really covered.
+const floatBits = new Float64Array(1);
+const floatWords = new Int32Array(floatBits.buffer);
+
 export class Py_Float extends Py_Object implements IPy_Number {
     // Public for Py_Complex
     value: number;
@@ -712,6 +899,15 @@ export class Py_Float extends Py_Object implements IPy_Number {
     }
 
     getType(): Py_Type { return Py_Type.FLOAT; }
+    hash(): number {
+      var v = this.value;
+      if (Math.floor(v) === v) {
+        return hashIntegral(v);
+      }
+      // Mix the bits of other values.
+      floatBits[0] = v;
+      return hashIntegral(floatWords[0] ^ floatWords[1]);
+    }
     asFloat(): Py_Float {
       return this;
     }
@@ -975,4 +1171,9 @@ function throwZeroDivisionError(t: Thread) {
   var f = <Py_FrameObject> t.getTopOfStack();
   var message = `integer division or modulo by zero`;
   f.raise_exception_here(t, message, "ZeroDivisionError");
+}
+
+function throwNegativeShiftCount(t: Thread) {
+  var f = <Py_FrameObject> t.getTopOfStack();
+  f.raise_exception_here(t, `negative shift count`, "ValueError");
 }
\ No newline at end of file
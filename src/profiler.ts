@@ -0,0 +1,214 @@
+import {IPy_Object} from './interfaces';
+import {Py_Object, allocationCount} from './primitives';
+import opcodes = require('./opcodes');
+import {Thread, now} from './threading';
+// !! Use only for type info !!
+import _Py_CodeObject = require('./codeobject');
+
+/**
+ * The profiler records every instruction run while it is on: how often each
+ * opcode runs, how long it takes and how many objects it allocates, and how
+ * often each function is called. Every few instructions it also samples the
+ * running thread's call stack, which gives the time spent in and under each
+ * function and a flame graph.
+ *
+ * While a profile is being recorded, frames run a copy of the bytecode loop
+ * that records each instruction; see Py_FrameObject.exec. Otherwise nothing
+ * is recorded and nothing is slowed down. With the compiler enabled,
+ * compiled code counts as the instruction it was entered at.
+ */
+
+export interface ProfilerOptions {
+    // Time between stack samples, in milliseconds of running instructions.
+    // Defaults to 1.
+    interval?: number;
+}
+
+// What is known about a function: the code objects with a given name and
+// file.
+interface FunctionStats {
+    name: string;
+    calls: number;
+    instructions: number;
+    // Sampled times, in milliseconds.
+    selfTime: number;
+    totalTime: number;
+}
+
+// Label for a function in the report and the stacks, from its name and
+// file.
+function label(name: string, filename: string): string {
+    return `${name} (${filename})`;
+}
+
+export class Profile {
+    interval: number;
+    instructions: number = 0;
+    // Milliseconds spent running instructions.
+    time: number = 0;
+    // By opcode.
+    opCounts: { [op: number]: number } = {};
+    opTimes: { [op: number]: number } = {};
+    opAllocations: { [op: number]: number } = {};
+    // Objects allocated by instructions, by type. Objects an instruction
+    // allocates but doesn't leave on top of the stack count as "other".
+    typeAllocations: { [type: string]: number } = {};
+    functions: { [label: string]: FunctionStats } = {};
+    // Sampled milliseconds, by call stack in the "folded" format flame graph
+    // tools read: function labels from the outermost call in, separated by
+    // semicolons.
+    stacks: { [stack: string]: number } = {};
+    // Clock and allocation count at the end of the last instruction.
+    private last: number;
+    private allocated: number;
+    private sinceSample: number = 0;
+
+    constructor(options: ProfilerOptions) {
+        this.interval = options.interval !== undefined ? options.interval : 1;
+    }
+
+    // Starts timing from now, as the bytecode loop is entered; time between
+    // loops is spent waiting for the scheduler or native code.
+    resume(): void {
+        this.last = now();
+        this.allocated = allocationCount();
+    }
+
+    // Records instruction i of code, which just ran on thread t and left
+    // stack behind.
+    instruction(code: _Py_CodeObject, i: number, stack: IPy_Object[], t: Thread): void {
+        var time = now(),
+            elapsed = time - this.last,
+            allocated = allocationCount(),
+            op = code.ops[i],
+            fresh = allocated - this.allocated,
+            top = stack[stack.length - 1],
+            stats: FunctionStats, type: string;
+        this.instructions++;
+        this.time += elapsed;
+        this.opCounts[op] = (this.opCounts[op] | 0) + 1;
+        this.opTimes[op] = (this.opTimes[op] || 0) + elapsed;
+        if (fresh > 0) {
+            this.opAllocations[op] = (this.opAllocations[op] | 0) + fresh;
+            // Py_Object numbers objects as they are created.
+            if (top instanceof Py_Object && (<any> top)._ref >= this.allocated) {
+                type = (<any> top).constructor.name;
+                this.typeAllocations[type] = (this.typeAllocations[type] | 0) + 1;
+                fresh--;
+            }
+            this.typeAllocations['other'] = (this.typeAllocations['other'] | 0) + fresh;
+        }
+        stats = this.getFunction(code.name.toString(), code.filename.toString());
+        stats.instructions++;
+        if (i === 0) {
+            stats.calls++;
+        }
+        this.sinceSample += elapsed;
+        if (this.sinceSample >= this.interval) {
+            this.sample(t);
+        }
+        // Leave the profiler's own time out.
+        this.last = now();
+        this.allocated = allocationCount();
+    }
+
+    private getFunction(name: string, filename: string): FunctionStats {
+        var key = label(name, filename),
+            stats = this.functions[key];
+        if (stats === undefined) {
+            stats = this.functions[key] = { name: key, calls: 0, instructions: 0, selfTime: 0, totalTime: 0 };
+        }
+        return stats;
+    }
+
+    // Charges the time since the last sample to t's current call stack.
+    private sample(t: Thread): void {
+        var trace = t.getStackTrace(),
+            weight = this.sinceSample,
+            labels: string[] = [],
+            seen: { [label: string]: boolean } = {},
+            key: string, i: number;
+        this.sinceSample = 0;
+        if (trace.length === 0) {
+            return;
+        }
+        // The trace starts at the innermost call.
+        for (i = trace.length - 1; i >= 0; i--) {
+            key = label(trace[i][1], trace[i][3]);
+            labels.push(key);
+            if (!seen[key]) {
+                seen[key] = true;
+                this.getFunction(trace[i][1], trace[i][3]).totalTime += weight;
+            }
+        }
+        this.getFunction(trace[0][1], trace[0][3]).selfTime += weight;
+        key = labels.join(';');
+        this.stacks[key] = (this.stacks[key] || 0) + weight;
+    }
+
+    // Returns the profile as a table of functions, then one of opcodes, then
+    // one of allocations.
+    report(): string {
+        var lines: string[] = [],
+            functions = Object.keys(this.functions).map((key: string) => this.functions[key]),
+            ops = Object.keys(this.opCounts).map((key: string) => parseInt(key, 10)),
+            types = Object.keys(this.typeAllocations),
+            pad = (x: any, width: number) => {
+                var s = String(x);
+                while (s.length < width) {
+                    s = ' ' + s;
+                }
+                return s;
+            },
+            ms = (x: number) => x.toFixed(3);
+        lines.push(`${this.instructions} instructions in ${ms(this.time)} ms`);
+        lines.push('');
+        lines.push(`Functions, by total time (times sampled every ${this.interval} ms):`);
+        lines.push(`${pad('calls', 10)} ${pad('instructions', 14)} ${pad('self ms', 12)} ${pad('total ms', 12)}  function`);
+        functions.sort((a, b) => b.totalTime - a.totalTime || b.instructions - a.instructions);
+        functions.forEach((stats: FunctionStats) => {
+            lines.push(`${pad(stats.calls, 10)} ${pad(stats.instructions, 14)} ${pad(ms(stats.selfTime), 12)} ` +
+                `${pad(ms(stats.totalTime), 12)}  ${stats.name}`);
+        });
+        lines.push('');
+        lines.push('Opcodes, by time:');
+        lines.push(`${pad('count', 10)} ${pad('ms', 12)} ${pad('allocations', 12)}  opcode`);
+        ops.sort((a, b) => this.opTimes[b] - this.opTimes[a]);
+        ops.forEach((op: number) => {
+            lines.push(`${pad(this.opCounts[op], 10)} ${pad(ms(this.opTimes[op]), 12)} ` +
+                `${pad(this.opAllocations[op] | 0, 12)}  ${opcodes[op]}`);
+        });
+        lines.push('');
+        lines.push('Allocations, by type:');
+        types.sort((a, b) => this.typeAllocations[b] - this.typeAllocations[a]);
+        types.forEach((type: string) => {
+            lines.push(`${pad(this.typeAllocations[type], 10)}  ${type}`);
+        });
+        return lines.join('\n') + '\n';
+    }
+
+    // Returns the sampled call stacks, one per line, in the folded format
+    // of flamegraph.pl and speedscope, with times in microseconds.
+    foldedStacks(): string {
+        return Object.keys(this.stacks).map((stack: string) =>
+            `${stack} ${Math.round(this.stacks[stack] * 1000)}\n`).join('');
+    }
+}
+
+var active: Profile = null;
+
+// Starts recording a new profile of all code run from now on, and returns
+// it.
+export function start(options: ProfilerOptions = {}): Profile {
+    active = new Profile(options);
+    return active;
+}
+
+export function stop(): void {
+    active = null;
+}
+
+// The profile being recorded, or null.
+export function current(): Profile {
+    return active;
+}
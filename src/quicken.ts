@@ -0,0 +1,258 @@
+import {IPy_Object} from './interfaces';
+import {Py_Int, Py_Float, Py_Str} from './primitives';
+import {Py_List} from './collections';
+import {ListIterator, SequenceIterator, XRange, ReversedIterator, Enumerate} from './iterator';
+import opcodes = require('./opcodes');
+import {Thread} from './threading';
+// !! Use only for type info !!
+import _Py_FrameObject = require('./frameobject');
+// XXX: hack around name resolution in eval'd code
+var hardcoded_Py_Int = Py_Int;
+var hardcoded_Py_Float = Py_Float;
+var hardcoded_Py_Str = Py_Str;
+var hardcoded_Py_List = Py_List;
+var hardcoded_ListIterator = ListIterator;
+var hardcoded_SequenceIterator = SequenceIterator;
+var hardcoded_XRange = XRange;
+var hardcoded_ReversedIterator = ReversedIterator;
+var hardcoded_Enumerate = Enumerate;
+
+/**
+ * Quickening: instructions whose operands are usually of the same types are
+ * rewritten, in their code object's handlers, to a handler specialized for
+ * those types. The specialized handler checks the types, and does what the
+ * generic handler would do for them without looking the operation up. When
+ * the check fails, the instruction goes back to the generic handler.
+ *
+ * Per-instruction state lives in the code object; see
+ * Py_CodeObject.quickCounters.
+ */
+
+// Executions of an instruction before it is specialized.
+const WARMUP = 8;
+// Executions before trying again after the operands did not suit any
+// specialization, or after a specialized instruction saw other types.
+const BACKOFF = 1024;
+
+// A handler for an instruction, and the kind of operands it expects.
+interface Specialization {
+    kind: string;
+    handler: (f: _Py_FrameObject, t: Thread) => void;
+}
+
+// Specialized handlers by name, generated on first use.
+var generated: { [name: string]: (f: _Py_FrameObject, t: Thread) => void } = {};
+// Whether specialized handlers count their hits, which slows them down
+// considerably.
+var countHits = false;
+
+// Makes the handlers specialized from now on count their hits in
+// Py_CodeObject.quickHits.
+export function enableStats(): void {
+    if (!countHits) {
+        countHits = true;
+        generated = {};
+    }
+}
+
+/**
+ * Generates a specialized handler, for an instruction with the given
+ * number of operands. The operands are a and b, top of the stack last (b
+ * is free for use if there is one operand), and are left on the stack for
+ * action to replace.
+ */
+function generate(name: string, operands: number, guard: string, action: string): Specialization {
+    var handler = generated[name];
+    if (handler === undefined) {
+        handler = generated[name] = eval(`
+function ${name}(f, t) {
+    var stack = f.stack, n = stack.length, ${operands === 2 ? 'a = stack[n - 2], b = stack[n - 1]' : 'a = stack[n - 1], b'};
+    if (${guard}) {
+        ${countHits ? 'f.codeObj.quickHits[f.lastInst]++;' : ''}
+        ${action}
+    } else {
+        deoptimize(f, t, ${name});
+    }
+}
+${name}`); // <-- Last statement w/o semicolon is return value of eval.
+    }
+    return { kind: name.slice(name.lastIndexOf('$') + 1), handler: handler };
+}
+
+// Types with specialized arithmetic, by kind.
+const numberTypes: { [kind: string]: Function } = { 'int': Py_Int, 'float': Py_Float };
+
+/**
+ * Specializes a binary operation, implemented by the given method of ints
+ * and floats. Strings are specialized for concatenation, and lists for
+ * indexing by ints.
+ */
+function binaryOp(op: number, funcName: string): (a: IPy_Object, b: IPy_Object, arg: number) => Specialization {
+    var name = opcodes[op];
+    return function(a: IPy_Object, b: IPy_Object, arg: number): Specialization {
+        for (var kind in numberTypes) {
+            var type = numberTypes[kind];
+            if (a.constructor === type && b.constructor === type && type.prototype[funcName] !== undefined) {
+                // What generateBinaryOp does for ints, and the __op__ methods
+                // of numbers do for operands of the same type.
+                return generate(`${name}$${kind}`, 2,
+                    `a.constructor === hardcoded_Py_${kind === 'int' ? 'Int' : 'Float'} && b.constructor === a.constructor`,
+                    `stack.pop(); stack.pop(); stack.push(a.${funcName}(t, b));`);
+            }
+        }
+        if (funcName === 'add' && a.constructor === Py_Str && b.constructor === Py_Str) {
+            return generate(`${name}$str`, 2,
+                `a.constructor === hardcoded_Py_Str && b.constructor === hardcoded_Py_Str`,
+                `stack.pop(); stack.pop(); stack.push(a.__add__(t, b));`);
+        }
+        if (funcName === 'getitem' && a.constructor === Py_List && b.constructor === Py_Int) {
+            return generate(`${name}$list_int`, 2,
+                `a.constructor === hardcoded_Py_List && b.constructor === hardcoded_Py_Int`,
+                `stack.pop(); stack.pop(); stack.push(a.__getitem__(t, b));`);
+        }
+        return null;
+    };
+}
+
+// Methods used by COMPARE_OP for its rich comparisons, by argument: those
+// of ints, then those that doCmpOp calls for other types.
+const intComparisons = ['lt', 'le', 'eq', 'ne', 'gt', 'ge'];
+const comparisonMethods = ['__lt__', '__le__', '__eq__', '__ne__', '__gt__', '__ge__'];
+
+function compareOp(a: IPy_Object, b: IPy_Object, arg: number): Specialization {
+    if (arg >= intComparisons.length) {
+        return null;
+    }
+    var name = `COMPARE_${intComparisons[arg].toUpperCase()}`, method = comparisonMethods[arg];
+    if (a.constructor === Py_Int && b.constructor === Py_Int) {
+        return generate(`${name}$int`, 2,
+            `a.constructor === hardcoded_Py_Int && b.constructor === hardcoded_Py_Int`,
+            `stack.pop(); stack.pop(); stack.push(a.${intComparisons[arg]}(b));`);
+    }
+    if (a.constructor === Py_Float && b.constructor === Py_Float && (<any> Py_Float.prototype)[method] !== undefined) {
+        return generate(`${name}$float`, 2,
+            `a.constructor === hardcoded_Py_Float && b.constructor === hardcoded_Py_Float`,
+            `stack.pop(); stack.pop(); stack.push(a.${intComparisons[arg]}(b));`);
+    }
+    if (a.constructor === Py_Str && b.constructor === Py_Str && (<any> Py_Str.prototype)[method] !== undefined) {
+        return generate(`${name}$str`, 2,
+            `a.constructor === hardcoded_Py_Str && b.constructor === hardcoded_Py_Str`,
+            `stack.pop(); stack.pop(); stack.push(a.${method}(b));`);
+    }
+    return null;
+}
+
+// Iterators that FOR_ITER can advance without checking for __next__, by
+// class name.
+const nativeIterators: { [name: string]: Function } = {
+    'ListIterator': ListIterator, 'SequenceIterator': SequenceIterator, 'XRange': XRange,
+    'ReversedIterator': ReversedIterator, 'Enumerate': Enumerate
+};
+
+function forIter(a: IPy_Object, b: IPy_Object, arg: number): Specialization {
+    for (var name in nativeIterators) {
+        if (a.constructor === nativeIterators[name]) {
+            return generate(`FOR_ITER$${name}`, 1,
+                `a.constructor === hardcoded_${name}`,
+                `if ((b = a.next()) != null) { stack.push(b); } else { stack.pop(); f.lastInst = f.getArg() - 1; }`);
+        }
+    }
+    return null;
+}
+
+// Picks a specialization for an instruction given its operands (a, or a
+// and b with b on top of the stack) and argument, or returns null.
+const specializers: { [op: number]: (a: IPy_Object, b: IPy_Object, arg: number) => Specialization } = {};
+[['pow', opcodes.BINARY_POWER, opcodes.INPLACE_POWER],
+ ['mul', opcodes.BINARY_MULTIPLY, opcodes.INPLACE_MULTIPLY],
+ ['div', opcodes.BINARY_DIVIDE, opcodes.INPLACE_DIVIDE],
+ ['mod', opcodes.BINARY_MODULO, opcodes.INPLACE_MODULO],
+ ['add', opcodes.BINARY_ADD, opcodes.INPLACE_ADD],
+ ['sub', opcodes.BINARY_SUBTRACT, opcodes.INPLACE_SUBTRACT],
+ ['floordiv', opcodes.BINARY_FLOOR_DIVIDE, opcodes.INPLACE_FLOOR_DIVIDE],
+ ['truediv', opcodes.BINARY_TRUE_DIVIDE, opcodes.INPLACE_TRUE_DIVIDE],
+ ['lshift', opcodes.BINARY_LSHIFT, opcodes.INPLACE_LSHIFT],
+ ['rshift', opcodes.BINARY_RSHIFT, opcodes.INPLACE_RSHIFT],
+ ['and', opcodes.BINARY_AND, opcodes.INPLACE_AND],
+ ['xor', opcodes.BINARY_XOR, opcodes.INPLACE_XOR],
+ ['or', opcodes.BINARY_OR, opcodes.INPLACE_OR],
+ ['getitem', opcodes.BINARY_SUBSCR]
+].forEach((entry: any[]) => {
+    for (var i = 1; i < entry.length; i++) {
+        specializers[entry[i]] = binaryOp(entry[i], entry[0]);
+    }
+});
+specializers[opcodes.COMPARE_OP] = compareOp;
+specializers[opcodes.FOR_ITER] = forIter;
+
+// The adaptive handler of each opcode that can be specialized.
+const adaptiveHandlers: { [op: number]: (f: _Py_FrameObject, t: Thread) => void } = {};
+
+export function canSpecialize(op: number): boolean {
+    return specializers[op] !== undefined;
+}
+
+/**
+ * Wraps the generic handler for an opcode that can be specialized. The
+ * wrapper counts executions of each instruction, and after a few of them
+ * installs a specialized handler for the operand types it finds.
+ */
+export function adaptive(op: number, generic: (f: _Py_FrameObject, t: Thread) => void): (f: _Py_FrameObject, t: Thread) => void {
+    var handler = function(f: _Py_FrameObject, t: Thread) {
+        var code = f.codeObj, i = f.lastInst;
+        if (--code.quickCounters[i] === 0) {
+            specialize(f, i, handler);
+        }
+        generic(f, t);
+    };
+    adaptiveHandlers[op] = handler;
+    return handler;
+}
+
+function specialize(f: _Py_FrameObject, i: number, handler: (f: _Py_FrameObject, t: Thread) => void): void {
+    var code = f.codeObj,
+        stack = f.stack,
+        op = code.ops[i],
+        spec = op === opcodes.FOR_ITER ?
+            specializers[op](stack[stack.length - 1], null, code.args[i]) :
+            specializers[op](stack[stack.length - 2], stack[stack.length - 1], code.args[i]);
+    code.quickCounters[i] = BACKOFF;
+    if (spec === null) {
+        return;
+    }
+    // The instruction's handler may have been replaced by compiled code,
+    // which runs it by its entry in compiledHandlers instead.
+    if (code.handlers[i] === handler) {
+        code.handlers[i] = spec.handler;
+        code.quickKinds[i] = spec.kind;
+    }
+    if (code.compiledHandlers !== null && code.compiledHandlers[i] === handler) {
+        code.compiledHandlers[i] = spec.handler;
+        code.quickKinds[i] = spec.kind;
+    }
+}
+
+// Puts a specialized instruction whose operands failed the type check of
+// its handler, specialized, back on its adaptive handler, and runs that.
+function deoptimize(f: _Py_FrameObject, t: Thread, specialized: (f: _Py_FrameObject, t: Thread) => void): void {
+    var code = f.codeObj,
+        i = f.lastInst,
+        handler = adaptiveHandlers[code.ops[i]];
+    code.quickMisses[i]++;
+    code.quickCounters[i] = BACKOFF;
+    if (code.handlers[i] === specialized) {
+        code.handlers[i] = handler;
+    }
+    if (code.compiledHandlers !== null && code.compiledHandlers[i] === specialized) {
+        code.compiledHandlers[i] = handler;
+    }
+    handler(f, t);
+}
+
+// Sets up the counters of a freshly decoded code object; see
+// Py_CodeObject.quickCounters.
+export function initCounters(counters: Int32Array): void {
+    for (var i = 0; i < counters.length; i++) {
+        counters[i] = WARMUP;
+    }
+}
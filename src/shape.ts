@@ -0,0 +1,124 @@
+import {IPy_Object} from './interfaces';
+import {Py_Dict} from './collections';
+
+// Instances with more attributes than this are switched to dictionary mode.
+const MAX_SLOTS = 64;
+
+/**
+ * Shapes (also known as hidden classes) describe the attribute layout of
+ * class instances.
+ *
+ * Instances of user-defined classes start out with the empty shape and no
+ * attributes. They keep their attributes in a `slots` array, and their shape
+ * records which attribute lives in which slot. Adding an attribute moves the
+ * instance to the next shape along a transition, so instances that gain the
+ * same attributes in the same order end up sharing one shape. This lets the
+ * LOAD_ATTR and STORE_ATTR opcodes cache a (shape, slot) pair per instruction.
+ *
+ * Anything that does not fit this model (a `__dict__` access, deleting an
+ * attribute, or too many attributes) switches the instance to dictionary
+ * mode. Its attributes become ordinary `$`-prefixed properties, as with every
+ * other object, and it no longer has a shape.
+ *
+ * Attribute keys carry the same `$` prefix as Py_Dict string keys.
+ */
+export class Shape {
+    // Attribute keys, in slot order.
+    public keys: string[];
+    // Maps attribute keys to slots.
+    private _index: { [key: string]: number } = {};
+    // Shapes reached by adding one attribute to this one.
+    private _transitions: { [key: string]: Shape } = {};
+
+    constructor(keys: string[]) {
+        this.keys = keys;
+        for (var i = 0; i < keys.length; i++) {
+            this._index[keys[i]] = i;
+        }
+    }
+
+    // Returns the slot holding key, or -1.
+    public slotOf(key: string): number {
+        var slot = this._index[key];
+        return slot === undefined ? -1 : slot;
+    }
+
+    // Returns the shape with key added, or null if it would be too large.
+    public withKey(key: string): Shape {
+        var next = this._transitions[key];
+        if (next === undefined) {
+            next = this.keys.length < MAX_SLOTS ? new Shape(this.keys.concat(key)) : null;
+            this._transitions[key] = next;
+        }
+        return next;
+    }
+}
+
+export const emptyShape = new Shape([]);
+
+// Prepares a new class instance for slot storage.
+export function initSlots(obj: any): void {
+    obj.shape = emptyShape;
+    obj.slots = [];
+}
+
+// Returns the slot holding key on obj, or -1 if obj has no such slot.
+export function slotOf(obj: any, key: string): number {
+    var shape: Shape = obj.shape;
+    return shape ? shape.slotOf(key) : -1;
+}
+
+// Moves an instance's attributes into ordinary properties.
+function toDictMode(obj: any): void {
+    var keys = (<Shape> obj.shape).keys,
+        slots: IPy_Object[] = obj.slots;
+    for (var i = 0; i < keys.length; i++) {
+        obj[keys[i]] = slots[i];
+    }
+    delete obj.shape;
+    delete obj.slots;
+    obj.$__dict__ = new Py_Dict(obj);
+}
+
+export function getAttr(obj: any, key: string): IPy_Object {
+    var slot = slotOf(obj, key);
+    if (slot >= 0) {
+        return obj.slots[slot];
+    }
+    if (obj.shape && key === '$__dict__') {
+        toDictMode(obj);
+    }
+    return obj[key];
+}
+
+export function setAttr(obj: any, key: string, val: IPy_Object): void {
+    var shape: Shape = obj.shape, slot: number;
+    if (shape) {
+        slot = shape.slotOf(key);
+        if (slot < 0) {
+            shape = shape.withKey(key);
+            if (shape === null) {
+                toDictMode(obj);
+                obj[key] = val;
+                return;
+            }
+            obj.shape = shape;
+            slot = shape.keys.length - 1;
+        }
+        obj.slots[slot] = val;
+    } else {
+        obj[key] = val;
+    }
+}
+
+export function delAttr(obj: any, key: string): void {
+    if (obj.shape) {
+        toDictMode(obj);
+    }
+    delete obj[key];
+}
+
+// Attributes found on the prototype, such as methods, count too.
+export function hasAttr(obj: any, key: string): boolean {
+    return slotOf(obj, key) >= 0 || obj[key] !== undefined;
+}
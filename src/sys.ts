@@ -7,6 +7,8 @@ import fs = require('fs');
 import {Thread} from './threading';
 import {Py_Thread} from './thread';
 import {Py_Traceback} from './traceback';
+import {ModuleResolver} from './importer';
+import {OutputDevice} from './output';
 
 /**
  * Implements the builtin sys module.
@@ -29,9 +31,14 @@ class Py_Sys extends Py_Object implements IPy_Object {
     $exitfunc = None;
     $argv: Py_List;
     $warnoptions = new Py_List([]);
+    // Finds and loads modules for __import__.
+    resolver: ModuleResolver = new ModuleResolver(this);
+    // Where print statements and tracebacks go.
+    output: OutputDevice;
     
-    constructor(libPath: string, argv: string[]) {
+    constructor(libPath: string, argv: string[], output: OutputDevice) {
         super();
+        this.output = output;
         this.$argv = new Py_List(argv.map((str: string) => new Py_Str(str)));
         this.$path = new Py_List([new Py_Str(''), new Py_Str(libPath)]);
         // XXX
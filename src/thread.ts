@@ -17,14 +17,14 @@ export class Py_Thread extends Py_Object {
         // Call the function which is the first arg, and pass it the new thread object 
         (<IPy_Function> args[0]).exec(tx, f, [args[1]], kwargs);
         // Change new thread to be runnable
-        tx.rawSetStatus(ThreadStatus.RUNNABLE);
+        tx.setStatus(ThreadStatus.RUNNABLE);
         // Callback pushes the thread unique identifier on the calling frames stack
-        cb(new Py_Int(tx.id));
+        cb(Py_Int.fromNumber(tx.id));
     });
 
     // Return thread.id
     $get_ident = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
-        return new Py_Int(t.id);
+        return Py_Int.fromNumber(t.id);
     });
     
     // Return new Py_Lock object
@@ -36,8 +36,7 @@ export class Py_Thread extends Py_Object {
         // Raise KeyboardInterrupt (interrupts main thread if thrown from any other thread)
         var t_main: Thread = t.tpool.mainThread;
         var val: IPy_Object = (<any>builtins)["$KeyboardInterrupt"];
-        t_main.addToTraceback("KeyboardInterrupt");
-        t_main.throwException(val);
+        t_main.raiseException(val, "KeyboardInterrupt");
         cb(None);
     });
 
@@ -94,8 +93,7 @@ export class Py_Lock extends Py_Object {
         //Throw Thread.error if trying to release un-acquired lock
         if (this.holder === null) {
             var val: IPy_Object = (<any>builtins)["$ThreadError"];
-            t.addToTraceback("thread.error: release unlocked lock");
-            t.throwException(val);
+            t.raiseException(val, "thread.error: release unlocked lock");
         }
         else {
             this.holder = null;
@@ -14,65 +14,56 @@ import {Py_List, Py_Tuple} from './collections';
 import {Py_Str} from './primitives';
 import {Py_Traceback} from './traceback';
 
-// How responsive Ninia should aim to be, in milliseconds.
-const responsiveness: number = 1000;
+// How long Ninia may run Python code before yielding to the JavaScript event
+// loop, in milliseconds.
+const timeSlice: number = 16;
+// Instructions a thread may execute before the scheduler checks whether to
+// switch to another thread or yield.
+const instructionBudget: number = 1000;
 
-var maxMethodResumes: number = 10000,
-    // The number of method resumes until Doppio should yield again.
-    methodResumesLeft: number = maxMethodResumes,
-    // Used for the CMA.
-    numSamples: number = 1;
+declare var performance: { now(): number };
+
+// Monotonic high-resolution clock, in milliseconds.
+export const now: () => number = typeof performance !== 'undefined' ?
+    () => performance.now() :
+    () => {
+        var time = process.hrtime();
+        return time[0] * 1e3 + time[1] / 1e6;
+    };
 
 export class Thread {
     // Current state of Thread
     private status: ThreadStatus = ThreadStatus.NEW;
     private stack: IPy_FrameObj[] = [];
-    public raise_lno: number = 0;
-    public traceback: string = "";
     public codefile: string[] = [];
     public sys: Py_Sys;
     public exc: IPy_Object;
     public tpool: ThreadPool;
     public isMainThread: boolean = false;
     public id: number = -1;
-    // SETUP_EXCEPT blockstack, used to catch the StopIteration exception generated by exhausted generators inside of for loops
-    public loop_exc_block: [number,number,number,number][] = [];
     public tb: Py_Traceback = new Py_Traceback();
+    // Instructions left before the scheduler is consulted. Decremented by the
+    // bytecode loop.
+    public budget: number = instructionBudget;
 
     constructor(sys: Py_Sys, tpool: ThreadPool, id: number) {
         this.sys = sys;
         this.tpool = tpool;
         this.id = id;
     }
-    // Executes bytecode method calls
+    // Executes bytecode until the thread blocks, terminates, or is preempted.
     private run(): void {
-        var stack = this.stack,
-            startTime: number = (new Date()).getTime(),
-            endTime: number,
-            duration: number,
-            estMaxMethodResumes: number;
-
-        methodResumesLeft = maxMethodResumes;
-        // If methodResumes not exceeded, execute the Py_FrameObject
-        // else, reset the counter, suspend thread and resume thread using setImmediate
-        // Use cumulative moving average to calculate to estimate number of methodResumes in one second
+        var stack = this.stack;
         while (this.status === ThreadStatus.RUNNING && stack.length > 0) {
-            var bytecodeMethod: IPy_FrameObj = stack[stack.length - 1];
-            // Execute python bytecode methods
-            bytecodeMethod.exec(this);
-
-            // If no method resumes are left, yield to javascript event loop
-            if (--methodResumesLeft === 0) {
-                endTime = (new Date()).getTime();
-                duration = endTime - startTime;
-                // Estimated number of methods we can resume before needing to yield.
-                estMaxMethodResumes = Math.floor((maxMethodResumes / duration) * responsiveness);
-                // Update CMA.
-                maxMethodResumes = Math.floor((estMaxMethodResumes + numSamples * maxMethodResumes) / (numSamples + 1));
-                numSamples++;
-                // Yield.
-                this.setStatus(ThreadStatus.ASYNC_WAITING);
-                setImmediate(() => { this.setStatus(ThreadStatus.RUNNABLE); });
+            stack[stack.length - 1].exec(this);
+            if (this.budget <= 0) {
+                this.budget = instructionBudget;
+                if (this.status === ThreadStatus.RUNNING && this.tpool.shouldPreempt()) {
+                    // Go to the back of the run queue.
+                    this.status = ThreadStatus.RUNNABLE;
+                    this.tpool.enqueue(this);
+                    return;
+                }
             }
         }
 
@@ -92,23 +83,30 @@ export class Thread {
         {
             return;
         }
-        this.rawSetStatus(status);
-        switch (this.status) {
-            // If thread is runnable, yield to JS event loop and then change the thread to running
+        switch (status) {
             case ThreadStatus.RUNNABLE:
-                this.tpool.scheduleNextThread();
+                if (this.tpool.isRunning(this)) {
+                    // Still inside run(), which simply carries on.
+                    this.rawSetStatus(ThreadStatus.RUNNING);
+                } else if (this.status !== ThreadStatus.RUNNABLE) {
+                    this.rawSetStatus(status);
+                    this.tpool.enqueue(this);
+                }
                 break;
             case ThreadStatus.RUNNING:
                 // I'm scheduled to run!
+                this.rawSetStatus(status);
                 this.run();
                 break;
             case ThreadStatus.TERMINATED:
+                this.rawSetStatus(status);
                 this.exit();
                 break;
             default:
-                // ASYNC_WAITING, changing running thread to be null
-                this.tpool.threadSuspended(this);
-                break;        
+                // ASYNC_WAITING. If the thread is running, run() returns to
+                // the thread pool.
+                this.rawSetStatus(status);
+                break;
         }
     }
 
@@ -124,22 +122,24 @@ export class Thread {
         this.stack.push(frame);
     }
 
-    public clearTraceback(): void {
-        this.traceback = "";
-    }
-
-    // Maintains thread level tracebacks
-    public addToTraceback(str : string): void {
-        this.traceback = str + this.traceback;
+    // Returns a line of the program's source, for tracebacks, or an empty
+    // string if it isn't available.
+    public getSourceLine(line: number): string {
+        return line > 0 && line <= this.codefile.length ? this.codefile[line - 1].trim() : "";
     }
 
     // Writes thread tracebacks to console
     public writeTraceback(): void {
-        this.traceback = `Traceback (most recent call last):${os.EOL}${this.traceback}`;
-        process.stdout.write(this.traceback);
+        this.sys.output.write(`Traceback (most recent call last):${os.EOL}${this.tb.format(this)}${this.tb.message}`);
         this.exit();
     }
 
+    // Raises a new exception, whose traceback ends with message when printed.
+    public raiseException(exc: IPy_Object, message: string): void {
+        this.tb.clear(message);
+        this.throwException(exc);
+    }
+
     public throwException(exc: IPy_Object): void {
         // Whenever an exception occurs, tries to find a handler and if it can't outputs the traceback 
         this.exc = exc;
@@ -211,10 +211,18 @@ export class Thread {
 }
 
 export class ThreadPool {
-    private threads: Thread[] = [];
+    // Live threads, by id.
+    private threads: { [id: number]: Thread } = {};
     private sys: Py_Sys;
     private runningThread: Thread = null;
-    private runningThreadIndex: number = -1;
+    // Runnable threads, in FIFO order. Threads before runQueueHead have
+    // already been dequeued.
+    private runQueue: Thread[] = [];
+    private runQueueHead: number = 0;
+    // Whether runThreads() is due to be called from the event loop.
+    private dispatchPending: boolean = false;
+    // When the current time slice started.
+    private sliceStart: number = 0;
     private id: number = 0;
     /**
     * Called when the ThreadPool becomes empty. This is usually a sign that
@@ -228,95 +236,103 @@ export class ThreadPool {
     }
 
     public getThreads(): Thread[] {
-        // Return a copy of our internal array.
-        return this.threads.slice(0);
-    }
-
-    private addThread(t: Thread): void {
-        if (this.threads.indexOf(t) === -1) {
-            this.threads.push(t);
-        }
+        return Object.keys(this.threads).map((id: string) => this.threads[<any> id]);
     }
 
     // Create a new Thread object and push it on stack
     public newThread(): Thread {
         var t = new Thread(this.sys, this, this.id);
-        this.addThread(t);
+        this.threads[t.id] = t;
         this.id++;
         return t;
     }
 
+    public isRunning(t: Thread): boolean {
+        return this.runningThread === t;
+    }
+
+    // Adds a runnable thread to the back of the run queue.
+    public enqueue(t: Thread): void {
+        if (this.threads[t.id] !== t) {
+            // The thread has been terminated.
+            return;
+        }
+        this.runQueue.push(t);
+        if (this.runningThread === null && !this.dispatchPending) {
+            this.dispatchPending = true;
+            setImmediate(() => this.runThreads());
+        }
+    }
+
+    private dequeue(): Thread {
+        var queue = this.runQueue, t: Thread;
+        while (this.runQueueHead < queue.length) {
+            t = queue[this.runQueueHead++];
+            if (this.runQueueHead * 2 >= queue.length) {
+                // Drop the dequeued half.
+                queue.splice(0, this.runQueueHead);
+                this.runQueueHead = 0;
+            }
+            if (this.threads[t.id] === t && t.getStatus() === ThreadStatus.RUNNABLE) {
+                return t;
+            }
+        }
+        return null;
+    }
+
+    // Called by the running thread when it has used up its instruction
+    // budget. It should stop if another thread is waiting for its turn, or
+    // if the time slice is over.
+    public shouldPreempt(): boolean {
+        return this.runQueueHead < this.runQueue.length || now() - this.sliceStart >= timeSlice;
+    }
+
     /**
-    * Schedules and runs the next thread.
+    * Runs threads from the run queue until there are none left, or until
+    * the time slice is over. Then control returns to the event loop. The
+    * output is flushed even if a JS error escapes, so that what the
+    * program printed before it isn't lost.
     */
-    public scheduleNextThread(): void {
-        // Reset stack depth, start at beginning of new JS event.
-        setImmediate(() => {
-            var i: number, iFixed: number, threads = this.threads, t: Thread;
-            for (i = 0; i < threads.length; i++) {
-                // Cycle through the threads, starting at the thread just past the
-                // previously-run thread. (Round Robin scheduling algorithm)
-                iFixed = (this.runningThreadIndex + 1 + i) % threads.length;
-                t = threads[iFixed];
-                if (t.getStatus() === ThreadStatus.RUNNABLE) {
-                    this.runningThread = t;
-                    this.runningThreadIndex = iFixed;
-                    t.setStatus(ThreadStatus.RUNNING);
+    private runThreads(): void {
+        var t: Thread;
+        this.dispatchPending = false;
+        this.sliceStart = now();
+        try {
+            while ((t = this.dequeue()) !== null) {
+                this.runningThread = t;
+                t.setStatus(ThreadStatus.RUNNING);
+                this.runningThread = null;
+                if (now() - this.sliceStart >= timeSlice) {
+                    if (this.runQueueHead < this.runQueue.length) {
+                        this.dispatchPending = true;
+                        setImmediate(() => this.runThreads());
+                    }
                     break;
                 }
             }
-        });
+        } finally {
+            this.flushOutput();
+        }
     }
 
-    /**
-    * Checks if any remaining threads are non-daemonic and could be runnable.
-    * If not, we can terminate execution.
-    */
-    private anySchedulableThreads(t: Thread): boolean {
-        var i: number, t: Thread, status: ThreadStatus;
-        for (i = 0; i < this.threads.length; i++) {
-            t = this.threads[i];
-            status = t.getStatus();
-            if (status != ThreadStatus.NEW && status != ThreadStatus.TERMINATED) {
-                return true;
-            }
+    private flushOutput(): void {
+        var output = this.sys.output;
+        if (output.flush) {
+            output.flush();
         }
-        return false;
     }
 
     // Terminate thread and remove it from thread pool
     public threadTerminated(t: Thread): void {
-        var idx: number = this.threads.indexOf(t);
-        assert(idx >= 0, "Terminated thread not found in thread pool");
-        // Remove the specified thread from the threadpool.
-        this.threads.splice(idx, 1);
-
-        // If this was the running thread, schedule a new one to run.
-        if (this.runningThread === t) {
-            this.runningThread = null;
-            // The runningThreadIndex is currently pointing to the *next* thread we
-            // should schedule, so take it back by one.
-            this.runningThreadIndex = this.runningThreadIndex - 1;
-            if (this.anySchedulableThreads(t)) {
-                this.scheduleNextThread();
-            }
-        } else {
-            // Update the index so it still points to the running thread.
-            this.runningThreadIndex = this.threads.indexOf(this.runningThread);
-        }
+        assert(this.threads[t.id] === t, "Terminated thread not found in thread pool");
+        delete this.threads[t.id];
     }
 
     public terminateAllThreads(): void {
-        this.threads = [];
-        this.runningThread = null;
+        this.threads = {};
+        this.runQueue = [];
+        this.runQueueHead = 0;
+        this.flushOutput();
         this.cb();
     }
-
-    public threadSuspended(t: Thread): void {
-        // If this was the running thread, schedule a new one to run.
-        if (t === this.runningThread) {
-            this.runningThread = null;
-            this.scheduleNextThread();
-        }
-    }
-}
\ No newline at end of file
+}
@@ -6,15 +6,70 @@ import {Py_SyncNativeFuncObject, Py_AsyncNativeFuncObject} from './nativefuncobj
 import {Thread, ThreadPool} from './threading';
 import builtins = require('./builtins');
 import os = require('os');
+// !! Use only for type info !!
+import _Py_CodeObject = require('./codeobject');
 
 /**
  * Implements the python Traceback module.
  * Specifcations: https://docs.python.org/2/library/traceback.html
  */
 export class Py_Traceback extends Py_Object {
-    public trace: string[] = [];
+    // The frames the exception has passed through, innermost first, as the
+    // code each frame was running and the index of the instruction it was
+    // at. Line numbers and source text are only looked up when the
+    // traceback is formatted.
+    private codes: _Py_CodeObject[] = [];
+    private insts: number[] = [];
+    // The frames as [source, name, line, file] strings, built on demand by
+    // getTrace().
+    private trace: string[] = null;
     public exc_type: string = "";
     public exc_value: string = "";
+    // Describes the exception, after the frames, when printed.
+    public message: string = "";
+
+    // Starts the traceback of a new exception.
+    public clear(message: string): void {
+        this.codes = [];
+        this.insts = [];
+        this.trace = null;
+        this.message = message;
+    }
+
+    public addFrame(code: _Py_CodeObject, inst: number): void {
+        this.codes.push(code);
+        this.insts.push(inst);
+        this.trace = null;
+    }
+
+    // Returns the frames, outermost first, as printed for an uncaught
+    // exception.
+    public format(t: Thread): string {
+        var str = "", code: _Py_CodeObject, line: number;
+        for (var i = this.codes.length - 1; i >= 0; i--) {
+            code = this.codes[i];
+            line = code.getLine(this.insts[i]);
+            str += `  File "${code.filename.toString()}", line ${line}, in ${code.name.toString()}\n`;
+            if (t.codefile.length >= line) {
+                str += `    ${t.getSourceLine(line)}\n`;
+            }
+        }
+        return str;
+    }
+
+    // Returns the frames, innermost first, four strings to a frame.
+    public getTrace(t: Thread): string[] {
+        var code: _Py_CodeObject, line: number;
+        if (this.trace === null) {
+            this.trace = [];
+            for (var i = 0; i < this.codes.length; i++) {
+                code = this.codes[i];
+                line = code.getLine(this.insts[i]);
+                this.trace.push(t.getSourceLine(line), code.name.toString(), `${line}`, code.filename.toString());
+            }
+        }
+        return this.trace;
+    }
 
     public verify_args(args: IPy_Object[], min: number, max: number) {
         if (args.length > max || args.length < min) {
@@ -23,17 +78,18 @@ export class Py_Traceback extends Py_Object {
     }
 
     // Takes traceback object and returns a properly formatted string containing the traceback information
-    public get_tb_str(tb: Py_Traceback, args: IPy_Object[], tb_id: number, limit_id: number): string {
+    public get_tb_str(t: Thread, tb: Py_Traceback, args: IPy_Object[], tb_id: number, limit_id: number): string {
         if (!tb) {
             tb = <Py_Traceback> args[tb_id];
         }
-        var limit: number = args.length >= (limit_id + 1) ? parseInt(args[limit_id].toString()) : (tb.trace.length - 1)/4;
+        var trace = tb.getTrace(t);
+        var limit: number = args.length >= (limit_id + 1) ? parseInt(args[limit_id].toString()) : (trace.length - 1)/4;
         var x: string = "";
-        for (var i = tb.trace.length - 1; i >= 0; i-=4) {
+        for (var i = trace.length - 1; i >= 0; i-=4) {
             if (limit-- <= 0) {
                 break;
             }
-            x += `  File "${tb.trace[i]}", line ${tb.trace[i-1]}, in ${tb.trace[i-2]}\n    ${tb.trace[i-3]}\n`;
+            x += `  File "${trace[i]}", line ${trace[i-1]}, in ${trace[i-2]}\n    ${trace[i-3]}\n`;
         }
         return x;
     }
@@ -42,7 +98,7 @@ export class Py_Traceback extends Py_Object {
      */    
     $print_tb = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
         this.verify_args(args, 1, 3);
-        process.stdout.write(this.get_tb_str(null, args, 0, 1));
+        t.sys.output.write(this.get_tb_str(t, null, args, 0, 1));
         return None;
     });
 
@@ -53,7 +109,7 @@ export class Py_Traceback extends Py_Object {
         this.verify_args(args, 3, 5);
         var type: string = args[0].toString();
         var val: string = args[1].toString();
-        process.stdout.write(`Traceback (most recent call last):\n${this.get_tb_str(null, args, 2, 3)}${type}: ${val}\n`);
+        t.sys.output.write(`Traceback (most recent call last):\n${this.get_tb_str(t, null, args, 2, 3)}${type}: ${val}\n`);
         return None;
     });
 
@@ -61,7 +117,7 @@ export class Py_Traceback extends Py_Object {
      */    
     $print_exc = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
         this.verify_args(args, 0, 2);
-        process.stdout.write(`Traceback (most recent call last):\n${this.get_tb_str(t.tb, args, null, 0)}${t.tb.exc_type}: ${t.tb.exc_value}\n`);
+        t.sys.output.write(`Traceback (most recent call last):\n${this.get_tb_str(t, t.tb, args, null, 0)}${t.tb.exc_type}: ${t.tb.exc_value}\n`);
         return None;
     });
 
@@ -70,7 +126,7 @@ export class Py_Traceback extends Py_Object {
      */
     $format_exc = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
         this.verify_args(args, 0, 1);
-        return new Py_Str(`Traceback (most recent call last):\n${this.get_tb_str(t.tb, args, null, 0)}${t.tb.exc_type}: ${t.tb.exc_value}\n`);
+        return new Py_Str(`Traceback (most recent call last):\n${this.get_tb_str(t, t.tb, args, null, 0)}${t.tb.exc_type}: ${t.tb.exc_value}\n`);
     });
 
     /* NYI
@@ -98,7 +154,7 @@ export class Py_Traceback extends Py_Object {
      */
     $extract_tb = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
         this.verify_args(args, 1, 2);
-        return new Py_List(this.get_tb_arr(args, 0, 1, false, true));
+        return new Py_List(this.get_tb_arr(t, args, 0, 1, false, true));
     });
 
     /* ARGS: ([f[, limit[, file]]])
@@ -131,22 +187,23 @@ export class Py_Traceback extends Py_Object {
     });
     
     // Return an array of either Py_Tuples or Py_Strs
-    public get_tb_arr(args: IPy_Object[], tb_id: number, limit_id: number, trace: boolean, tuple: boolean): IPy_Object[] {
+    public get_tb_arr(t: Thread, args: IPy_Object[], tb_id: number, limit_id: number, header: boolean, tuple: boolean): IPy_Object[] {
         var x: IPy_Object[] = [];
         var tb: Py_Traceback = <Py_Traceback> args[tb_id];
-        var limit: number = args.length >= (limit_id + 1) ? parseInt(args[limit_id].toString()) : (tb.trace.length - 1)/4;
-        if (trace){
+        var trace = tb.getTrace(t);
+        var limit: number = args.length >= (limit_id + 1) ? parseInt(args[limit_id].toString()) : (trace.length - 1)/4;
+        if (header){
             x.push(new Py_Str(`Traceback (most recent call last):\\n`));
         }
-        for (var i = tb.trace.length - 1; i >= 0; i-=4) {
+        for (var i = trace.length - 1; i >= 0; i-=4) {
             if (limit-- <= 0) {
                 break;
             }
             if (tuple) {
-                x.push(new Py_Tuple([new Py_Str(tb.trace[i]), new Py_Int(parseInt(tb.trace[i-1])), new Py_Str(tb.trace[i-2]), new Py_Str(tb.trace[i-3])]));
+                x.push(new Py_Tuple([new Py_Str(trace[i]), Py_Int.fromNumber(parseInt(trace[i-1])), new Py_Str(trace[i-2]), new Py_Str(trace[i-3])]));
             }
             else {
-                x.push(new Py_Str(`  File "${tb.trace[i]}", line ${tb.trace[i - 1]}, in ${tb.trace[i - 2]}\\n    ${tb.trace[i - 3]}\\n`));
+                x.push(new Py_Str(`  File "${trace[i]}", line ${trace[i - 1]}, in ${trace[i - 2]}\\n    ${trace[i - 3]}\\n`));
             }
         }
         return x;
@@ -166,7 +223,7 @@ export class Py_Traceback extends Py_Object {
                 x += `  File "${stack_trace[i][3]}", line ${stack_trace[i][2]}, in ${stack_trace[i][1]}\n    ${stack_trace[i][0]}\n`;
             }
             else if (type_op == 2) {
-                tb_list.push(new Py_Tuple([new Py_Str(stack_trace[i][3]), new Py_Int(parseInt(stack_trace[i][2])), new Py_Str(stack_trace[i][1]), new Py_Str(stack_trace[i][0])]));
+                tb_list.push(new Py_Tuple([new Py_Str(stack_trace[i][3]), Py_Int.fromNumber(parseInt(stack_trace[i][2])), new Py_Str(stack_trace[i][1]), new Py_Str(stack_trace[i][0])]));
             }
             else if (type_op == 3) {
                 tb_list.push(new Py_Str(`  File "${stack_trace[i][3]}", line ${stack_trace[i][2]}, in ${stack_trace[i][1]}\\n    ${stack_trace[i][0]}\\n`));
@@ -174,7 +231,7 @@ export class Py_Traceback extends Py_Object {
             }
         }
         if (type_op == 1) {
-            process.stdout.write(x);
+            t.sys.output.write(x);
         }
         return new Py_List(tb_list);
     }
@@ -184,7 +241,7 @@ export class Py_Traceback extends Py_Object {
      */
     $format_exception = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
         this.verify_args(args, 3, 4);
-        var x: IPy_Object[] = this.get_tb_arr(args, 2, 3, true, false);
+        var x: IPy_Object[] = this.get_tb_arr(t, args, 2, 3, true, false);
         x.push(new Py_Str(`${args[0].toString()}: ${args[1].toString()}\\n`));
         return new Py_List(x);
     });
@@ -193,7 +250,7 @@ export class Py_Traceback extends Py_Object {
      */
     $format_tb = new Py_SyncNativeFuncObject((t: Thread, f: IPy_FrameObj, args: IPy_Object[], kwargs: Py_Dict) => {
         this.verify_args(args, 1, 2);
-        return new Py_List(this.get_tb_arr(args, 0, 1, false, false));
+        return new Py_List(this.get_tb_arr(t, args, 0, 1, false, false));
     });
 
     /* ARGS: ([f[, limit]])
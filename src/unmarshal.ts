@@ -1,12 +1,34 @@
 /// <reference path="../bower_components/DefinitelyTyped/node/node.d.ts" />
-/// <reference path="../bower_components/DefinitelyTyped/decimal.js/decimal.js.d.ts" />
 import {Py_Int, Py_Long, Py_Float, Py_Complex, Py_Str} from './primitives';
 import {IPy_Object} from './interfaces';
 import {Py_Tuple, Py_List} from './collections';
 import Py_CodeObject = require('./codeobject');
 import builtins = require('./builtins');
 import fs = require('fs');
-import Decimal = require('decimal.js');
+import path = require('path');
+
+// Type codes of the marshal format (see Python/marshal.c).
+const TYPE_NONE = 0x4e,         // 'N'
+    TYPE_FALSE = 0x46,          // 'F'
+    TYPE_TRUE = 0x54,           // 'T'
+    TYPE_STOPITER = 0x53,       // 'S'
+    TYPE_ELLIPSIS = 0x2e,       // '.'
+    TYPE_INT = 0x69,            // 'i'
+    TYPE_INT64 = 0x49,          // 'I'
+    TYPE_BINARY_FLOAT = 0x67,   // 'g'
+    TYPE_BINARY_COMPLEX = 0x79, // 'y'
+    TYPE_LONG = 0x6c,           // 'l'
+    TYPE_STRING = 0x73,         // 's'
+    TYPE_INTERNED = 0x74,       // 't'
+    TYPE_STRINGREF = 0x52,      // 'R'
+    TYPE_UNICODE = 0x75,        // 'u'
+    TYPE_TUPLE = 0x28,          // '('
+    TYPE_LIST = 0x5b,           // '['
+    TYPE_CODE = 0x63;           // 'c'
+
+// Code objects already unmarshalled, by absolute path. An entry is valid
+// while the file's modification time is unchanged.
+var codeCache: { [path: string]: { mtime: number; code: Py_CodeObject } } = {};
 
 // An Unmarshaller takes a .pyc file (as a string of bytes, e.g. "\xXX") and
 // converts it into a Python code object. The marshal format is not officially
@@ -23,7 +45,7 @@ class Unmarshaller {
     // Date of compilation
     date: Date;
     // The list of "interalized" strings
-    internedStrs: string[];
+    internedStrs: Py_Str[];
     // The output of unmarshalling the .pyc file
     output: Py_CodeObject;
 
@@ -56,19 +78,9 @@ class Unmarshaller {
         return this.output;
     }
 
-    // Reads a single character (1 byte, as string) from the input
-    readChar(): string {
-        var c = this.input.toString('ascii', this.index, this.index+1);
-        this.index += 1;
-        return c;
-    }
-
     // Reads a single byte from the input
-    // (Equivalent to readChar().charCodeAt(0))
     readByte(): number {
-        var b = this.input.readUInt8(this.index);
-        this.index += 1;
-        return b;
+        return this.input[this.index++];
     }
 
     // Read an unsigned short (used for grokking longs)
@@ -85,12 +97,16 @@ class Unmarshaller {
         return i;
     }
 
-    // Reads a 64 bit integer
-    readInt64(): decimal.Decimal {
-        var low = this.readInt32();
+    // Reads a 64 bit integer. Values that don't fit in a JS number are
+    // returned as longs.
+    readInt64(): Py_Int | Py_Long {
+        var low = this.readInt32() >>> 0;
         var high = this.readInt32();
-        var d = new Decimal(high);
-        return d.times(Math.pow(2, 32)).plus(low);
+        var n = high * 4294967296 + low;
+        if (n <= 9007199254740991 && n >= -9007199254740991) {
+            return Py_Int.fromNumber(n);
+        }
+        return Py_Long.fromNumber(high).lshift(null, Py_Long.fromNumber(32)).or(null, Py_Long.fromNumber(low));
     }
 
     // Reads a 64-bit floating-pount number
@@ -118,109 +134,90 @@ class Unmarshaller {
 
     // Buffer's ASCII encoding automatically chops off the highest bit, so e.g.
     // 0x84 (the MAKE_FUNCTION opcode) is truncated to 0x04. This is obviously
-    // disastrous. Instead, we read binary strings directly as Buffers.
+    // disastrous. Instead, we read binary strings directly as Buffers. These
+    // are views of the input, not copies.
     // This function is really just a helper for unmarshalCodeString
     readBinaryString(length: number): Buffer {
-        var buf = new Buffer(length);
-        this.input.copy(buf, 0, this.index, this.index+length);
+        var buf = this.input.slice(this.index, this.index+length);
         this.index += length;
-        return buf
+        return buf;
     }
 
     // Code strings are treated separately, since they're marshalled as normal
     // strings but need to be unmarshalled as binary strings.
     unmarshalCodeString(): Buffer {
-        var op = this.readChar();
-        if (op != "s") {
+        if (this.readByte() !== TYPE_STRING) {
             throw new Error("The code string should be marshalled as a string");
         }
         var length = this.readInt32();
         return this.readBinaryString(length);
     }
 
+    // Reads the items of a tuple or list.
+    readItems(): IPy_Object[] {
+        var length = this.readInt32(),
+            items: IPy_Object[] = new Array(length);
+        for (var i = 0; i < length; i++) {
+            items[i] = this.unmarshal(true);
+        }
+        return items;
+    }
+
     // Unmarshals the input string recursively. May handle unneeded cases, e.g.
     // T (true) and F (false) due to undocumented marshalling format.
-    unmarshal(convertTypes: boolean = false) {
-        var unit = this.readChar();
-        var res: any;
-        switch (unit) {
+    unmarshal(convertTypes: boolean = false): any {
+        var type = this.readByte();
+        switch (type) {
             // Constants
-            case "N": // None
-                res = builtins.$None;
-                break;
-            case "F": // False
-                res = builtins.$False;
-                break;
-            case "S": // StopIteration Exception (TODO: double check this)
+            case TYPE_NONE:
+                return builtins.$None;
+            case TYPE_FALSE:
+                return builtins.$False;
+            case TYPE_STOPITER: // StopIteration Exception (TODO: double check this)
                 throw new Error("StopIteration is pending investigation");
-            case "T": // True
-                res = builtins.$True;
-                break;
-            case ".": // Ellipsis object (TODO: double check this)
+            case TYPE_TRUE:
+                return builtins.$True;
+            case TYPE_ELLIPSIS: // Ellipsis object (TODO: double check this)
                 throw new Error("Ellipsis is not yet implemented");
-                break;
             // Numbers
-            case "g": // double-precision floating-point number
-                res = new Py_Float(this.readFloat64());
-                break;
-            case "i": // 32-bit integer (signed)
-                res = new Py_Int(this.readInt32());
-                break;
-            case "I": // 64-bit integer (signed)
-                // Use Long for >32 bits.
-                res = new Py_Long(this.readInt64());
-                break;
-            case "l": // arbitrary precision integer
+            case TYPE_BINARY_FLOAT: // double-precision floating-point number
+                return new Py_Float(this.readFloat64());
+            case TYPE_INT: // 32-bit integer (signed)
+                return Py_Int.fromNumber(this.readInt32());
+            case TYPE_INT64: // 64-bit integer (signed)
+                return this.readInt64();
+            case TYPE_LONG: // arbitrary precision integer
                 // Stored as a 32-bit integer of length, then $length 16-bit
                 // digits.
-                var length = this.readInt32();
-                var num = new Decimal(0);
-                if (length != 0) {
-                    var shift = new Decimal(15);
-                    for(var i = 0; i < Math.abs(length); i++) {
-                        var digit = new Decimal(this.readUInt16());
-                        num = num.plus(digit.times(
-                                    Decimal.pow(2, shift.times(i))));
-                    }
-                }
-                if (length < 0) {
-                    num = num.times(-1);
+                var length = this.readInt32(),
+                    digits: number[] = new Array(Math.abs(length));
+                for (var i = 0; i < digits.length; i++) {
+                    digits[i] = this.readUInt16();
                 }
-                res = new Py_Long(num);
-                break;
-            case "y": // complex number
-                res = Py_Complex.fromNumber(this.readFloat64(),
+                return Py_Long.fromDigits(digits, 15, length < 0);
+            case TYPE_BINARY_COMPLEX: // complex number
+                return Py_Complex.fromNumber(this.readFloat64(),
                         this.readFloat64());
-                break;
             // Strings
-            case "R": // Reference to interned string
-                var index = this.readInt32();
-                res = this.internedStrs[index];
-                break;
-            case "s": // plain string. length (int 32) + bytes
-                var length = this.readInt32();
-                res = this.readString(length);
-                break;
-            case "t": // interned string, stored in an array
-                var length = this.readInt32();
-                res = this.readString(length);
-                this.internedStrs.push(res);
-                break;
-            case "u": // utf-8 string
-                var length = this.readInt32();
-                res = this.readUnicodeString(length);
-                break;
+            case TYPE_STRINGREF: // Reference to interned string
+                return this.internedStrs[this.readInt32()];
+            case TYPE_STRING: // plain string. length (int 32) + bytes
+                return this.readString(this.readInt32());
+            case TYPE_INTERNED: // interned string, stored in an array
+                var str = this.readString(this.readInt32());
+                this.internedStrs.push(str);
+                return str;
+            case TYPE_UNICODE: // utf-8 string
+                return this.readUnicodeString(this.readInt32());
             // Collections
-            case "(": // tuple
-            case "[": // list
-                var length = this.readInt32();
-                res = [];
-                for (var x = 0; x < length; x++) {
-                    res.push(this.unmarshal(true));
-                }
-                break;
+            // XXX: internal structures use JS arrays, but code constants need
+            // conversion to python list/tuple types.
+            case TYPE_TUPLE:
+                return convertTypes ? new Py_Tuple(this.readItems()) : this.readItems();
+            case TYPE_LIST:
+                return convertTypes ? new Py_List(this.readItems()) : this.readItems();
             // Code Objects:
-            case "c":
+            case TYPE_CODE:
                 var argc = this.readInt32();
                 var nlocals = this.readInt32();
                 var stacksize = this.readInt32();
@@ -235,28 +232,62 @@ class Unmarshaller {
                 var name: Py_Str = this.unmarshal();
                 var firstlineno = this.readInt32();
                 var lnotab: Py_Str = this.unmarshal();
-                res = new Py_CodeObject(
+                return new Py_CodeObject(
                     argc, nlocals, stacksize, flags, codestr, consts,
                     names, varnames, freevars, cellvars, filename,
                     name, firstlineno, lnotab);
-                break;
-
             default:
+                var unit = String.fromCharCode(type);
                 console.log("Unsupported marshal format: " + unit + " @" +
                         this.index);
                 throw new Error("Unsupported marshal format: " + unit)
         }
-        // XXX: internal structures use JS arrays, but code constants need
-        // conversion to python list/tuple types.
-        if (convertTypes) {
-            if (unit === '(') {
-                return new Py_Tuple(res);
+    }
+
+    /**
+     * Reads and unmarshals a .pyc file. Code objects are cached for the
+     * lifetime of the process, and reused for as long as the file's
+     * modification time stays the same.
+     */
+    static loadFile(file: string, cb: (err: NodeJS.ErrnoException, code?: Py_CodeObject) => void): void {
+        var key = path.resolve(file);
+        fs.stat(key, (err: NodeJS.ErrnoException, stats: fs.Stats) => {
+            if (err) {
+                return cb(err);
             }
-            if (unit === '[') {
-                return new Py_List(res);
+            var mtime = stats.mtime.getTime(),
+                entry = codeCache[key];
+            if (entry !== undefined && entry.mtime === mtime) {
+                return cb(null, entry.code);
             }
+            fs.readFile(key, (err: NodeJS.ErrnoException, data: Buffer) => {
+                if (err) {
+                    return cb(err);
+                }
+                var code: Py_CodeObject;
+                try {
+                    code = new Unmarshaller(data).value();
+                } catch (e) {
+                    return cb(e);
+                }
+                codeCache[key] = { mtime: mtime, code: code };
+                cb(null, code);
+            });
+        });
+    }
+
+    // Synchronous version of loadFile().
+    static loadFileSync(file: string): Py_CodeObject {
+        var key = path.resolve(file),
+            mtime = fs.statSync(key).mtime.getTime(),
+            entry = codeCache[key];
+        if (entry === undefined || entry.mtime !== mtime) {
+            entry = codeCache[key] = {
+                mtime: mtime,
+                code: new Unmarshaller(fs.readFileSync(key)).value()
+            };
         }
-        return res;
+        return entry.code;
     }
 }
 export = Unmarshaller;